@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from logic.leevin_central import LeevinCentral
+from logic.visit_labels import register_visit_aliases
 
 st.set_page_config(page_title="Leevin Clinical OS v1.6", layout="wide", page_icon="🧬")
 central = LeevinCentral()
@@ -30,10 +31,16 @@ if role == "👩‍💻 CDM":
             f1 = c1.file_uploader(l1, key=f"f1_{mode}")
             # Query_Recon only needs 1 file. PD_Recon needs 2.
             f2 = c2.file_uploader(l2, key=f"f2_{mode}") if mode != "Query_Recon" else None
+            # Optional study schedule ("Month 1 Visit" -> V3), remembered per study
+            f3 = c2.file_uploader("Visit Aliases (CSV: STUDYID, Label, Visit)", key="f3_PD_Recon") if mode == "PD_Recon" else None
             
             if f1 and (f2 or mode == "Query_Recon") and st.button(f"Run Analysis", key=f"btn_{mode}"):
                 df1 = pd.read_csv(f1)
                 df2 = pd.read_csv(f2) if f2 else None
+                if f3:
+                    schedule = pd.read_csv(f3, dtype=str)
+                    for study, rows in schedule.groupby("STUDYID"):
+                        register_visit_aliases(study, dict(zip(rows["Label"], rows["Visit"])))
                 res, metrics = central.cdm.run_recon(df1, df2, mode)
                 
                 m1, m2, m3 = st.columns(3)
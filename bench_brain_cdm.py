@@ -0,0 +1,166 @@
+"""
+Benchmark: BrainCDM.run_recon columnar pillars vs the baseline iterrows() loops
+(copied verbatim from the pre-rewrite brain_cdm.py).
+The columnar time is the best of 3 calls (the loops run once); both include the key join.
+Run: python bench_brain_cdm.py [rows]
+"""
+import sys
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from logic.brain_cdm import BrainCDM
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+rng = np.random.default_rng(42)
+brain = BrainCDM()
+
+
+# --- REFERENCE: the baseline row-by-row pillars, verbatim (normalize_date, SAE / Labs / Death / Coding) ---
+class LegacyBrainCDM(BrainCDM):
+    def normalize_date(self, date_obj):
+        if pd.isna(date_obj) or str(date_obj).strip() == "": return None
+        for fmt in ['%Y-%m-%d', '%d-%b-%Y', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y']:
+            try: return datetime.strptime(str(date_obj).strip(), fmt).date()
+            except: continue
+        return None
+
+    def run_recon(self, df1, df2, mode):
+        # Work on copies
+        df1 = df1.copy()
+        if df2 is not None: df2 = df2.copy()
+
+        # STANDARD RECON (2 DFs, Key-based)
+        k1, k2 = self.detect_id(df1), self.detect_id(df2)
+        df1 = df1.assign(KEY=df1[k1].astype(str).str.strip().str.upper())
+        df2 = df2.assign(KEY=df2[k2].astype(str).str.strip().str.upper())
+        
+        merged = pd.merge(df1, df2, on='KEY', how='outer', suffixes=('_EDC', '_EXT'), indicator=True)
+        issues = []
+
+        # --- PILLAR 1: SAE (Safety vs Clinical) ---
+        if mode == "SAE":
+            ser = next((c for c in df1.columns if "SER" in c.upper()), "AESER")
+            rel = next((c for c in df1.columns if "REL" in c.upper()), "AEREL")
+            for _, r in merged[merged['_merge']=='both'].iterrows():
+                if str(r.get(ser, "")).upper() not in ['Y', 'YES', 'TRUE', 'SERIOUS']:
+                    issues.append({"Subject": r['KEY'], "Issue": "Seriousness Mismatch", "Detail": "Safe DB has event, EDC not Serious."})
+                if rel and f"{rel}_EXT" in r:
+                    if str(r.get(rel))[:3] != str(r.get(f"{rel}_EXT"))[:3]:
+                        issues.append({"Subject": r['KEY'], "Issue": "Causality Conflict", "Detail": "Investigator vs Sponsor mismatch."})
+
+        # --- PILLAR 2: LABS (Dates & QNS) ---
+        elif mode == "Labs":
+            d_edc = next((c for c in df1.columns if "DAT" in c.upper()), "VISITDAT")
+            d_lab = next((c for c in df2.columns if "DAT" in c.upper()), "LBDAT")
+            comm = next((c for c in df2.columns if "COMM" in c.upper() or "STAT" in c.upper()), None)
+            res = next((c for c in df2.columns if "RES" in c.upper()), "LBORRES")
+            
+            for _, r in merged[merged['_merge']=='both'].iterrows():
+                if pd.isna(r.get(res)) and comm and ("QNS" in str(r[comm]).upper() or "HEMOL" in str(r[comm]).upper()):
+                     issues.append({"Subject": r['KEY'], "Issue": "Sample Issue", "Detail": f"Lab Rejected: {r[comm]}"})
+                d1, d2 = self.normalize_date(r.get(d_edc)), self.normalize_date(r.get(d_lab))
+                if d1 and d2 and abs((d2-d1).days) > 2:
+                    issues.append({"Subject": r['KEY'], "Issue": "Date Mismatch", "Detail": f"Lab drawn {(d2-d1).days} days from visit."})
+
+        # --- PILLAR 3: DEATH (Zombies & Ghosts) ---
+        elif mode == "Death":
+            ae_out = next((c for c in df1.columns if "OUT" in c.upper()), "AEOUT")
+            ds_reas = next((c for c in df2.columns if "REAS" in c.upper()), "DSDECOD")
+            fatal_map = {k: True for k, g in df1.groupby('KEY') if g[ae_out].str.contains('FATAL|DEATH', case=False, na=False).any()}
+            for _, r in merged.iterrows():
+                key = r['KEY']
+                is_dead_ds = "DEATH" in str(r.get(ds_reas, "")).upper()
+                is_dead_ae = fatal_map.get(key, False)
+                if is_dead_ds and not is_dead_ae: issues.append({"Subject": key, "Issue": "Ghost Record", "Detail": "Dispo says Death, No Fatal AE."})
+                if is_dead_ae and not is_dead_ds: issues.append({"Subject": key, "Issue": "Zombie Record", "Detail": "Fatal AE exists, Subject Active in Dispo."})
+
+        # --- PILLAR 4: CODING (Homogeneity) ---
+        elif mode == "Coding":
+            verb = next((c for c in df1.columns if "TERM" in c.upper()), "AETERM")
+            code = next((c for c in df1.columns if "LLT" in c.upper() or "CODE" in c.upper()), "AELLT")
+            for term, g in df1.groupby(verb):
+                codes = g[code].unique()
+                clean = [c for c in codes if str(c) not in ['nan', 'None']]
+                if len(clean) > 1: issues.append({"Subject": "Multiple", "Issue": "Split Coding", "Detail": f"'{term}' coded as {clean}"})
+
+        return self._format_output(df1, issues)
+
+    def _format_output(self, source_df, issues):
+        df_issues = pd.DataFrame(issues)
+        if df_issues.empty:
+            df_issues = pd.DataFrame([["✅ No Issues Found"]], columns=["Status"])
+            metrics = {"Total": len(source_df), "Issues": 0, "Rate": 0.0}
+        else:
+            cols = ["Subject", "Issue", "Detail", "Action"]
+            for c in cols: 
+                if c not in df_issues.columns: df_issues[c] = "-"
+            df_issues = df_issues[[c for c in cols if c in df_issues.columns]]
+            metrics = {
+                "Total": len(source_df), 
+                "Issues": len(df_issues), 
+                "Rate": round((len(df_issues)/len(source_df))*100, 1)
+            }
+        return df_issues, metrics
+
+legacy = LegacyBrainCDM()
+
+
+# --- SYNTHETIC DATA ---
+def subjects(n):
+    return np.char.add("S", rng.integers(0, n, n).astype(str))
+
+def make_sae(n):
+    ids = np.char.add("S", np.arange(n).astype(str))
+    edc = pd.DataFrame({"USUBJID": ids, "AESER": rng.choice(["Y", "N", "YES"], n), "AEREL": rng.choice(["RELATED", "NOT RELATED", "POSSIBLE"], n)})
+    ext = pd.DataFrame({"USUBJID": ids, "AEREL": rng.choice(["RELATED", "NOT RELATED", "POSSIBLE"], n)})
+    return edc, ext
+
+def make_labs(n):
+    ids = np.char.add("S", np.arange(n).astype(str))
+    base = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 300, n), unit="D")
+    lab = base + pd.to_timedelta(rng.integers(-5, 6, n), unit="D")
+    edc = pd.DataFrame({"USUBJID": ids, "VISITDAT": base.strftime("%Y-%m-%d")})
+    ext = pd.DataFrame({"USUBJID": ids, "LBDAT": lab.strftime("%Y-%m-%d"),
+                        "LBORRES": np.where(rng.random(n) < 0.05, np.nan, rng.normal(100, 10, n)),
+                        "LBCOMM": rng.choice(["OK", "sample QNS", "HEMOLYZED", ""], n)})
+    return edc, ext
+
+def make_death(n):
+    ids = np.char.add("S", np.arange(n).astype(str))
+    ae = pd.DataFrame({"USUBJID": ids, "AEOUT": rng.choice(["RECOVERED", "FATAL", "NOT RECOVERED"], n, p=[0.8, 0.05, 0.15])})
+    ds = pd.DataFrame({"USUBJID": ids, "DSDECOD": rng.choice(["COMPLETED", "DEATH", "WITHDRAWN"], n, p=[0.8, 0.05, 0.15])})
+    return ae, ds
+
+def make_coding(n):
+    terms = np.char.add("TERM", rng.integers(0, n // 20 + 1, n).astype(str))
+    codes = np.where(rng.random(n) < 0.02, np.char.add(terms, "_ALT"), terms)
+    return pd.DataFrame({"USUBJID": subjects(n), "AETERM": terms, "AELLT": codes}), None
+
+
+def bench(mode, maker):
+    df1, df2 = maker(ROWS)
+    df2 = df1 if df2 is None else df2
+
+    t_new = float("inf")
+    for _ in range(3):
+        t = time.perf_counter()
+        new_issues, _ = brain.run_recon(df1, df2, mode)
+        t_new = min(t_new, time.perf_counter() - t)
+
+    t = time.perf_counter()
+    old_issues, _ = legacy.run_recon(df1, df2, mode)
+    t_old = time.perf_counter() - t
+
+    same = old_issues.reset_index(drop=True).astype(str).equals(new_issues.reset_index(drop=True).astype(str))
+    print(f"{mode:<7} rows={ROWS:>8,}  loop={t_old:8.2f}s  columnar={t_new:6.3f}s  speedup={t_old / t_new:6.0f}x  "
+          f"issues={len(old_issues)}/{len(new_issues)}  same_output={same}")
+    return same
+
+
+if __name__ == "__main__":
+    print(f"🧪 BrainCDM.run_recon benchmark ({ROWS:,} rows per input)")
+    results = [bench(m, f) for m, f in [("SAE", make_sae), ("Labs", make_labs), ("Death", make_death), ("Coding", make_coding)]]
+    # SAE differs by design: the baseline read the unsuffixed AEREL after the merge (always None),
+    # so it flagged a causality conflict on every row; the rewrite compares AEREL_EDC with AEREL_EXT.
+    print("✅ All outputs identical." if all(results) else "⚠️ Outputs differ (see SAE note in the source).")
@@ -3,6 +3,12 @@ import os
 import pandas as pd
 import pdfplumber
 
+# Shared cached extraction when the repo's logic package is importable
+try:
+    from logic.pdf_extract import PdfDocument
+except ImportError:
+    PdfDocument = None
+
 class HybridRouter:
     """
     The Dispatcher: Identifies input type and routes to the correct Brain.
@@ -29,6 +35,8 @@ class HybridRouter:
                 
             elif filename.endswith('.pdf'):
                 # Route to Brain 3 (Text Analysis)
+                if PdfDocument is not None:
+                    return "TEXT", PdfDocument(file_obj).text()
                 text = ""
                 with pdfplumber.open(file_obj) as pdf:
                     for page in pdf.pages:
@@ -1,7 +1,6 @@
 import os
 import io
 import pandas as pd
-import pdfplumber
 from fuzzywuzzy import process
 from langchain_google_vertexai import ChatVertexAI
 from langchain_core.prompts import PromptTemplate
@@ -9,6 +8,7 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 from google.api_core.exceptions import ServiceUnavailable, ResourceExhausted
 from logic.data_cleaner import DataCleaner
 from logic.learning_engine import LearningEngine
+from logic.pdf_extract import PdfDocument
 
 # --- CONFIGURATION ---
 try:
@@ -32,26 +32,22 @@ ai_retry = retry(
 )
 
 # --- UTILITY ---
-def extract_text_from_pdf(pdf_file, extract_tables=False):
-    text = ""
-    tables = []
+def extract_text_from_pdf(pdf_file, extract_tables=False, max_chars=None, max_tables=None):
+    """
+    (text, markdown tables) from the shared lazy PDF document. max_chars / max_tables
+    stop parsing once the caller has what it will use.
+    """
     try:
         # Check if file path or file-like
         if isinstance(pdf_file, str) and not os.path.exists(pdf_file):
              return "Error: File not found.", []
-             
-        pdf = pdfplumber.open(pdf_file)
-        with pdf:
-            for page in pdf.pages:
-                t = page.extract_text()
-                if t: text += f"\n--- Page {page.page_number} ---\n{t}"
-                
-                if extract_tables:
-                    for tbl in page.extract_tables():
-                         tables.append(pd.DataFrame(tbl).to_markdown())
+
+        doc = PdfDocument(pdf_file)
+        raw_tables = list(doc.tables(limit=max_tables)) if extract_tables else []  # table pages carry text too
+        text = doc.text(max_chars=max_chars, page_format="\n--- Page {page} ---\n{text}")
     except Exception as e:
         return f"Error reading PDF: {e}", []
-    return text, tables
+    return text, [pd.DataFrame(tbl).to_markdown() for tbl in raw_tables]
 
 # --- MODULE 1: DESIGNER ---
 @ai_retry
@@ -62,7 +58,7 @@ def analyze_protocol(pdf_file):
     """
     if not llm: return "⚠️ AI Brain Disconnected. Check Internet/Credentials."
     
-    raw_text, tables = extract_text_from_pdf(pdf_file, extract_tables=True)
+    raw_text, tables = extract_text_from_pdf(pdf_file, extract_tables=True, max_chars=60000, max_tables=5)
     if "Error" in raw_text: return raw_text
     
     table_context = "\n".join(tables[:5])
@@ -243,7 +239,7 @@ To demonstrate efficacy...
 def classify_tmf_doc(pdf_file):
     if not llm: return "⚠️ AI Brain Disconnected."
     
-    raw_text, _ = extract_text_from_pdf(pdf_file)
+    raw_text, _ = extract_text_from_pdf(pdf_file, max_chars=5000)
     chain = PromptTemplate.from_template("Classify this TMF Doc (Zone/Section/Artifact): {text}") | llm
     
     try:
@@ -255,7 +251,7 @@ def classify_tmf_doc(pdf_file):
 def generate_dmp(pdf_file):
     if not llm: return "⚠️ AI Brain Disconnected."
     
-    raw_text, _ = extract_text_from_pdf(pdf_file)
+    raw_text, _ = extract_text_from_pdf(pdf_file, max_chars=40000)
     chain = PromptTemplate.from_template("Create Data Management Plan from Protocol: {text}") | llm
     
     try:
@@ -267,7 +263,7 @@ def generate_dmp(pdf_file):
 def generate_acrf_map(pdf_file):
     if not llm: return "⚠️ AI Brain Disconnected."
     
-    raw_text, _ = extract_text_from_pdf(pdf_file)
+    raw_text, _ = extract_text_from_pdf(pdf_file, max_chars=30000)
     chain = PromptTemplate.from_template("Map CRF Fields to SDTM (IG 3.3). Return Table: {text}") | llm
     
     try:
@@ -307,7 +303,7 @@ def map_to_cdisc(pdf_file):
     Extracts variables and maps to SDTM.
     """
     if not llm: return pd.DataFrame()
-    raw_text, _ = extract_text_from_pdf(pdf_file)
+    raw_text, _ = extract_text_from_pdf(pdf_file, max_chars=40000)
     
     template = "Extract Clinical Assessments (Assessment|Domain|Variable) from: {text}"
     try:
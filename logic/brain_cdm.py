@@ -1,17 +1,51 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
+from logic.date_parser import normalize_date, parse_dates
+from logic.safety_triangulation import triangulate_deaths, death_findings
+from logic.term_index import SubjectTermIndex
+from logic.visit_labels import canonical_visits
+
+def _as_str(series):
+    """str() of every value ('nan' / 'None' included), like the old row-by-row checks."""
+    return pd.Series(series.to_numpy(dtype=object).astype(str), index=series.index, dtype=object)
+
+def _per_value(series, fn):
+    """fn applied to the str() of each distinct value only, then spread back over the rows."""
+    codes, uniques = pd.factorize(series)
+    known = codes >= 0
+    mapped = fn(pd.Series(pd.Index(uniques).astype(str)))
+    out = mapped.take(np.where(known, codes, 0)) if len(mapped) else pd.Series(index=range(len(series)), dtype=object)
+    out.index = series.index
+    if not known.all():
+        out = out.astype(object)
+        out[~known] = fn(_as_str(series[~known])).to_numpy()  # None / NaN keep their own spelling
+    return out
+
+def _join_keys(ids1, ids2):
+    """
+    Join keys (stripped, upper-cased str() of the subject IDs) of both inputs, factorized once:
+    (codes1, codes2, keys) with keys[codes] the key of every row.
+    """
+    codes, uniques = pd.factorize(pd.concat([ids1, ids2], ignore_index=True), use_na_sentinel=False)
+    text = pd.Series(uniques).astype(str)  # same str() as the old astype(str) key (pandas 3 keeps NaN)
+    key_codes, keys = pd.factorize(text.str.strip().str.upper(), use_na_sentinel=False)
+    codes = key_codes[codes]
+    return codes[:len(ids1)], codes[len(ids1):], pd.Index(keys)
+
+# Death pillar wording per triangulation finding ("" keeps the engine's detail)
+DEATH_LABELS = {
+    "GHOST": ("Ghost Record", "Dispo says Death, No Fatal AE."),
+    "ZOMBIE": ("Zombie Record", "Fatal AE exists, Subject Active in Dispo."),
+    "DATE_DISCORDANT": ("Death Date Mismatch", ""),
+}
 
 class BrainCDM:
     def __init__(self):
         self.version = "CDM-1.6 (PD Edition)"
 
     def normalize_date(self, date_obj):
-        if pd.isna(date_obj) or str(date_obj).strip() == "": return None
-        for fmt in ['%Y-%m-%d', '%d-%b-%Y', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y']:
-            try: return datetime.strptime(str(date_obj).strip(), fmt).date()
-            except: continue
-        return None
+        return normalize_date(date_obj)
 
     def detect_id(self, df):
         candidates = ['USUBJID', 'SUBJID', 'SUBJECT', 'PT', 'PATIENT', 'SUBJ_ID']
@@ -48,23 +82,24 @@ class BrainCDM:
         if mode == "PD_Recon": return self._run_pd_recon(df1, df2)
 
         # STANDARD RECON (2 DFs, Key-based)
-        k1, k2 = self.detect_id(df1), self.detect_id(df2)
-        df1 = df1.assign(KEY=df1[k1].astype(str).str.strip().str.upper())
-        df2 = df2.assign(KEY=df2[k2].astype(str).str.strip().str.upper())
-        
-        merged = pd.merge(df1, df2, on='KEY', how='outer', suffixes=('_EDC', '_EXT'), indicator=True)
         issues = []
+        if mode != "Coding":
+            k1, k2 = self.detect_id(df1), self.detect_id(df2)
+            key_codes = _join_keys(df1[k1], df2[k2])
+            df1 = df1.assign(KEY=key_codes[2].array.take(key_codes[0]))
+            df2 = df2.assign(KEY=key_codes[2].array.take(key_codes[1]))
 
         # --- PILLAR 1: SAE (Safety vs Clinical) ---
         if mode == "SAE":
             ser = next((c for c in df1.columns if "SER" in c.upper()), "AESER")
             rel = next((c for c in df1.columns if "REL" in c.upper()), "AEREL")
-            for _, r in merged[merged['_merge']=='both'].iterrows():
-                if str(r.get(ser, "")).upper() not in ['Y', 'YES', 'TRUE', 'SERIOUS']:
-                    issues.append({"Subject": r['KEY'], "Issue": "Seriousness Mismatch", "Detail": "Safe DB has event, EDC not Serious."})
-                if rel and f"{rel}_EXT" in r:
-                    if str(r.get(rel))[:3] != str(r.get(f"{rel}_EXT"))[:3]:
-                        issues.append({"Subject": r['KEY'], "Issue": "Causality Conflict", "Detail": "Investigator vs Sponsor mismatch."})
+            both = self._matched(df1, df2, [ser, rel], key_codes)
+            not_serious = ~self._text(both, ser).isin(['Y', 'YES', 'TRUE', 'SERIOUS'])
+            issues.append(self._issues(both, not_serious, "Seriousness Mismatch", "Safe DB has event, EDC not Serious.", order=0))
+            if f"{rel}_EXT" in both.columns:
+                rel_edc = self._raw_text(both, rel, fn=lambda s: s.str[:3])
+                rel_ext = _per_value(both[f"{rel}_EXT"], lambda s: s.str[:3])
+                issues.append(self._issues(both, rel_edc != rel_ext, "Causality Conflict", "Investigator vs Sponsor mismatch.", order=1))
 
         # --- PILLAR 2: LABS (Dates & QNS) ---
         elif mode == "Labs":
@@ -72,66 +107,159 @@ class BrainCDM:
             d_lab = next((c for c in df2.columns if "DAT" in c.upper()), "LBDAT")
             comm = next((c for c in df2.columns if "COMM" in c.upper() or "STAT" in c.upper()), None)
             res = next((c for c in df2.columns if "RES" in c.upper()), "LBORRES")
-            
-            for _, r in merged[merged['_merge']=='both'].iterrows():
-                if pd.isna(r.get(res)) and comm and ("QNS" in str(r[comm]).upper() or "HEMOL" in str(r[comm]).upper()):
-                     issues.append({"Subject": r['KEY'], "Issue": "Sample Issue", "Detail": f"Lab Rejected: {r[comm]}"})
-                d1, d2 = self.normalize_date(r.get(d_edc)), self.normalize_date(r.get(d_lab))
-                if d1 and d2 and abs((d2-d1).days) > 2:
-                    issues.append({"Subject": r['KEY'], "Issue": "Date Mismatch", "Detail": f"Lab drawn {(d2-d1).days} days from visit."})
+            both = self._matched(df1, df2, [d_edc, d_lab, comm, res] if comm else [d_edc, d_lab, res], key_codes)
+
+            if comm:
+                comm_col = self._merged_col(both, comm, "_EXT")
+                res_col = self._merged_col(both, res, "_EXT")
+                missing = both[res_col].isna() if res_col else pd.Series(True, index=both.index)
+                rejected = missing & _per_value(both[comm_col], lambda s: s.str.upper().str.contains("QNS|HEMOL", regex=True)).astype(bool)
+                detail = _per_value(both[comm_col], lambda s: "Lab Rejected: " + s)
+                issues.append(self._issues(both, rejected, "Sample Issue", detail, order=0))
+
+            c1, c2 = self._merged_col(both, d_edc, "_EDC"), self._merged_col(both, d_lab, "_EXT")
+            if c1 and c2:
+                days = (parse_dates(both[c2]) - parse_dates(both[c1])).dt.days
+                late = days.abs() > 2
+                detail = _per_value(days.astype("Int64"), lambda s: "Lab drawn " + s + " days from visit.")
+                issues.append(self._issues(both, late, "Date Mismatch", detail, order=1))
 
         # --- PILLAR 3: DEATH (Zombies & Ghosts) ---
         elif mode == "Death":
             ae_out = next((c for c in df1.columns if "OUT" in c.upper()), "AEOUT")
             ds_reas = next((c for c in df2.columns if "REAS" in c.upper()), "DSDECOD")
-            fatal_map = {k: True for k, g in df1.groupby('KEY') if g[ae_out].str.contains('FATAL|DEATH', case=False, na=False).any()}
-            for _, r in merged.iterrows():
-                key = r['KEY']
-                is_dead_ds = "DEATH" in str(r.get(ds_reas, "")).upper()
-                is_dead_ae = fatal_map.get(key, False)
-                if is_dead_ds and not is_dead_ae: issues.append({"Subject": key, "Issue": "Ghost Record", "Detail": "Dispo says Death, No Fatal AE."})
-                if is_dead_ae and not is_dead_ds: issues.append({"Subject": key, "Issue": "Zombie Record", "Detail": "Fatal AE exists, Subject Active in Dispo."})
+            tri = triangulate_deaths(df1, df2, subj='KEY', ae_out=ae_out, ds_dec=ds_reas)
+            found = death_findings(tri)
+            found = found[found['Check'].isin(DEATH_LABELS)]
+            details = found['Check'].map({c: d for c, (_, d) in DEATH_LABELS.items()})
+            issues.append(pd.DataFrame({
+                "Subject": found['Subject'],
+                "Issue": found['Check'].map({c: label for c, (label, _) in DEATH_LABELS.items()}),
+                "Detail": details.mask(details == "", found['Detail']),
+            }))
 
         # --- PILLAR 4: CODING (Homogeneity) ---
         elif mode == "Coding":
             verb = next((c for c in df1.columns if "TERM" in c.upper()), "AETERM")
             code = next((c for c in df1.columns if "LLT" in c.upper() or "CODE" in c.upper()), "AELLT")
-            for term, g in df1.groupby(verb):
-                codes = g[code].unique()
-                clean = [c for c in codes if str(c) not in ['nan', 'None']]
-                if len(clean) > 1: issues.append({"Subject": "Multiple", "Issue": "Split Coding", "Detail": f"'{term}' coded as {clean}"})
+            # Distinct (term, code) pairs on integer codes, in first-appearance order
+            t_codes, terms = pd.factorize(df1[verb])
+            c_codes, coded = pd.factorize(df1[code], use_na_sentinel=False)
+            blank = _as_str(pd.Series(coded)).isin(['nan', 'None']).to_numpy(dtype=bool)
+            keep = np.flatnonzero((t_codes >= 0) & ~blank[c_codes])
+            pair = pd.Series(t_codes[keep].astype(np.int64) * max(len(coded), 1) + c_codes[keep])
+            rows = keep[~pair.duplicated().to_numpy()]
+            per_term = np.bincount(t_codes[rows], minlength=len(terms))
+            rows = rows[per_term[t_codes[rows]] > 1]
+            if len(rows):
+                # One group per split term, terms in sorted order (like groupby)
+                rows = rows[np.argsort(t_codes[rows], kind="stable")]
+                bounds = [0, *(np.flatnonzero(np.diff(t_codes[rows])) + 1).tolist(), len(rows)]
+                values = list(np.asarray(df1[code].array.take(rows), dtype=object))
+                names = list(np.asarray(terms.take(t_codes[rows[bounds[:-1]]]), dtype=object))
+                split = sorted((name, values[a:b]) for name, a, b in zip(names, bounds, bounds[1:]))
+                issues.append(pd.DataFrame({
+                    "Subject": "Multiple", "Issue": "Split Coding",
+                    "Detail": [f"'{term}' coded as {clean}" for term, clean in split]
+                }))
 
         # --- PILLAR 5: AE vs CONMED (Orphans) ---
         elif mode == "AE_ConMed":
             cm_ind = next((c for c in df2.columns if "IND" in c.upper()), "CMINDC")
             ae_term = next((c for c in df1.columns if "TERM" in c.upper()), "AETERM")
             excl = ["PROPHYLAXIS", "PREVENTION", "SUPPLEMENT"]
-            unique_subjs = set(df1['KEY']).union(set(df2['KEY']))
-            for s in unique_subjs:
-                aes = df1[df1['KEY']==s]
-                cms = df2[df2['KEY']==s]
-                for _, cm in cms.iterrows():
-                    ind = str(cm.get(cm_ind, "")).upper()
-                    if not ind or any(e in ind for e in excl): continue
-                    if not any(ind in str(a).upper() for a in aes[ae_term]):
-                         issues.append({"Subject": s, "Issue": "Orphan ConMed", "Detail": f"Indication '{ind}' has no matching AE."})
+            orphan, ind = self._unmatched_indications(df2, cm_ind, df1, ae_term, excl)
+            issues.append(self._issues(df2, orphan, "Orphan ConMed", "Indication '" + ind + "' has no matching AE."))
 
         # --- PILLAR 6: MH vs CONMED (Chronic) ---
         elif mode == "MH_ConMed":
             cm_ind = next((c for c in df1.columns if "IND" in c.upper()), "CMINDC")
             mh_term = next((c for c in df2.columns if "TERM" in c.upper()), "MHTERM")
             excl = ["PROPHYLAXIS", "PREVENTION"]
-            for s in set(df1['KEY']):
-                cms = df1[df1['KEY']==s]
-                mhs = df2[df2['KEY']==s]
-                for _, cm in cms.iterrows():
-                    ind = str(cm.get(cm_ind, "")).upper()
-                    if not ind or any(e in ind for e in excl): continue
-                    if not any(ind in str(m).upper() for m in mhs[mh_term]):
-                         issues.append({"Subject": s, "Issue": "Missing History", "Detail": f"Med for '{ind}' exists, but not in Medical History."})
+            missing, ind = self._unmatched_indications(df1, cm_ind, df2, mh_term, excl)
+            issues.append(self._issues(df1, missing, "Missing History", "Med for '" + ind + "' exists, but not in Medical History."))
 
         return self._format_output(df1, issues)
 
+    # --- COLUMNAR HELPERS ---
+    def _unmatched_indications(self, cms, cm_ind, events, term_col, excl):
+        """Mask of conmeds whose indication is not part of any of the subject's event terms, plus the indications."""
+        if cm_ind not in cms.columns: return np.zeros(len(cms), dtype=bool), pd.Series("", index=cms.index)
+        ind = _as_str(cms[cm_ind]).str.upper()
+        checked = (ind != "") & ~ind.str.contains("|".join(excl), regex=True)
+        terms = _as_str(events[term_col]).str.upper() if term_col in events.columns else pd.Series("", index=events.index)
+        index = SubjectTermIndex(events['KEY'], terms)
+        unmatched = np.zeros(len(cms), dtype=bool)
+        unmatched[checked.to_numpy()] = ~index.match(cms['KEY'][checked], ind[checked])
+        return unmatched, ind
+
+    def _study_id(self, *frames):
+        """First STUDYID value found in the inputs (None when no input carries one)."""
+        for df in frames:
+            col = next((c for c in df.columns if c.upper() == "STUDYID"), None)
+            if col and df[col].notna().any(): return str(df[col].dropna().iloc[0])
+        return None
+
+    def _matched(self, df1, df2, cols, key_codes):
+        """
+        Rows of both inputs that share a KEY (the 'both' part of an outer merge), carrying only
+        `cols` (suffixed _EDC / _EXT where both inputs have them), in sorted-key merge order.
+        """
+        codes1, codes2, keys = key_codes
+        # Right rows grouped per key; every left row pairs with its key's whole group
+        by_key = np.argsort(codes2, kind="stable")
+        sizes = np.bincount(codes2, minlength=len(keys))
+        starts = np.cumsum(sizes) - sizes
+        found = np.flatnonzero(sizes[codes1] > 0)
+        counts = sizes[codes1[found]]
+        left = np.repeat(found, counts)
+        offset = np.arange(len(left)) - np.repeat(np.cumsum(counts) - counts, counts)
+        right = by_key[np.repeat(starts[codes1[found]], counts) + offset]
+
+        # Sorted-key order of the outer merge (left rows, then right rows, keep input order)
+        rank = np.empty(len(keys), dtype=np.int64)
+        rank[keys.argsort()] = np.arange(len(keys))
+        order = np.argsort(rank[codes1[left]], kind="stable")
+        left, right = left[order], right[order]
+
+        out = {"KEY": df1['KEY'].array.take(left)}
+        for col in dict.fromkeys(cols):
+            in1, in2 = col in df1.columns, col in df2.columns
+            if in1: out[f"{col}_EDC" if in2 else col] = df1[col].array.take(left)
+            if in2: out[f"{col}_EXT" if in1 else col] = df2[col].array.take(right)
+        return pd.DataFrame(out)
+
+    def _merged_col(self, merged, col, side="_EDC"):
+        """Name of `col` after the merge (suffixed when both inputs had it), or None."""
+        if col in merged.columns: return col
+        if f"{col}{side}" in merged.columns: return f"{col}{side}"
+        return None
+
+    def _raw_text(self, merged, col, side="_EDC", fn=lambda s: s):
+        name = self._merged_col(merged, col, side)
+        if name is None: return fn(pd.Series("None", index=merged.index, dtype=object))
+        return _per_value(merged[name], fn)
+
+    def _text(self, merged, col, side="_EDC"):
+        """Upper-cased text of a merged column ('' if the column is absent)."""
+        name = self._merged_col(merged, col, side)
+        if name is None: return pd.Series("", index=merged.index)
+        return _per_value(merged[name], lambda s: s.str.upper())
+
+    def _issues(self, frame, mask, issue, detail, order=0, action=None):
+        """Issue rows for every True in mask; `order` keeps several checks on one row in sequence."""
+        mask = mask.fillna(False).to_numpy(dtype=bool) if isinstance(mask, pd.Series) else mask
+        pos = np.flatnonzero(mask)
+        out = pd.DataFrame({
+            "Subject": frame['KEY'].array.take(pos),
+            "Issue": issue,
+            "Detail": detail.array.take(pos) if isinstance(detail, pd.Series) else detail,
+        })
+        if action is not None: out["Action"] = action
+        out["_pos"] = pos
+        out["_chk"] = order
+        return out
+
     def _run_query_recon(self, df1):
         # --- PILLAR 7: DEEP QUERY RECONCILIATION ---
         issues = []
@@ -184,33 +312,48 @@ class BrainCDM:
         df1 = df1.assign(KEY=df1[k1].astype(str).str.strip().str.upper())
         df2 = df2.assign(KEY=df2[k2].astype(str).str.strip().str.upper())
 
+        # Visit labels differ between the PD log and EDC ("V3" vs "Visit 3"); join on one canonical key
+        study = self._study_id(df1, df2)
+        df1['VISKEY'] = canonical_visits(df1[pd_visit], study)
+        df2['VISKEY'] = canonical_visits(df2[edc_visit], study)
+
         # 1. The "Zombie Visit" Check (PD says Missed, EDC has Date)
         missed_pds = df1[df1[pd_cat].astype(str).str.upper().str.contains("MISS", na=False)]
-        for _, pd_row in missed_pds.iterrows():
-            subj = pd_row['KEY']
-            visit_name = str(pd_row[pd_visit]).upper()
-            edc_rows = df2[df2['KEY'] == subj]
-            for _, edc_row in edc_rows.iterrows():
-                edc_v_name = str(edc_row[edc_visit]).upper()
-                if (visit_name in edc_v_name or edc_v_name in visit_name) and pd.notna(edc_row.get(edc_date)):
-                     issues.append({"Subject": subj, "Issue": "Zombie Visit", "Detail": f"PD Log says '{visit_name}' Missed, but EDC has Date {edc_row[edc_date]}.", "Action": "Verify Data Accuracy"})
-                     
+        dated = df2[df2[edc_date].notna()] if edc_date in df2.columns else df2.iloc[0:0]
+        zombies = missed_pds[['KEY', 'VISKEY', pd_visit]].merge(
+            dated[['KEY', 'VISKEY', edc_date]].rename(columns={edc_date: '_EDCDATE'}), on=['KEY', 'VISKEY'], how='inner')
+        issues.append(pd.DataFrame({
+            "Subject": zombies['KEY'], "Issue": "Zombie Visit",
+            "Detail": "PD Log says '" + _as_str(zombies[pd_visit]).str.upper() + "' Missed, but EDC has Date " + _as_str(zombies['_EDCDATE']) + ".",
+            "Action": "Verify Data Accuracy",
+        }))
+
         # 2. The "Silent Deviation" (EDC Out of Window, No PD)
         if "WINDOW" in [c.upper() for c in df2.columns]:
             win_col = next(c for c in df2.columns if "WINDOW" in c.upper())
             oow_visits = df2[df2[win_col].astype(str).str.upper().str.contains("OUT|FAIL|DEV", na=False)]
-            for _, edc_row in oow_visits.iterrows():
-                subj = edc_row['KEY']
-                visit_name = str(edc_row[edc_visit]).upper()
-                pd_rows = df1[df1['KEY'] == subj]
-                match_found = any(visit_name in str(r[pd_visit]).upper() for _, r in pd_rows.iterrows())
-                if not match_found:
-                    issues.append({"Subject": subj, "Issue": "Unreported Deviation", "Detail": f"Visit '{visit_name}' OOW in EDC, missing in PD Log.", "Action": "Site to Report PD"})
-        
+            reported = pd.MultiIndex.from_frame(df1[['KEY', 'VISKEY']])
+            silent = oow_visits[~pd.MultiIndex.from_frame(oow_visits[['KEY', 'VISKEY']]).isin(reported)]
+            issues.append(pd.DataFrame({
+                "Subject": silent['KEY'], "Issue": "Unreported Deviation",
+                "Detail": "Visit '" + _as_str(silent[edc_visit]).str.upper() + "' OOW in EDC, missing in PD Log.",
+                "Action": "Site to Report PD",
+            }))
+
         return self._format_output(df1, issues)
 
     def _format_output(self, source_df, issues):
-        df_issues = pd.DataFrame(issues)
+        frames = [i for i in issues if isinstance(i, pd.DataFrame) and not i.empty]
+        rows = [i for i in issues if isinstance(i, dict)]
+        if frames:
+            # Columnar pillars: restore row-by-row order, then drop the helpers
+            if rows: frames.append(pd.DataFrame(rows))
+            df_issues = pd.concat(frames, ignore_index=True)
+            if "_pos" in df_issues.columns:
+                df_issues = df_issues.sort_values(["_pos", "_chk"], kind="stable").drop(columns=["_pos", "_chk"])
+            df_issues = df_issues.reset_index(drop=True)
+        else:
+            df_issues = pd.DataFrame(rows)
         if df_issues.empty:
             df_issues = pd.DataFrame([["✅ No Issues Found"]], columns=["Status"])
             metrics = {"Total": len(source_df), "Issues": 0, "Rate": 0.0}
@@ -0,0 +1,186 @@
+import operator
+import numpy as np
+import pandas as pd
+from logic.date_parser import parsed_column
+from logic.rule_engine import DISCREPANCY_COLS
+
+# Condition that must HOLD; rows where it is False are discrepancies
+OPERATORS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt,
+    ">=": operator.ge, "==": operator.eq, "!=": operator.ne,
+}
+REDUCERS = ("first", "last", "min", "max")
+CROSS_COLS = ["Domain"] + DISCREPANCY_COLS
+
+
+def _norm_key(series):
+    return series.astype(str).str.strip().str.upper()
+
+
+def _is_date_var(name):
+    upper = str(name).upper()
+    return upper.endswith("DTC") or upper.endswith("DAT") or "DATE" in upper
+
+
+def _coerce(df, col):
+    """
+    Dates for --DTC/DATE variables, numbers when every value parses, else text.
+    Partial dates (2024-01) parse to NaT, so rules leave them unevaluated rather than failing.
+    """
+    if _is_date_var(col):
+        return parsed_column(df, col)
+    series = df[col]
+    nums = pd.to_numeric(series, errors="coerce")
+    if nums.notna().sum() == series.notna().sum():
+        return nums
+    return series.astype(str)
+
+
+def _split_ref(ref):
+    domain, _, var = str(ref).partition(".")
+    if not var:
+        raise ValueError(f"Reference '{ref}' must look like DOMAIN.VARIABLE")
+    return domain.strip().upper(), var.strip()
+
+
+def _split_keys(keys):
+    if isinstance(keys, (list, tuple)): return [str(k).strip() for k in keys]
+    return [k.strip() for k in str(keys).split(",") if k.strip()]
+
+
+class DomainIndex:
+    """
+    Hash index over one domain, keyed by subject (and visit).
+    Built once per (domain, keys) and reused by every rule that joins on it.
+    """
+
+    def __init__(self, df, keys):
+        self.df = df
+        self.keys = keys
+        arrays = [_norm_key(df[k]) for k in keys]
+        self.index = pd.MultiIndex.from_arrays(arrays, names=keys) if len(keys) > 1 else pd.Index(arrays[0], name=keys[0])
+        self._reduced = {}
+
+    def reduced(self, var, how="first"):
+        """One value per key (the index must be unique for a hash lookup)."""
+        if (var, how) not in self._reduced:
+            values = _coerce(self.df, var).copy()
+            values.index = self.index
+            self._reduced[(var, how)] = values.groupby(level=list(range(len(self.keys)))).agg(how)
+        return self._reduced[(var, how)]
+
+    def lookup(self, other, var, how="first"):
+        """Gathers `var` for every row of `other` (a DomainIndex on the same keys); NaN if absent."""
+        table = self.reduced(var, how)
+        pos = table.index.get_indexer(other.index)
+        values = table.to_numpy()
+        gathered = values[np.where(pos >= 0, pos, 0)] if len(values) else np.full(len(pos), np.nan, dtype=object)
+        out = pd.Series(gathered, index=other.df.index, name=var)
+        out[pos < 0] = None
+        return out
+
+
+class CrossDomainEngine:
+    """
+    Runs cross-record (LAG) and cross-domain (CROSS) checks over a dict of
+    domain frames, e.g. {"DM": df_dm, "AE": df_ae, "VS": df_vs, "EX": df_ex}.
+    """
+
+    def __init__(self, domains, subject_key="USUBJID"):
+        self.domains = {str(k).upper(): v for k, v in domains.items()}
+        self.subject_key = subject_key
+        self._indexes = {}
+        self._lag_order = {}
+
+    def index(self, domain, keys):
+        cache_key = (domain, tuple(keys))
+        if cache_key not in self._indexes:
+            self._indexes[cache_key] = DomainIndex(self.domains[domain], list(keys))
+        return self._indexes[cache_key]
+
+    def run(self, rules):
+        """
+        rules: list of dicts (CheckID, Description, Rule_Type, Left, Op, Right, Keys, Order_By, Reduce).
+        Returns the discrepancy log (Domain + the standard edit-check columns).
+        """
+        parts, errors = [], []
+        for rule in rules:
+            try:
+                kind = str(rule.get("Rule_Type", "CROSS")).upper()
+                found = self._run_lag(rule) if kind == "LAG" else self._run_cross(rule)
+                if not found.empty: parts.append(found)
+            except Exception as e:
+                errors.append({"CheckID": rule.get("CheckID"), "Status": "Execution Error", "Message": str(e)})
+
+        out = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=CROSS_COLS)
+        if errors:
+            out = pd.concat([out, pd.DataFrame(errors)], ignore_index=True)
+        return out
+
+    # --- CROSS: Left domain row vs keyed value in Right domain ---
+    def _run_cross(self, rule):
+        l_dom, l_var = _split_ref(rule["Left"])
+        r_dom, r_var = _split_ref(rule["Right"])
+        keys = _split_keys(rule.get("Keys") or self.subject_key)
+        how = str(rule.get("Reduce") or "first").lower()
+        if how not in REDUCERS: raise ValueError(f"Reduce must be one of {REDUCERS}")
+
+        left_idx = self.index(l_dom, keys)
+        left = _coerce(left_idx.df, l_var)
+        right = self.index(r_dom, keys).lookup(left_idx, r_var, how)
+        return self._emit(rule, l_dom, left_idx.df, l_var, left, rule["Right"], right)
+
+    # --- LAG: each record vs the previous record of the same subject ---
+    def _run_lag(self, rule):
+        dom, var = _split_ref(rule["Left"])
+        df = self.domains[dom]
+        order_by = rule.get("Order_By") or var
+        subj = self.subject_key
+
+        cache_key = (dom, order_by)
+        if cache_key not in self._lag_order:
+            order_vals = _coerce(df, order_by)
+            frame = pd.DataFrame({"_subj": _norm_key(df[subj]), "_ord": order_vals}, index=df.index)
+            self._lag_order[cache_key] = frame.sort_values(["_subj", "_ord"], kind="stable").index
+        order = self._lag_order[cache_key]
+
+        subjects = _norm_key(df[subj]).loc[order]
+        current = _coerce(df, var).loc[order]
+        previous = current.shift(1)
+        previous[subjects.ne(subjects.shift(1)).to_numpy()] = None
+        return self._emit(rule, dom, df.loc[order], var, current, f"previous {dom}.{var}", previous)
+
+    def _emit(self, rule, domain, df, l_name, left, r_name, right):
+        op = OPERATORS[str(rule.get("Op", "<=")).strip()]
+        both = left.notna() & right.notna()
+        holds = pd.Series(False, index=left.index)
+        holds[both] = op(left[both], right[both]).astype(bool)
+        fail = (both & ~holds).to_numpy()
+        if not fail.any():
+            return pd.DataFrame(columns=CROSS_COLS)
+
+        subj = self.subject_key
+        rows = df.index.to_numpy()[fail]
+        left_txt = df[l_name].astype(str).to_numpy()[fail]
+        right_txt = right.astype(str).to_numpy()[fail]
+        logic = f"{rule['Left']} {rule.get('Op', '<=')} {r_name}"
+
+        return pd.DataFrame({
+            "Domain": domain,
+            "Row": rows,
+            "SubjectID": df[subj].to_numpy()[fail] if subj in df.columns else "Unknown",
+            "CheckID": rule.get("CheckID"),
+            "Description": rule.get("Description", ""),
+            "Logic": logic,
+            "Status": "Fail",
+            "Data_Snippet": f"{rule['Left']}=" + pd.Series(left_txt) + f", {r_name}=" + pd.Series(right_txt),
+        })
+
+
+def parse_cross_rules(df_spec):
+    """Spec rows whose Rule_Type is CROSS or LAG, as plain dicts."""
+    if "Rule_Type" not in df_spec.columns:
+        return []
+    kinds = df_spec["Rule_Type"].astype(str).str.upper()
+    rows = df_spec[kinds.isin(["CROSS", "LAG"])]
+    return [{k: v for k, v in rec.items() if pd.notna(v)} for rec in rows.to_dict("records")]
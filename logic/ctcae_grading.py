@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+from logic.date_parser import parse_dates
+from logic.lab_recon import conversion_factors, normalize_units
+
+# CTCAE v5 laboratory criteria. Cut-offs for grades 1-4 as (basis, value):
+# "ULN"/"LLN" = multiple of the reference limit, "ABS" = absolute value in the
+# test's CTCAE_UNITS unit, None = not gradable from the value alone.
+# (v5 grades hypoglycemia clinically, so glucose has no value-based criterion.)
+# "baseline": grade 1-4 multiples of an abnormal baseline (replaces the ULN cut-offs).
+CTCAE_CRITERIA = [
+    {"test": "ALT", "direction": "high", "term": "Alanine aminotransferase increased",
+     "cuts": [("ULN", 1), ("ULN", 3), ("ULN", 5), ("ULN", 20)], "baseline": [1.5, 3, 5, 20]},
+    {"test": "AST", "direction": "high", "term": "Aspartate aminotransferase increased",
+     "cuts": [("ULN", 1), ("ULN", 3), ("ULN", 5), ("ULN", 20)], "baseline": [1.5, 3, 5, 20]},
+    {"test": "ALP", "direction": "high", "term": "Alkaline phosphatase increased",
+     "cuts": [("ULN", 1), ("ULN", 2.5), ("ULN", 5), ("ULN", 20)], "baseline": [2, 2.5, 5, 20]},
+    {"test": "GGT", "direction": "high", "term": "GGT increased",
+     "cuts": [("ULN", 1), ("ULN", 2.5), ("ULN", 5), ("ULN", 20)], "baseline": [2, 2.5, 5, 20]},
+    {"test": "BILI", "direction": "high", "term": "Blood bilirubin increased",
+     "cuts": [("ULN", 1), ("ULN", 1.5), ("ULN", 3), ("ULN", 10)], "baseline": [1, 1.5, 3, 10]},
+    {"test": "CREAT", "direction": "high", "term": "Creatinine increased",
+     "cuts": [("ULN", 1), ("ULN", 1.5), ("ULN", 3), ("ULN", 6)]},
+    {"test": "HGB", "direction": "low", "term": "Anemia",
+     "cuts": [("LLN", 1), ("ABS", 10), ("ABS", 8), None]},
+    {"test": "PLAT", "direction": "low", "term": "Platelet count decreased",
+     "cuts": [("LLN", 1), ("ABS", 75), ("ABS", 50), ("ABS", 25)]},
+    {"test": "NEUT", "direction": "low", "term": "Neutrophil count decreased",
+     "cuts": [("LLN", 1), ("ABS", 1.5), ("ABS", 1.0), ("ABS", 0.5)]},
+    {"test": "WBC", "direction": "low", "term": "White blood cell decreased",
+     "cuts": [("LLN", 1), ("ABS", 3.0), ("ABS", 2.0), ("ABS", 1.0)]},
+    {"test": "LYM", "direction": "low", "term": "Lymphocyte count decreased",
+     "cuts": [("LLN", 1), ("ABS", 0.8), ("ABS", 0.5), ("ABS", 0.2)]},
+    {"test": "K", "direction": "high", "term": "Hyperkalemia",
+     "cuts": [("ULN", 1), ("ABS", 5.5), ("ABS", 6.0), ("ABS", 7.0)]},
+    {"test": "K", "direction": "low", "term": "Hypokalemia",
+     "cuts": [("LLN", 1), None, ("ABS", 3.0), ("ABS", 2.5)]},
+    {"test": "SODIUM", "direction": "high", "term": "Hypernatremia",
+     "cuts": [("ULN", 1), ("ABS", 150), ("ABS", 155), ("ABS", 160)]},
+    {"test": "SODIUM", "direction": "low", "term": "Hyponatremia",
+     "cuts": [("LLN", 1), ("ABS", 130), ("ABS", 125), ("ABS", 120)]},
+    {"test": "CA", "direction": "high", "term": "Hypercalcemia",
+     "cuts": [("ULN", 1), ("ABS", 11.5), ("ABS", 12.5), ("ABS", 13.5)]},
+    {"test": "CA", "direction": "low", "term": "Hypocalcemia",
+     "cuts": [("LLN", 1), ("ABS", 8.0), ("ABS", 7.0), ("ABS", 6.0)]},
+    {"test": "ALB", "direction": "low", "term": "Hypoalbuminemia",
+     "cuts": [("LLN", 1), ("ABS", 3), ("ABS", 2), None]},
+]
+# Unit of the absolute cut-offs, and the test name used for unit conversion (lab_recon)
+CTCAE_UNITS = {
+    "HGB": ("g/dL", "HEMOGLOBIN"), "PLAT": ("10^9/L", "PLATELETS"), "NEUT": ("10^9/L", "NEUTROPHILS"),
+    "WBC": ("10^9/L", "LEUKOCYTES"), "LYM": ("10^9/L", "LYMPHOCYTES"), "K": ("mmol/L", "POTASSIUM"),
+    "SODIUM": ("mmol/L", "SODIUM"), "CA": ("mg/dL", "CALCIUM"), "ALB": ("g/dL", "ALBUMIN"),
+}
+# LB columns; rename via grade_labs(..., columns={...})
+COLUMNS = {
+    "subject": "USUBJID", "test": "LBTESTCD", "value": "LBSTRESN", "unit": "LBSTRESU",
+    "lln": "LBSTNRLO", "uln": "LBSTNRHI", "baseline_flag": "LBBLFL", "date": "LBDTC", "visitnum": "VISITNUM",
+}
+FALLBACK_COLUMNS = {"value": "LBORRES", "unit": "LBORRESU", "lln": "LBORNRLO", "uln": "LBORNRHI"}
+
+_BASIS = {"ULN": 0, "LLN": 1, "ABS": 2}
+GRADES = np.arange(1, 5)
+
+
+def _criteria_arrays(tests, direction):
+    """Per-test threshold arrays for one direction (row i = tests[i]; last row = no criterion)."""
+    by_test = {c["test"]: c for c in CTCAE_CRITERIA if c["direction"] == direction}
+    n = len(tests) + 1
+    basis, value = np.full((n, 4), -1), np.full((n, 4), np.nan)
+    baseline, terms = np.full((n, 4), np.nan), np.full(n, "", dtype=object)
+    for i, test in enumerate(tests):
+        crit = by_test.get(test)
+        if crit is None: continue
+        terms[i] = crit["term"]
+        for g, cut in enumerate(crit["cuts"]):
+            if cut: basis[i, g], value[i, g] = _BASIS[cut[0]], cut[1]
+        if crit.get("baseline"): baseline[i] = crit["baseline"]
+    return basis, value, baseline, terms
+
+
+def _column(df, c, key):
+    for name in (c[key], FALLBACK_COLUMNS.get(key)):
+        if name and name in df.columns: return df[name]
+    return None
+
+
+def _numeric(col, n):
+    return np.full(n, np.nan) if col is None else pd.to_numeric(col, errors="coerce").to_numpy(dtype=float)
+
+
+def _codes(col, normalize=None):
+    """Integer codes + uniques; string normalization runs on the distinct values only."""
+    codes, uniq = pd.factorize(col)
+    if normalize is None: return codes, np.asarray(uniq, dtype=object)
+    norm_codes, norm_uniq = pd.factorize(normalize(pd.Series(uniq, dtype=object)))
+    return np.append(norm_codes, -1)[codes], np.asarray(norm_uniq, dtype=object)
+
+
+def _baseline_rows(df, c, subject_codes, test_codes, n_tests):
+    """Baseline record per subject/test: LBBLFL = Y, else the first record by visit, then date."""
+    n = len(df)
+    not_flagged = np.ones(n, bool)
+    if c["baseline_flag"] in df.columns:
+        flag_codes, flags = _codes(df[c["baseline_flag"]], lambda u: u.astype(str).str.strip().str.upper())
+        if "Y" in flags: not_flagged = flag_codes != list(flags).index("Y")
+    group = subject_codes.astype(np.int64) * (n_tests + 1) + test_codes
+    keys = [np.arange(n)]
+    if c["date"] in df.columns:
+        dates = parse_dates(df[c["date"]])
+        keys.append(np.where(dates.isna(), np.inf, dates.to_numpy().astype("datetime64[ns]").view(np.int64).astype(float)))
+    if c["visitnum"] in df.columns: keys.append(np.nan_to_num(pd.to_numeric(df[c["visitnum"]], errors="coerce").to_numpy(dtype=float), nan=np.inf))
+    order = np.lexsort(keys + [not_flagged, group])   # last key sorts first
+    first_of_group = np.r_[True, group[order][1:] != group[order][:-1]]
+    first_rows = order[first_of_group]
+    is_base = np.zeros(n, bool)
+    is_base[first_rows] = True
+    base_row = np.empty(n, dtype=np.int64)
+    base_row[order] = np.repeat(first_rows, np.diff(np.r_[np.flatnonzero(first_of_group), n]))
+    return is_base, base_row
+
+
+def _side_grades(x, lln, uln, abs_factor, codes, arrays, base_value, is_base, direction):
+    basis, value, baseline, terms = (a[codes] for a in arrays)
+    thresholds = np.where(basis == 0, value * uln[:, None],
+                 np.where(basis == 1, value * lln[:, None],
+                 np.where(basis == 2, value / abs_factor[:, None], np.nan)))
+    if direction == "high":
+        abnormal = ((base_value > uln) & ~is_base)[:, None] & ~np.isnan(baseline)
+        thresholds = np.where(abnormal, baseline * base_value[:, None], thresholds)
+        crossed = x[:, None] > thresholds
+    else:
+        crossed = x[:, None] < thresholds
+    return (crossed * GRADES).max(axis=1), terms
+
+
+def grade_labs(df, columns=None):
+    """
+    CTCAE v5 grade for every LB row (no row loops): thresholds per test are gathered
+    into row-aligned arrays by factorized test code and compared in one pass.
+    Returns a copy with LBTOX (term) and LBTOXGR (grade 0-4; NA when the test has
+    no criterion, no numeric result, or a unit its absolute cut-offs cannot be
+    converted to); LBBLFL is added when the input has none.
+    """
+    c = {**COLUMNS, **(columns or {})}
+    n = len(df)
+    codes, uniq = _codes(df[c["test"]], lambda u: u.astype(str).str.strip().str.upper())
+    uniq = list(uniq)
+
+    x = _numeric(_column(df, c, "value"), n)
+    lln, uln = _numeric(_column(df, c, "lln"), n), _numeric(_column(df, c, "uln"), n)
+
+    # Absolute cut-offs are in CTCAE_UNITS; convert them into each row's unit when units are given
+    unit_col = _column(df, c, "unit")
+    abs_factor = np.ones(n)
+    if unit_col is not None:
+        unit_codes, units = _codes(unit_col, normalize_units)
+        unit_codes = np.where(unit_codes < 0, len(units), unit_codes)   # null unit -> sentinel
+        pairs, inverse = np.unique(codes.astype(np.int64) * (len(units) + 1) + unit_codes, return_inverse=True)
+        pair_tests = [uniq[t] if 0 <= t < len(uniq) else None for t in pairs // (len(units) + 1)]
+        pair_units = [units[u] if u < len(units) else "" for u in pairs % (len(units) + 1)]
+        convert = [i for i, (t, u) in enumerate(zip(pair_tests, pair_units)) if t in CTCAE_UNITS and u]
+        factors = np.ones(len(pairs))
+        if convert:
+            factors[convert] = conversion_factors(pd.Series([CTCAE_UNITS[pair_tests[i]][1] for i in convert]),
+                                                  pd.Series([pair_units[i] for i in convert]),
+                                                  pd.Series([CTCAE_UNITS[pair_tests[i]][0] for i in convert]))
+        abs_factor = factors[inverse]
+
+    subject_codes = _codes(df[c["subject"]])[0] if c["subject"] in df.columns else np.zeros(n, dtype=np.int64)
+    is_base, base_row = _baseline_rows(df, c, subject_codes, codes, len(uniq))
+    base_value = x[base_row]
+
+    high, high_terms = _side_grades(x, lln, uln, abs_factor, codes, _criteria_arrays(uniq, "high"), base_value, is_base, "high")
+    low, low_terms = _side_grades(x, lln, uln, abs_factor, codes, _criteria_arrays(uniq, "low"), base_value, is_base, "low")
+
+    # An unknown unit (NaN factor) would silently drop the absolute cut-offs: leave ungraded
+    gradable = ~np.isnan(x) & ~np.isnan(abs_factor) & ((high_terms != "") | (low_terms != ""))
+    out = df.copy()
+    out["LBTOX"] = np.where(high >= low, np.where(high > 0, high_terms, ""), low_terms)
+    out.loc[~gradable | (np.maximum(high, low) == 0), "LBTOX"] = ""
+    out["LBTOXGR"] = pd.array(np.where(gradable, np.maximum(high, low), 0), dtype="Int64")
+    out.loc[~gradable, "LBTOXGR"] = pd.NA
+    if c["baseline_flag"] not in out.columns:
+        out[c["baseline_flag"]] = np.where(is_base, "Y", "")
+    return out
+
+
+def shift_table(graded, columns=None):
+    """
+    Baseline grade vs worst post-baseline grade per test (counts of subjects).
+    Expects grade_labs() output.
+    """
+    c = {**COLUMNS, **(columns or {})}
+    frame = pd.DataFrame({"subject": graded[c["subject"]].to_numpy(), "test": graded[c["test"]].astype(str).str.strip().str.upper().to_numpy(),
+                          "grade": graded["LBTOXGR"].to_numpy(),
+                          "base": graded[c["baseline_flag"]].astype(str).str.upper().eq("Y").to_numpy()})
+    frame = frame[frame["grade"].notna()]
+    base = frame[frame["base"]].groupby(["subject", "test"])["grade"].max().rename("Baseline Grade")
+    worst = frame[~frame["base"]].groupby(["subject", "test"])["grade"].max().rename("Worst Post-baseline Grade")
+    both = pd.concat([base, worst], axis=1).dropna().astype(int).reset_index()
+    return pd.crosstab([both["test"], both["Baseline Grade"]], both["Worst Post-baseline Grade"])
@@ -1,4 +1,7 @@
 import pandas as pd
+from logic.date_parser import parse_dates
+from logic.delta_engine import DeltaStore, run_incremental, signature
+from logic.hard_checks import default_registry
 from langchain_google_vertexai import ChatVertexAI
 from langchain_core.prompts import PromptTemplate
 
@@ -13,8 +16,9 @@ except:
     llm = None
 
 class DataCleaner:
-    def __init__(self):
-        pass
+    def __init__(self, registry=None):
+        # Pluggable: pass a CheckRegistry with extra range limits etc.
+        self.registry = registry or default_registry()
 
     def run_hard_checks(self, df):
         """
@@ -22,47 +26,27 @@ class DataCleaner:
         1. Future Dates
         2. Negative Vitals
         3. Missing Key IDs
+        (+ any checks registered on self.registry, e.g. range limits)
         """
-        issues = []
-        
-        # 1. Future Dates
-        date_cols = [c for c in df.columns if "Date" in c or "DTC" in c]
-        for col in date_cols:
-            try:
-                # Coerce to datetime
-                dates = pd.to_datetime(df[col], errors='coerce')
-                today = pd.Timestamp.now()
-                # Find future dates
-                future_mask = dates > today
-                
-                for idx, is_future in future_mask.items():
-                    if is_future:
-                        issues.append({
-                            "Row": idx,
-                            "Column": col,
-                            "Value": df.at[idx, col],
-                            "Issue": "Future Date"
-                        })
-            except Exception as e:
-                pass # Skip column if date parse fails entirely
+        return self.registry.run(df)
 
-        # 2. Negative Vitals (Numeric columns starting with VS)
-        vs_cols = [c for c in df.columns if c.startswith("VS") and "ORRES" in c]
-        for col in vs_cols:
-            # Convert to numeric, errors='coerce' turns non-numeric to NaN
-            nums = pd.to_numeric(df[col], errors='coerce')
-            neg_mask = nums < 0
-            
-            for idx, is_neg in neg_mask.items():
-                if is_neg:
-                    issues.append({
-                        "Row": idx,
-                        "Column": col,
-                        "Value": df.at[idx, col],
-                        "Issue": "Negative Value"
-                    })
+    def run_hard_checks_incremental(self, df, key_cols=None, store=None):
+        """
+        Delta mode for nightly EDC refreshes.
+        Only added/modified rows (by subject/form/record fingerprint) are rechecked;
+        findings for unchanged rows are carried forward from the previous run.
+        Returns (issues_df, stats).
+        """
+        # Changing the registry (new range limits, extra checks) invalidates the previous snapshot
+        store = store or DeltaStore("hard_checks", signature(*self.registry.definition()))
+        issues, stats = run_incremental(df, self.run_hard_checks, store, key_cols)
 
-        return pd.DataFrame(issues)
+        # Carried-forward future dates may have become past dates since the last run
+        if not issues.empty and "Issue" in issues.columns:
+            future = issues["Issue"] == "Future Date"
+            still_future = parse_dates(issues["Value"].where(future).astype(object)) > pd.Timestamp.now()
+            issues = issues[~future | still_future].reset_index(drop=True)
+        return issues, stats
 
     def run_medical_consistency(self, df_ae, df_cm):
         """
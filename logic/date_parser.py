@@ -0,0 +1,204 @@
+import re
+import weakref
+from functools import lru_cache
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+# Tried in order when a column is not ISO 8601 (ties go to the earlier format)
+CANDIDATE_FORMATS = ['%Y-%m-%d', '%d-%b-%Y', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y',
+                     '%d %b %Y', '%d%b%Y', '%Y%m%d', '%Y/%m/%d', '%b-%Y']
+# Formats that only pin down a month (read as its first day when imputing)
+PARTIAL_FORMATS = {'%b-%Y'}
+
+# ISO 8601 incl. SDTM partial dates (YYYY, YYYY-MM, YYYY-MM-DD[Thh[:mm[:ss[.f]]]])
+ISO8601_PATTERN = r'^\d{4}(-(0[1-9]|1[0-2])(-(0[1-9]|[12]\d|3[01])(T([01]\d|2[0-3])(:[0-5]\d(:[0-5]\d(\.\d+)?)?)?)?)?)?$'
+ISO_PREFIX = r'^(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?(?:T.*)?$'
+UNKNOWN_TOKENS = r'\b(?:UNK|UN|UK|XX|NK)\b'
+
+
+def _to_text(series):
+    return series.astype("string").str.strip()
+
+
+def _normalize_unknowns(text):
+    """UNK-JAN-2024 -> 01-JAN-2024, UNK-UNK-2024 -> 01-JAN-2024 (first of the known period)."""
+    has_unk = text.str.contains(UNKNOWN_TOKENS, regex=True, case=False, na=False)
+    if not has_unk.any():
+        return text
+    fixed = text[has_unk].str.upper()
+    # Month position first (-UNK- between day and year), then the day token
+    fixed = fixed.str.replace(r'([-/ ])' + UNKNOWN_TOKENS + r'([-/ ]\d{4})$', r'\1JAN\2', regex=True)
+    fixed = fixed.str.replace(r'^' + UNKNOWN_TOKENS, '01', regex=True)
+    return text.mask(has_unk, fixed)
+
+
+def _parse_with(text, fmt):
+    # ISO columns often carry a time part; the date is the first 10 characters
+    if fmt == '%Y-%m-%d':
+        text = text.str.slice(0, 10)
+    return pd.to_datetime(text, format=fmt, errors='coerce')
+
+
+def infer_format(series, sample_size=200):
+    """Best CANDIDATE_FORMATS entry for a column, judged on a sample of distinct values."""
+    sample = pd.Series(series.dropna().unique()[:sample_size])
+    if sample.empty:
+        return None
+    sample = _normalize_unknowns(_to_text(sample))
+    best, best_hits = None, 0
+    for fmt in CANDIDATE_FORMATS:
+        hits = _parse_with(sample, fmt).notna().sum()
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+            if hits == len(sample): break
+    return best
+
+
+def parse_dates(series, fmt=None, impute=False):
+    """
+    Parses a whole Series of clinical dates at once.
+    1. The column format is inferred from a sample and applied to every value.
+    2. Leftovers: ISO with a time part, then the other candidate formats.
+    Partial dates (2024, 2024-03, UNK-JAN-2024, JAN-2024) are not precise to the day and
+    become NaT, so comparisons skip them; impute=True reads them as the first day of the
+    known period instead. Unparseable values become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    out = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    if series.empty:
+        return out
+
+    # Repetitive columns (visit dates, lab draws): parse each distinct value once
+    codes, uniques = pd.factorize(series)
+    if len(uniques) * 4 < len(series):
+        parsed = parse_dates(pd.Series(uniques), fmt, impute).to_numpy()
+        out[:] = np.where(codes >= 0, parsed[codes], np.datetime64("NaT"))
+        return out
+
+    # Fast path: the whole raw column with one exact format
+    fmt = fmt or infer_format(series)
+    if fmt in PARTIAL_FORMATS and not impute: fmt = None
+    if fmt:
+        raw = series if series.dtype == object or pd.api.types.is_string_dtype(series) else series.astype("string")
+        out[:] = pd.to_datetime(raw, format=fmt, errors='coerce').to_numpy()
+
+    left = (out.isna() & series.notna()).to_numpy()
+    if not left.any():
+        return out
+
+    # Leftovers only: (imputing) normalize unknowns, then ISO, then other formats
+    rest = _to_text(series[left])
+    if impute: rest = _normalize_unknowns(rest)
+    parsed = pd.Series(pd.NaT, index=rest.index, dtype="datetime64[ns]")
+
+    parts = rest.str.extract(ISO_PREFIX)
+    shaped = parts[0].notna().to_numpy()
+    iso = shaped if impute else shaped & parts[2].notna().to_numpy()  # partial ISO stays NaT
+    if iso.any():
+        iso_text = parts[0][iso] + "-" + parts[1][iso].fillna("01") + "-" + parts[2][iso].fillna("01")
+        parsed[iso] = pd.to_datetime(iso_text, format='%Y-%m-%d', errors='coerce').to_numpy()
+
+    for f in CANDIDATE_FORMATS:
+        if f in PARTIAL_FORMATS and not impute: continue
+        todo = parsed.isna().to_numpy() & ~shaped
+        if not todo.any(): break
+        parsed[todo] = _parse_with(rest[todo], f).to_numpy()
+
+    out[left] = parsed.to_numpy()
+    return out
+
+
+_ISO_PREFIX_RE = re.compile(ISO_PREFIX)
+_MONTH_UNKNOWN_RE = re.compile(r'([-/ ])' + UNKNOWN_TOKENS + r'([-/ ]\d{4})$')
+_DAY_UNKNOWN_RE = re.compile(r'^' + UNKNOWN_TOKENS)
+_UNKNOWN_RE = re.compile(UNKNOWN_TOKENS, re.IGNORECASE)
+
+
+def _strptime_any(text, impute):
+    for fmt in CANDIDATE_FORMATS:
+        if fmt in PARTIAL_FORMATS and not impute: continue
+        try:
+            return datetime.strptime(text[:10] if fmt == '%Y-%m-%d' else text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _iso_date(text, impute):
+    iso = _ISO_PREFIX_RE.match(text)
+    if not iso: return None
+    if iso.group(3) is None and not impute: return False  # partial: no day to compare on
+    try:
+        return date(int(iso.group(1)), int(iso.group(2) or 1), int(iso.group(3) or 1))
+    except ValueError:
+        return False  # ISO-shaped but not a real date
+
+
+def normalize_date(value, impute=False):
+    """
+    Scalar helper: one value -> datetime.date or None (same rules as parse_dates).
+    Per-row callers stay on plain strptime; use parse_dates for columns.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    return _parse_text(text, impute) if text else None
+
+
+@lru_cache(maxsize=65536)
+def _parse_text(text, impute=False):
+    # ISO (full or partial) first: no candidate format other than %Y-%m-%d reads these
+    parsed = _iso_date(text, impute)
+    if parsed is None: parsed = _strptime_any(text, impute)
+    if parsed is None and impute and _UNKNOWN_RE.search(text):
+        parsed = _strptime_any(_DAY_UNKNOWN_RE.sub('01', _MONTH_UNKNOWN_RE.sub(r'\1JAN\2', text.upper())), impute)
+    return parsed or None
+
+
+def iso8601_mask(series):
+    """True where a non-null value is valid (possibly partial) ISO 8601."""
+    text = series.astype("string").str.strip()
+    return text.str.match(ISO8601_PATTERN, na=False)
+
+
+# --- MEMO: one parse per (DataFrame, column) shared by every engine ---
+_MEMO = {}
+_TRACKED = set()
+
+
+def _column_token(series):
+    """Cheap content token: hashing is far faster than re-parsing and catches in-place edits."""
+    return len(series), int(pd.util.hash_pandas_object(series, index=False).sum())
+
+
+def _forget(frame_id):
+    _TRACKED.discard(frame_id)
+    for key in [k for k in _MEMO if k[0] == frame_id]:
+        _MEMO.pop(key, None)
+
+
+def parsed_column(df, col):
+    """
+    Parsed dates for df[col], memoized per DataFrame.
+    Entries are dropped when the frame is garbage collected and ignored if the
+    column content changed since it was parsed.
+    """
+    series = df[col]
+    frame_id = id(df)
+    token = _column_token(series)
+    hit = _MEMO.get((frame_id, col))
+    if hit is not None and hit[0] == token:
+        return hit[1]
+
+    if frame_id not in _TRACKED:
+        _TRACKED.add(frame_id)
+        weakref.finalize(df, _forget, frame_id)
+    parsed = parse_dates(series)
+    _MEMO[(frame_id, col)] = (token, parsed)
+    return parsed
@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import hashlib
+from datetime import datetime
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from logic.sdtm_builder import DOMAIN_KEYS
+from logic.sdtm_conformance import CODELISTS, REQUIRED, codelist_for
+from logic.sdtm_mapping import DOMAIN_LABELS, variable_label
+
+# Persistence Path (same backend_data layout as the SDTM mapping store)
+STATS_DIR = os.path.join(os.getcwd(), "backend_data", "sdtm")
+STATS_FILE = os.path.join(STATS_DIR, "define_stats.json")
+
+ODM_NS = "http://www.cdisc.org/ns/odm/v1.3"
+DEF_NS = "http://www.cdisc.org/ns/def/v2.1"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+ET.register_namespace("", ODM_NS)
+ET.register_namespace("def", DEF_NS)
+ET.register_namespace("xlink", XLINK_NS)
+
+# Origin by variable ("--" is the domain prefix); everything else is Collected
+ASSIGNED_VARS = {"STUDYID", "DOMAIN", "RDOMAIN", "IDVAR", "QNAM", "QLABEL", "QORIG", "QEVAL"}
+DERIVED_VARS = {"--SEQ", "--DY", "--STDY", "--ENDY", "--STRESN"}
+
+ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+ISO_DATETIME = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2}(\.\d+)?)?$')
+
+
+def _q(ns, tag):
+    return f"{{{ns}}}{tag}"
+
+
+def column_signature(col):
+    """Content hash of a column: raw buffer for numpy numerics, vectorized row hashes otherwise."""
+    if isinstance(col.dtype, np.dtype) and col.dtype.kind in "biufM":
+        rows = np.ascontiguousarray(col.to_numpy())
+    else:
+        rows = pd.util.hash_pandas_object(col, index=False).to_numpy()
+    return hashlib.sha1(str(col.dtype).encode() + rows.tobytes()).hexdigest()[:16]
+
+
+def column_stats(col, var, domain):
+    """
+    Define-XML facts of one column from a single factorize pass:
+    DataType, Length, SignificantDigits, codelist and the coded values present.
+    """
+    _, uniq = pd.factorize(col)
+    values = pd.Series(uniq, dtype=object)
+    stats = {"DataType": "text", "Length": 1, "SignificantDigits": None, "CodeList": None, "Values": []}
+
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        nums = np.abs(values.astype(float).to_numpy())
+        nums = nums[np.isfinite(nums)]
+        int_digits = int(np.floor(np.log10(nums.max()))) + 1 if len(nums) and nums.max() >= 1 else 1
+        decimals = next((d for d in range(16) if np.allclose(np.round(nums, d), nums, rtol=1e-12, atol=0)), 15)
+        stats["DataType"] = "float" if decimals else "integer"
+        stats["Length"] = int_digits + decimals
+        if decimals: stats["SignificantDigits"] = decimals
+    else:
+        text = values.astype(str)
+        if len(text): stats["Length"] = int(max(text.str.encode("utf-8").str.len().max(), 1))
+        if str(var).endswith("DTC") and len(text):
+            if text.str.match(ISO_DATE).all(): stats["DataType"] = "date"
+            elif text.str.match(ISO_DATETIME).all(): stats["DataType"] = "datetime"
+
+    name = codelist_for(str(var), domain)
+    if name:
+        stats["CodeList"] = name
+        stats["Values"] = sorted(set(values.astype(str).str.strip().str.upper()) - {""})
+    return stats
+
+
+class DefineStatsCache:
+    """
+    Column statistics keyed by dataset/variable and content signature,
+    so re-exports after small edits only rescan the columns that changed.
+    """
+
+    def __init__(self, path=STATS_FILE):
+        self.path = path
+        self._store = None
+
+    def _load(self):
+        if self._store is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._store = json.load(f)
+            except (OSError, ValueError):
+                self._store = {}
+        return self._store
+
+    def stats(self, dataset, var, col, domain):
+        store, key = self._load(), f"{dataset}.{var}"
+        sig = column_signature(col)
+        hit = store.get(key)
+        if hit and hit.get("sig") == sig:
+            return hit["stats"]
+        stats = column_stats(col, var, domain)
+        store[key] = {"sig": sig, "stats": stats}
+        return stats
+
+    def save(self):
+        if self._store is None: return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._store, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # read-only deploys keep the in-memory cache
+
+
+def origin_of(var, domain):
+    var = str(var).upper()
+    generic = "--" + var[len(domain):] if var.startswith(domain) else var
+    if var in ASSIGNED_VARS: return "Assigned"
+    if generic in DERIVED_VARS: return "Derived"
+    return "Collected"
+
+
+def define_metadata(domains, cache=None, origins=None):
+    """
+    Dataset and variable metadata for {dataset name: frame} (SDTM domains and SUPP--).
+    Returns a list of {"name", "domain", "label", "variables": [...]} in input order.
+    """
+    cache, origins = cache or DefineStatsCache(), origins or {}
+    datasets = []
+    for name, df in domains.items():
+        name = str(name).upper()
+        domain = name[4:] if name.startswith("SUPP") else name
+        keys = ["STUDYID", "RDOMAIN", "USUBJID", "IDVAR", "IDVARVAL", "QNAM"] if name != domain else DOMAIN_KEYS.get(domain, [])
+        required = set(REQUIRED["ALL"] + REQUIRED.get(domain, [])) if name == domain else {"STUDYID", "RDOMAIN", "USUBJID", "QNAM", "QVAL"}
+        variables = []
+        for i, col in enumerate(df.columns):
+            var = str(col).upper()
+            stats = cache.stats(name, var, df[col], domain)
+            variables.append({
+                "name": var, "order": i + 1, "label": variable_label(var, domain),
+                "mandatory": var in required, "key": keys.index(var) + 1 if var in keys else None,
+                "origin": origins.get(var) or origin_of(var, domain), **stats})
+        label = DOMAIN_LABELS.get(name) or f"Supplemental Qualifiers for {domain}"
+        datasets.append({"name": name, "domain": domain, "label": label, "variables": variables})
+    cache.save()
+    return datasets
+
+
+def _description(parent, text):
+    desc = ET.SubElement(parent, _q(ODM_NS, "Description"))
+    ET.SubElement(desc, _q(ODM_NS, "TranslatedText"), {"{http://www.w3.org/XML/1998/namespace}lang": "en"}).text = text
+
+
+def build_define_xml(domains, study="STUDY", cache=None, origins=None, standard_version="3.3"):
+    """Define-XML 2.1 document (bytes) for the mapped datasets."""
+    datasets = define_metadata(domains, cache, origins)
+    now = datetime.now().isoformat(timespec="seconds")
+
+    odm = ET.Element(_q(ODM_NS, "ODM"), {
+        "FileType": "Snapshot", "FileOID": f"DEF.{study}", "ODMVersion": "1.3.2",
+        "CreationDateTime": now, _q(DEF_NS, "Context"): "Submission"})
+    study_el = ET.SubElement(odm, _q(ODM_NS, "Study"), {"OID": f"STDY.{study}"})
+    glob = ET.SubElement(study_el, _q(ODM_NS, "GlobalVariables"))
+    for tag in ("StudyName", "StudyDescription", "ProtocolName"):
+        ET.SubElement(glob, _q(ODM_NS, tag)).text = study
+    mdv = ET.SubElement(study_el, _q(ODM_NS, "MetaDataVersion"), {
+        "OID": f"MDV.{study}", "Name": f"{study} SDTM Define-XML", _q(DEF_NS, "DefineVersion"): "2.1.0"})
+    standards = ET.SubElement(mdv, _q(DEF_NS, "Standards"))
+    ET.SubElement(standards, _q(DEF_NS, "Standard"), {
+        "OID": "STD.SDTMIG", "Name": "SDTMIG", "Type": "IG", "Version": standard_version, "Status": "Final"})
+
+    item_defs, codelists = [], {}
+    for ds in datasets:
+        ig = ET.SubElement(mdv, _q(ODM_NS, "ItemGroupDef"), {
+            "OID": f"IG.{ds['name']}", "Domain": ds["domain"], "Name": ds["name"], "SASDatasetName": ds["name"],
+            "Repeating": "No" if ds["name"] == "DM" else "Yes", "IsReferenceData": "No",
+            "Purpose": "Tabulation", _q(DEF_NS, "StandardOID"): "STD.SDTMIG",
+            _q(DEF_NS, "ArchiveLocationID"): f"LF.{ds['name']}"})
+        _description(ig, ds["label"])
+        for v in ds["variables"]:
+            oid = f"IT.{ds['name']}.{v['name']}"
+            ref = {"ItemOID": oid, "OrderNumber": str(v["order"]), "Mandatory": "Yes" if v["mandatory"] else "No"}
+            if v["key"]: ref["KeySequence"] = str(v["key"])
+            ET.SubElement(ig, _q(ODM_NS, "ItemRef"), ref)
+            item_defs.append((oid, v))
+            if v["CodeList"]: codelists.setdefault(v["CodeList"], set()).update(v["Values"])
+        leaf = ET.SubElement(ig, _q(DEF_NS, "leaf"), {"ID": f"LF.{ds['name']}", _q(XLINK_NS, "href"): f"{ds['name'].lower()}.xpt"})
+        ET.SubElement(leaf, _q(DEF_NS, "title")).text = f"{ds['name'].lower()}.xpt"
+
+    for oid, v in item_defs:
+        attrs = {"OID": oid, "Name": v["name"], "SASFieldName": v["name"], "DataType": v["DataType"]}
+        if v["DataType"] in ("text", "integer", "float"): attrs["Length"] = str(v["Length"])
+        if v["SignificantDigits"] is not None: attrs["SignificantDigits"] = str(v["SignificantDigits"])
+        item = ET.SubElement(mdv, _q(ODM_NS, "ItemDef"), attrs)
+        _description(item, v["label"] or v["name"])
+        if v["CodeList"]: ET.SubElement(item, _q(ODM_NS, "CodeListRef"), {"CodeListOID": f"CL.{v['CodeList']}"})
+        ET.SubElement(item, _q(DEF_NS, "Origin"), {"Type": v["origin"]})
+
+    for name in sorted(codelists):
+        cl = ET.SubElement(mdv, _q(ODM_NS, "CodeList"), {"OID": f"CL.{name}", "Name": name, "DataType": "text"})
+        standard = CODELISTS.get(name, [])
+        for i, value in enumerate(sorted(codelists[name], key=lambda x: (x not in standard, x)), start=1):
+            attrs = {"CodedValue": value, "OrderNumber": str(i)}
+            if value not in standard: attrs[_q(DEF_NS, "ExtendedValue")] = "Yes"
+            ET.SubElement(cl, _q(ODM_NS, "EnumeratedItem"), attrs)
+
+    ET.indent(odm)
+    return ET.tostring(odm, encoding="utf-8", xml_declaration=True)
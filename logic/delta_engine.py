@@ -0,0 +1,165 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Persistence Path (one fingerprint + findings snapshot per check set)
+DELTA_DIR = os.path.join(os.getcwd(), "backend_data", "delta")
+
+KEY_CANDIDATES = ["USUBJID", "SUBJID", "SubjectID", "FORM", "FormOID", "VISIT", "RECORDID", "RecordID", "SEQ"]
+RECORD_KEY = "_RecordKey"
+
+
+def detect_key_cols(df):
+    """Subject / form / record identifiers present in the frame (falls back to the row index)."""
+    cols = [c for c in KEY_CANDIDATES if c in df.columns]
+    cols += [c for c in df.columns if str(c).upper().endswith("SEQ") and c not in cols]
+    return cols
+
+
+def record_keys(df, key_cols=None, seen=None):
+    """
+    One stable string key per row (subject|form|record...).
+    Repeated keys get an occurrence suffix so every row stays addressable.
+    `seen` (key -> rows so far) continues the occurrence count over a stream of
+    chunks: the first occurrence keeps the bare key, later ones get #1, #2...
+    """
+    key_cols = detect_key_cols(df) if key_cols is None else list(key_cols)
+    if not key_cols:
+        keys = pd.Series(df.index.astype(str), index=df.index)
+    else:
+        keys = df[key_cols[0]].astype(str).str.strip()
+        for c in key_cols[1:]:
+            keys = keys + "|" + df[c].astype(str).str.strip()
+    if seen is not None:
+        occurrence = keys.groupby(keys).cumcount() + keys.map(seen).fillna(0).astype(int)
+        seen.update(occurrence.groupby(keys).max().add(1).to_dict())
+        return keys.where(occurrence == 0, keys + "#" + occurrence.astype(str))
+    dup = keys.duplicated(keep=False)
+    if dup.any():
+        keys = keys.where(~dup, keys + "#" + keys.groupby(keys).cumcount().astype(str))
+    return keys
+
+
+def row_fingerprints(df, keys):
+    """64-bit content hash per row, indexed by record key."""
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    return pd.Series(hashes.to_numpy(), index=keys.to_numpy(), name="fingerprint")
+
+
+def signature(*parts):
+    """Short hash for a check-set definition (spec queries, column layout...)."""
+    raw = "::".join(str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class DeltaStore:
+    """
+    Previous run's fingerprints and findings for one check set.
+    A snapshot saved under a different signature (spec changed) is ignored.
+    """
+
+    def __init__(self, name, sig="", base_dir=DELTA_DIR):
+        self.sig = sig
+        self.path = os.path.join(base_dir, f"{name}.pkl")
+
+    def load(self):
+        try:
+            snap = pd.read_pickle(self.path)
+        except Exception:
+            return None, None
+        if snap.get("sig") != self.sig:
+            return None, None
+        return snap["fingerprints"], snap["findings"]
+
+    def save(self, fingerprints, findings):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        pd.to_pickle({"sig": self.sig, "fingerprints": fingerprints, "findings": findings}, tmp_path)
+        os.replace(tmp_path, self.path)
+
+
+def _delta(df, keys, check_fn, prev_fp, prev_findings):
+    """Fresh findings for changed rows + carried findings of unchanged ones (tagged with RECORD_KEY)."""
+    current = row_fingerprints(df, keys)
+    if prev_fp is None:
+        changed = pd.Series(True, index=df.index)
+        stats = {"Added": len(df), "Modified": 0, "Unchanged": 0}
+    else:
+        # Compare hashes only where the key existed before (keeps uint64, no NaN)
+        added = ~current.index.isin(prev_fp.index)
+        modified = np.zeros(len(current), dtype=bool)
+        modified[~added] = prev_fp.reindex(current.index[~added]).to_numpy() != current.to_numpy()[~added]
+        changed = pd.Series(added | modified, index=df.index)
+        stats = {"Added": int(added.sum()), "Modified": int(modified.sum()), "Unchanged": int((~changed).sum())}
+
+    # 1. Fresh findings for the delta
+    fresh = check_fn(df[changed.to_numpy()]) if changed.any() else pd.DataFrame()
+    if not fresh.empty and "Row" in fresh.columns:
+        fresh = fresh.assign(**{RECORD_KEY: fresh["Row"].map(keys)})
+
+    # 2. Carry forward findings of unchanged records, re-pointed at today's row labels
+    parts = [fresh] if not fresh.empty else []
+    if prev_findings is not None and not prev_findings.empty and RECORD_KEY in prev_findings.columns:
+        unchanged_keys = pd.Series(keys[~changed].index, index=keys[~changed].to_numpy())
+        carried = prev_findings[prev_findings[RECORD_KEY].isin(unchanged_keys.index)]
+        if not carried.empty:
+            parts.append(carried.assign(Row=carried[RECORD_KEY].map(unchanged_keys).to_numpy()))
+
+    findings = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    stats["Rechecked"] = int(changed.sum())
+    return findings, current, stats
+
+
+def _record_findings(findings):
+    """Findings worth persisting: record-level only (rule errors are recomputed every run)."""
+    return findings[findings[RECORD_KEY].notna()] if RECORD_KEY in findings.columns else findings.iloc[0:0]
+
+
+def run_incremental(df, check_fn, store, key_cols=None):
+    """
+    Delta validation.
+    1. Fingerprint every row and diff against the previous run.
+    2. Run check_fn only on added + modified rows.
+    3. Carry forward the previous findings of unchanged records.
+    check_fn(df_subset) must return findings with a 'Row' column (df index labels);
+    rows without a Row (rule-level errors) are always taken from the fresh run.
+    Returns (findings, stats).
+    """
+    prev_fp, prev_findings = store.load()
+    findings, current, stats = _delta(df, record_keys(df, key_cols), check_fn, prev_fp, prev_findings)
+    stats["Removed"] = 0 if prev_fp is None else int((~prev_fp.index.isin(current.index)).sum())
+    store.save(current, _record_findings(findings))
+    return findings.drop(columns=[RECORD_KEY], errors="ignore"), stats
+
+
+class ChunkedDelta:
+    """
+    run_incremental over a stream of chunks with ONE snapshot keyed by record key,
+    so a row that moves to another chunk (an insert or delete upstream) is still
+    matched to its previous fingerprint. check(chunk) per chunk, then finish().
+    """
+
+    def __init__(self, check_fn, store, key_cols=None):
+        self.check_fn, self.store, self.key_cols = check_fn, store, key_cols
+        self.prev_fp, self.prev_findings = store.load()
+        self.seen = {}
+        self.fingerprints, self.findings = [], []
+        self.stats = {"Added": 0, "Modified": 0, "Unchanged": 0, "Rechecked": 0}
+
+    def check(self, chunk):
+        key_cols = [c for c in self.key_cols if c in chunk.columns] if self.key_cols else None
+        keys = record_keys(chunk, key_cols, seen=self.seen)
+        findings, current, stats = _delta(chunk, keys, self.check_fn, self.prev_fp, self.prev_findings)
+        self.fingerprints.append(current)
+        self.findings.append(_record_findings(findings))
+        for k, v in stats.items(): self.stats[k] += v
+        return findings.drop(columns=[RECORD_KEY], errors="ignore")
+
+    def finish(self):
+        """Saves the merged snapshot; returns the stats over all chunks."""
+        current = pd.concat(self.fingerprints) if self.fingerprints else pd.Series(dtype="uint64", name="fingerprint")
+        self.stats["Removed"] = 0 if self.prev_fp is None else int((~self.prev_fp.index.isin(current.index)).sum())
+        parts = [f for f in self.findings if not f.empty]
+        self.store.save(current, pd.concat(parts, ignore_index=True) if parts else pd.DataFrame())
+        return self.stats
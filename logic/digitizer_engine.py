@@ -1,65 +1,22 @@
 
 import os
 import json
-import pdfplumber
+from logic.pdf_extract import PdfDocument
+from logic.llm_batch import RateLimiter, run_bounded
+from logic.protocol_chunks import CHUNK_CHARS, ChunkResultCache, chunk_protocol, merge_partials
 import pandas as pd
 from langchain_google_vertexai import ChatVertexAI
 from langchain_core.prompts import PromptTemplate
 from tenacity import retry, stop_after_attempt, wait_exponential
 
-class ProtocolDigitizer:
-    """
-    The 'Veridix Killer': Converts PDF Protocols into structured JSON data.
-    """
-    
-    def __init__(self):
-        try:
-            self.llm = ChatVertexAI(
-                model_name="gemini-1.5-flash-001",
-                temperature=0.0, # Zero temp for strict JSON
-                location="us-central1",
-                max_output_tokens=8192
-            )
-            self.connected = True
-        except Exception as e:
-            print(f"Digitizer Init Error: {e}")
-            self.llm = None
-            self.connected = False
-
-    def extract_text(self, pdf_file):
-        """Extracts text from PDF/Docx."""
-        text = ""
-        try:
-            if hasattr(pdf_file, 'read'): # Streamlit Buffer
-                with pdfplumber.open(pdf_file) as pdf:
-                    for page in pdf.pages:
-                        text += page.extract_text() + "\n"
-            else: # Path
-                with pdfplumber.open(pdf_file) as pdf:
-                    for page in pdf.pages:
-                        text += page.extract_text() + "\n"
-        except Exception as e:
-            return f"Error reading file: {e}"
-        return text
-
-    def digitize_protocol(self, pdf_file):
-        """
-        Main Pipeline: PDF -> Text -> Gemini -> JSON
-        """
-        if not self.connected:
-            return {"Error": "AI Brain Disconnected"}
-
-        raw_text = self.extract_text(pdf_file)
-        if "Error" in raw_text:
-            return {"Error": raw_text}
-
-        # Truncate for token limits if massive (approx 30k words)
-        safe_text = raw_text[:100000]
+# Bump when the prompt changes so cached chunk results are not reused
+PROMPT_VERSION = "1"
 
-        prompt_template = """
+DIGITIZE_PROMPT = """
         You are a Clinical Data Architect.
-        TASK: Digitize this Clinical Trial Protocol into a strict JSON structure.
-        
+        TASK: Digitize this part of a Clinical Trial Protocol into a strict JSON structure.
+        This part is the protocol section "{section}". Extract only what appears in this part.
+
         INPUT TEXT:
         {text}
 
@@ -95,16 +52,73 @@ class ProtocolDigitizer:
         3. Do not hallucinate. If not found, leave empty.
         """
 
+
+class ProtocolDigitizer:
+    """
+    The 'Veridix Killer': Converts PDF Protocols into structured JSON data.
+    """
+    
+    def __init__(self, chunk_cache=None, requests_per_minute=60):
+        self.chunk_cache = chunk_cache or ChunkResultCache()
+        self.limiter = RateLimiter(requests_per_minute)
+        try:
+            self.llm = ChatVertexAI(
+                model_name="gemini-1.5-flash-001",
+                temperature=0.0, # Zero temp for strict JSON
+                location="us-central1",
+                max_output_tokens=8192
+            )
+            self.connected = True
+        except Exception as e:
+            print(f"Digitizer Init Error: {e}")
+            self.llm = None
+            self.connected = False
+
+    def extract_text(self, pdf_file, max_chars=None):
+        """Extracts text from PDF (lazy: stops parsing once max_chars is reached)."""
         try:
-            chain = PromptTemplate.from_template(prompt_template) | self.llm
-            response = chain.invoke({"text": safe_text})
-            
-            # Clean response
-            json_str = response.content.replace("```json", "").replace("```", "").strip()
-            
-            return json.loads(json_str)
+            return PdfDocument(pdf_file).text(max_chars=max_chars)
         except Exception as e:
-            return {"Error": f"Digitization Failed: {str(e)}"}
+            return f"Error reading file: {e}"
+
+    def digitize_protocol(self, pdf_file, max_workers=4, chunk_chars=CHUNK_CHARS):
+        """
+        Main Pipeline: PDF -> section-aware chunks -> Gemini (concurrent, cached per chunk) -> merged JSON.
+        The whole protocol is read; an amended protocol only re-extracts the sections that changed.
+        """
+        if not self.connected:
+            return {"Error": "AI Brain Disconnected"}
+
+        raw_text = self.extract_text(pdf_file)
+        if raw_text.startswith("Error reading file"):
+            return {"Error": raw_text}
+
+        chunks = chunk_protocol(raw_text, chunk_chars)
+        keys = [ChunkResultCache.chunk_key(f"{c['section']}\n{c['text']}", PROMPT_VERSION) for c in chunks]
+        partials = {i: self.chunk_cache.get(k) for i, k in enumerate(keys)}
+        todo = [i for i, hit in partials.items() if hit is None]
+
+        results, failures = run_bounded(lambda i: self.digitize_chunk(chunks[i]), todo, max_workers, self.limiter)
+        fresh = {todo[j]: result for j, result in results.items()}
+        self.chunk_cache.put_many({keys[i]: result for i, result in fresh.items()})
+        partials.update(fresh)
+
+        if not any(partials.get(i) is not None for i in range(len(chunks))):
+            errors = "; ".join(str(e) for e in failures.values())
+            return {"Error": f"Digitization Failed: {errors or 'no text extracted'}"}
+        merged = merge_partials(partials[i] for i in range(len(chunks)))
+        if failures:
+            merged["warnings"] = [f"Section '{chunks[todo[j]]['section']}' not digitized: {e}" for j, e in sorted(failures.items())]
+        return merged
+
+    def digitize_chunk(self, chunk):
+        """One chunk -> partial protocol JSON (raises on unparseable replies)."""
+        chain = PromptTemplate.from_template(DIGITIZE_PROMPT) | self.llm
+        response = chain.invoke({"text": chunk["text"], "section": chunk["section"]})
+
+        # Clean response
+        json_str = response.content.replace("```json", "").replace("```", "").strip()
+        return json.loads(json_str)
 
     def generate_schema_visualization(self, digital_protocol):
         """Generates a Pandas DF for the Visit Schedule."""
@@ -1,17 +1,35 @@
+import os
+import json
 import pandas as pd
 import streamlit as st
 from langchain_core.prompts import PromptTemplate
 from logic.agent_logic import llm, ai_retry
+from logic.cross_domain_engine import CrossDomainEngine, parse_cross_rules
+from logic.delta_engine import ChunkedDelta, DeltaStore, run_incremental, signature
+from logic.llm_batch import RateLimiter, chunked, run_bounded
+from logic.rule_engine import RuleCache, compile_spec, evaluate_rules, build_discrepancies, rule_errors, read_header, run_chunked
+
+# Above this size the data file is streamed instead of loaded whole (Cloud Run has 4 GB)
+STREAMING_THRESHOLD_BYTES = 500 * 1024 * 1024
+DEFAULT_CHUNKSIZE = 250_000
 
 class EditCheckExecutor:
-    def __init__(self):
+    def __init__(self, batch_size=20, max_workers=4, requests_per_minute=60):
         self.llm = llm
+        self.cache = RuleCache()
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(requests_per_minute)
+        self.delta_stats = {}
 
     @ai_retry
     def translate_to_query(self, rule_text, columns):
         """
         Translates a natural language rule into a Pandas .query() string.
         """
+        return self._translate_one(rule_text, columns)
+
+    def _translate_one(self, rule_text, columns):
         if not self.llm: return None
 
         template = """
@@ -35,14 +53,74 @@ class EditCheckExecutor:
         
         return chain.invoke({"rule": rule_text, "columns": columns}).content.strip().strip('"').strip("'")
 
-    def run_spec_based_checks(self, data_file, spec_file):
+    def translate_batch(self, rule_texts, columns):
+        """
+        Translates several rules in ONE prompt.
+        Returns a list of query strings aligned with rule_texts.
+        """
+        if not self.llm: return [None] * len(rule_texts)
+
+        template = """
+        Role: Python Data Scientist.
+        Task: Convert each numbered Clinical Data Validation Rule into a Pandas `.query()` string.
+        
+        Each query should select rows that FAIL the check (Rows that match the error condition).
+        
+        Available Columns: {columns}
+        
+        Rules:
+        {rules}
+        
+        Examples:
+        - Rule: "Age must be greater than 18" -> Query: "Age <= 18" (Finds the failures)
+        - Rule: "If Gender is Male, Pregnancy must be Null" -> Query: "Gender == 'Male' and Pregnancy.notnull()"
+        
+        OUTPUT ONLY A JSON ARRAY OF {count} STRINGS, ONE QUERY PER RULE, IN ORDER.
+        Use "Error" for a rule that cannot be expressed. NO MARKDOWN.
+        """
+        numbered = "\n".join(f"{i + 1}. {r}" for i, r in enumerate(rule_texts))
+
+        prompt = PromptTemplate.from_template(template)
+        chain = prompt | self.llm
+
+        reply = chain.invoke({"rules": numbered, "columns": columns, "count": len(rule_texts)}).content
+        queries = json.loads(reply.replace("```json", "").replace("```", "").strip())
+        if not isinstance(queries, list) or len(queries) != len(rule_texts):
+            raise ValueError(f"Batch reply has {len(queries) if isinstance(queries, list) else 'no'} queries for {len(rule_texts)} rules.")
+        return [str(q).strip().strip('"').strip("'") if q else None for q in queries]
+
+    def translate_many(self, rule_texts, columns):
+        """
+        Packs rules into batches and runs them on a bounded, rate-limited pool.
+        Rules from a failed batch are retried one by one, so a single bad rule
+        never stalls the rest. Returns {rule_text: query or Exception}.
+        """
+        batches = chunked(list(rule_texts), self.batch_size)
+        results, _ = run_bounded(lambda b: self.translate_batch(b, columns), batches, self.max_workers, self.limiter)
+
+        translated, retry = {}, []
+        for i, batch in enumerate(batches):
+            if i in results: translated.update(zip(batch, results[i]))
+            else: retry.extend(batch)
+
+        if retry:
+            singles, failures = run_bounded(lambda r: self._translate_one(r, columns), retry, self.max_workers, self.limiter)
+            for i, rule in enumerate(retry):
+                translated[rule] = singles[i] if i in singles else failures[i]
+        return translated
+
+    def run_spec_based_checks(self, data_file, spec_file, chunksize=None, incremental=False, key_cols=None):
         """
         Executes checks from spec_file (Excel) against data_file (CSV).
-        Returns a DataFrame of Discrepancies.
+        Rules are compiled once (cached translations), evaluated in a single
+        vectorized pass, and returned as a DataFrame of Discrepancies.
+        Files above STREAMING_THRESHOLD_BYTES (or any call with `chunksize`)
+        are streamed chunk by chunk with only the referenced columns loaded.
+        With `incremental`, only rows changed since the last run are rechecked,
+        also when streamed (see self.delta_stats for the Added/Modified/Unchanged counts).
         """
         try:
-            # 1. Load Data
-            df_data = pd.read_csv(data_file)
+            # 1. Load Spec + Data layout
             df_spec = pd.read_excel(spec_file)
             
             # Validate Spec Structure
@@ -50,59 +128,99 @@ class EditCheckExecutor:
             if not all(col in df_spec.columns for col in required_cols):
                 return pd.DataFrame({"Error": [f"Spec file missing required columns: {required_cols}"]})
 
-            discrepancies = []
-            cols_str = ", ".join(df_data.columns.tolist())
+            # Cross-record / cross-domain rows run in run_cross_domain_checks
+            if "Rule_Type" in df_spec.columns:
+                df_spec = df_spec[~df_spec["Rule_Type"].astype(str).str.upper().isin(["CROSS", "LAG"])]
 
-            # 2. Iterate Rules
-            total_checks = len(df_spec)
-            
-            # Initial Status Feedback (if running in streamlit context we can yield, 
-            # but for simplicity we return data and let UI handle spinners)
-            
-            for index, row in df_spec.iterrows():
-                check_id = row['CheckID']
-                desc = row['Description']
-                logic = row['Logic_Rule']
-                
-                # 3. Translate Logic
-                try:
-                    query = self.translate_to_query(logic, cols_str)
-                    
-                    if not query or "Error" in query:
-                         discrepancies.append({
-                            "CheckID": check_id,
-                            "Status": "Logic Error",
-                            "Message": "AI could not generate query."
-                        })
-                         continue
-
-                    # 4. Execute (Sandboxed)
-                    failures = df_data.query(query)
-                    
-                    if not failures.empty:
-                        for _, fail_row in failures.iterrows():
-                            # Create a snippet of the data
-                            row_dump = fail_row.to_dict()
-                            # Try to identify a Subject ID if possible
-                            subj = fail_row.get('SubjectID', fail_row.get('SUBJID', 'Unknown'))
-                            
-                            discrepancies.append({
-                                "SubjectID": subj,
-                                "CheckID": check_id,
-                                "Description": desc,
-                                "Logic": logic,
-                                "Status": "Fail",
-                                "Data_Snippet": str(row_dump)
-                            })
-                            
-                except Exception as e:
-                    discrepancies.append({
-                        "CheckID": check_id,
-                        "Status": "Execution Error",
-                        "Message": str(e)
-                    })
-
-            return pd.DataFrame(discrepancies)
+            if chunksize is None and _file_size(data_file) > STREAMING_THRESHOLD_BYTES:
+                chunksize = DEFAULT_CHUNKSIZE
+
+            columns = read_header(data_file) if chunksize else None
+            df_data = None if chunksize else pd.read_csv(data_file)
+            if columns is None: columns = df_data.columns.tolist()
+
+            # 2. Compile Rules (LLM only on cache misses, batched + concurrent)
+            rules = compile_spec(df_spec, columns, self.translate_to_query, self.cache, translate_many=self.translate_many)
+
+            # 3. Execute: one mask matrix in memory, or streamed per chunk
+            if chunksize and incremental:
+                failures = self._run_incremental_chunked(data_file, rules, columns, chunksize, key_cols)
+            elif chunksize:
+                failures = run_chunked(data_file, rules, columns, chunksize)
+            elif incremental:
+                failures = self._run_incremental(df_data, rules, key_cols)
+            else:
+                mask, runnable = evaluate_rules(df_data, rules)
+                failures = build_discrepancies(df_data, runnable, mask)
+
+            # 4. Columnar discrepancy log + rule-level errors
+            errors = rule_errors(rules)
+            if errors.empty: return failures
+            if failures.empty: return errors
+            return pd.concat([failures, errors], ignore_index=True)
+
+        except Exception as e:
+             return pd.DataFrame({"Error": [f"Critical Engine Failure: {str(e)}"]})
+
+    def _run_incremental(self, df_data, rules, key_cols=None):
+        """Delta mode: row-local rules on changed rows only, cross-row rules on everything."""
+        runnable = [r for r in rules if r.runnable]
+        row_rules = [r for r in runnable if not r.cross_row]
+        cross_rules = [r for r in runnable if r.cross_row]
+
+        sig = signature(RuleCache.column_signature(df_data.columns), *sorted(f"{r.check_id}={r.query}" for r in row_rules))
+        store = DeltaStore("edit_checks", sig)
+
+        def check(subset):
+            mask, evaluated = evaluate_rules(subset, row_rules)
+            return build_discrepancies(subset, evaluated, mask)
+
+        found, self.delta_stats = run_incremental(df_data, check, store, key_cols)
 
+        # Cross-row rules depend on neighbouring rows, so they always see the full frame
+        mask, evaluated = evaluate_rules(df_data, cross_rules)
+        cross_found = build_discrepancies(df_data, evaluated, mask)
+        parts = [f for f in (found, cross_found) if not f.empty]
+        return pd.concat(parts, ignore_index=True) if parts else cross_found
+
+    def _run_incremental_chunked(self, data_file, rules, columns, chunksize, key_cols=None):
+        """
+        Streamed delta mode: one fingerprint snapshot keyed by record key is shared by
+        all chunks, so rows shifted into another chunk still count as unchanged.
+        Cross-row rules still run on the full (narrow) columns in the second pass.
+        """
+        row_rules = [r for r in rules if r.runnable and not r.cross_row]
+        sig = signature(RuleCache.column_signature(columns), *sorted(f"{r.check_id}={r.query}" for r in row_rules))
+
+        def check(subset):
+            mask, evaluated = evaluate_rules(subset, row_rules)
+            return build_discrepancies(subset, evaluated, mask)
+
+        delta = ChunkedDelta(check, DeltaStore("edit_checks_chunked", sig), key_cols)
+        failures = run_chunked(data_file, rules, columns, chunksize, check_chunk=lambda chunk, i, _: delta.check(chunk))
+        self.delta_stats = delta.finish()
+        return failures
+
+    def run_cross_domain_checks(self, domain_files, spec_file):
+        """
+        Executes the CROSS / LAG rows of spec_file across several domains.
+        domain_files: {"DM": csv, "AE": csv, "VS": csv, "EX": csv}
+        Spec columns: CheckID, Description, Rule_Type, Left, Op, Right, Keys, Order_By.
+        """
+        try:
+            df_spec = pd.read_excel(spec_file)
+            rules = parse_cross_rules(df_spec)
+            if not rules:
+                return pd.DataFrame({"Error": ["Spec has no CROSS or LAG rules (Rule_Type column)."]})
+
+            domains = {name: pd.read_csv(f) for name, f in domain_files.items()}
+            return CrossDomainEngine(domains).run(rules)
         except Exception as e:
              return pd.DataFrame({"Error": [f"Critical Engine Failure: {str(e)}"]})
+
+
+def _file_size(data_file):
+    """Size in bytes of a path or an uploaded buffer (0 if unknown)."""
+    if isinstance(data_file, str):
+        return os.path.getsize(data_file) if os.path.exists(data_file) else 0
+    return getattr(data_file, "size", 0) or 0
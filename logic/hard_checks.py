@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from logic.date_parser import parsed_column
+
+ISSUE_COLS = ["Row", "Column", "Value", "Issue"]
+KEY_ID_COLS = ["USUBJID", "SUBJID", "SUBJECTID", "SITEID"]
+
+
+class ColumnCache:
+    """
+    Parsed views of a frame's columns for one run of the registry.
+    Several checks on the same column share one parse (dates are also
+    memoized per DataFrame across engines by logic.date_parser).
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.now = pd.Timestamp.now()
+        self._dates = {}
+        self._numbers = {}
+
+    def dates(self, col):
+        if col not in self._dates:
+            self._dates[col] = parsed_column(self.df, col)
+        return self._dates[col]
+
+    def numbers(self, col):
+        if col not in self._numbers:
+            self._numbers[col] = pd.to_numeric(self.df[col], errors='coerce')
+        return self._numbers[col]
+
+
+# --- COLUMN SELECTORS ---
+def date_columns(df):
+    return [c for c in df.columns if "DATE" in str(c).upper() or "DTC" in str(c).upper()]
+
+def vital_result_columns(df):
+    return [c for c in df.columns if str(c).startswith("VS") and "ORRES" in str(c)]
+
+def key_id_columns(df):
+    return [c for c in df.columns if str(c).upper() in KEY_ID_COLS]
+
+
+# --- TESTS (column -> boolean mask of failing rows) ---
+TESTS = {}
+
+def register_test(name):
+    """Decorator: makes a mask function available to declarative checks as Test=name."""
+    def wrap(fn):
+        TESTS[name] = fn
+        return fn
+    return wrap
+
+@register_test("future_date")
+def _future_date(cache, col, check):
+    return cache.dates(col) > cache.now
+
+@register_test("negative")
+def _negative(cache, col, check):
+    return cache.numbers(col) < 0
+
+@register_test("missing")
+def _missing(cache, col, check):
+    values = cache.df[col]
+    return values.isna() | values.astype(str).str.strip().eq("")
+
+@register_test("range")
+def _out_of_range(cache, col, check):
+    nums = cache.numbers(col)
+    lo, hi = check.get("Min"), check.get("Max")
+    mask = pd.Series(False, index=nums.index)
+    if lo is not None: mask |= nums < lo
+    if hi is not None: mask |= nums > hi
+    return mask
+
+
+class CheckRegistry:
+    """
+    Declarative hard checks (ZERO Hallucinations).
+    Each check: {"Issue": label, "Columns": selector or list, "Test": TESTS key, ...params}.
+    """
+
+    def __init__(self, checks=None):
+        self.checks = list(checks) if checks is not None else []
+
+    def register(self, issue, columns, test, **params):
+        if test not in TESTS:
+            raise ValueError(f"Unknown hard-check test '{test}'. Known: {sorted(TESTS)}")
+        self.checks.append({"Issue": issue, "Columns": columns, "Test": test, **params})
+        return self
+
+    def add_range_check(self, columns, min_value=None, max_value=None, issue="Out of Range"):
+        return self.register(issue, columns, "range", Min=min_value, Max=max_value)
+
+    def definition(self):
+        """Stable text of every check (selector names, test and parameters), e.g. for delta signatures."""
+        parts = []
+        for check in self.checks:
+            selector = check["Columns"]
+            cols = getattr(selector, "__name__", repr(selector)) if callable(selector) else sorted(map(str, selector))
+            params = sorted((k, repr(v)) for k, v in check.items() if k not in ("Issue", "Columns", "Test"))
+            parts.append(f"{check['Issue']}|{cols}|{check['Test']}|{params}")
+        return parts
+
+    def run(self, df, cache=None):
+        """Runs every check as a mask and gathers the issue table in one pass per check."""
+        cache = cache or ColumnCache(df)
+        parts = []
+
+        for check in self.checks:
+            selector = check["Columns"]
+            cols = selector(df) if callable(selector) else [c for c in selector if c in df.columns]
+            if not cols: continue
+
+            masks = []
+            for col in cols:
+                try:
+                    masks.append(TESTS[check["Test"]](cache, col, check).fillna(False).to_numpy(dtype=bool))
+                except Exception:
+                    masks.append(np.zeros(len(df), dtype=bool)) # Skip column if it cannot be parsed
+
+            # Column-major gather: (col, row) pairs of every failure
+            col_pos, row_pos = np.nonzero(np.vstack(masks))
+            if len(row_pos) == 0: continue
+
+            values = np.empty(len(row_pos), dtype=object)
+            for j, col in enumerate(cols):
+                hit = col_pos == j
+                if hit.any(): values[hit] = df[col].to_numpy()[row_pos[hit]]
+
+            parts.append(pd.DataFrame({
+                "Row": df.index.to_numpy()[row_pos],
+                "Column": np.asarray(cols, dtype=object)[col_pos],
+                "Value": values,
+                "Issue": check["Issue"],
+            }))
+
+        if not parts:
+            return pd.DataFrame(columns=ISSUE_COLS)
+        return pd.concat(parts, ignore_index=True)
+
+
+def default_registry():
+    """The standard hard checks: future dates, negative vitals, missing key IDs."""
+    return CheckRegistry([
+        {"Issue": "Future Date", "Columns": date_columns, "Test": "future_date"},
+        {"Issue": "Negative Value", "Columns": vital_result_columns, "Test": "negative"},
+        {"Issue": "Missing Key ID", "Columns": key_id_columns, "Test": "missing"},
+    ])
@@ -1,6 +1,6 @@
 import os
 import json
-import pdfplumber
+from logic.pdf_extract import PdfDocument
 from langchain_google_vertexai import ChatVertexAI
 from langchain_core.prompts import PromptTemplate
 
@@ -25,14 +25,9 @@ class KnowledgeEngine:
             return f"Error initializing AI: {e}"
 
         # 1. Extract Text
-        full_text = ""
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                # Read first 50 pages (enough to get structure + boilerplate)
-                for i, page in enumerate(pdf.pages[:50]): 
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
+            # Read first 50 pages (enough to get structure + boilerplate)
+            full_text = PdfDocument(pdf_path).text(max_pages=50)
         except Exception as e:
             return f"Error reading PDF: {e}"
 
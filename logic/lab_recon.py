@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+LAB_KEYS = ["USUBJID", "VISIT", "LBTEST"]
+
+# Spellings seen in vendor transfers -> one unit label
+UNIT_ALIASES = {
+    "MG/DL": "mg/dL", "MG/L": "mg/L", "G/DL": "g/dL", "G/L": "g/L",
+    "MMOL/L": "mmol/L", "UMOL/L": "umol/L", "µMOL/L": "umol/L", "μMOL/L": "umol/L",
+    "MEQ/L": "mEq/L", "U/L": "U/L", "IU/L": "U/L", "10^9/L": "10^9/L", "X10^9/L": "10^9/L",
+    "10^3/UL": "10^9/L", "K/UL": "10^9/L", "%": "%",
+}
+
+# (test or None for any test, from unit, to unit) -> factor (value_to = value_from * factor)
+UNIT_CONVERSIONS = {
+    (None, "g/dL", "g/L"): 10.0,
+    (None, "mg/dL", "mg/L"): 10.0,
+    (None, "mEq/L", "mmol/L"): 1.0,
+    ("GLUCOSE", "mg/dL", "mmol/L"): 0.0555,
+    ("CHOLESTEROL", "mg/dL", "mmol/L"): 0.02586,
+    ("HDL CHOLESTEROL", "mg/dL", "mmol/L"): 0.02586,
+    ("LDL CHOLESTEROL", "mg/dL", "mmol/L"): 0.02586,
+    ("TRIGLYCERIDES", "mg/dL", "mmol/L"): 0.01129,
+    ("CREATININE", "mg/dL", "umol/L"): 88.42,
+    ("BILIRUBIN", "mg/dL", "umol/L"): 17.1,
+    ("UREA NITROGEN", "mg/dL", "mmol/L"): 0.357,
+    ("CALCIUM", "mg/dL", "mmol/L"): 0.2495,
+    ("HEMOGLOBIN", "g/dL", "mmol/L"): 0.6206,
+}
+
+# Per-test tolerance: mismatch when |diff| > max(abs, rel * |vendor value|)
+DEFAULT_TOLERANCE = {"abs": 0.1, "rel": 0.0}
+TOLERANCE_RULES = {
+    "GLUCOSE": {"abs": 0.1, "rel": 0.02},
+    "CREATININE": {"abs": 1.0, "rel": 0.02},
+    "HEMOGLOBIN": {"abs": 0.1, "rel": 0.01},
+    "PLATELETS": {"abs": 1.0, "rel": 0.02},
+}
+
+
+def normalize_units(series):
+    text = series.fillna("").astype(str).str.strip()
+    return text.str.upper().map(UNIT_ALIASES).fillna(text)
+
+
+def conversion_factors(tests, from_units, to_units, conversions=None):
+    """
+    Factor per row taking from_units to to_units (1.0 for equal units, NaN if unknown).
+    Test-specific entries win over generic ones; inverse pairs are derived.
+    """
+    table = {}
+    for (test, src, dst), factor in (conversions or UNIT_CONVERSIONS).items():
+        table[(test, dst, src)] = 1.0 / factor
+    for (test, src, dst), factor in (conversions or UNIT_CONVERSIONS).items():
+        table[(test, src, dst)] = factor
+
+    pairs = pd.DataFrame({"t": tests.astype(str).str.upper().to_numpy(), "f": from_units.to_numpy(), "u": to_units.to_numpy()})
+    uniq = pairs.drop_duplicates().copy()
+    uniq["factor"] = [1.0 if f == u else table.get((t, f, u), table.get((None, f, u), np.nan))
+                      for t, f, u in uniq.itertuples(index=False)]
+    return pairs.merge(uniq, on=["t", "f", "u"], how="left")["factor"].to_numpy(dtype=float)
+
+
+def tolerance_arrays(tests, rules=None):
+    rules = TOLERANCE_RULES if rules is None else rules
+    upper = tests.astype(str).str.upper()
+    abs_tol = upper.map({t: r.get("abs", 0.0) for t, r in rules.items()}).fillna(DEFAULT_TOLERANCE["abs"])
+    rel_tol = upper.map({t: r.get("rel", 0.0) for t, r in rules.items()}).fillna(DEFAULT_TOLERANCE["rel"])
+    return abs_tol.to_numpy(dtype=float), rel_tol.to_numpy(dtype=float)
+
+
+def _side(df, tag):
+    out = df[LAB_KEYS].copy()
+    out[f"res_{tag}"] = df["LBORRES"] if "LBORRES" in df.columns else np.nan
+    out[f"unit_{tag}"] = normalize_units(df["LBORRESU"]) if "LBORRESU" in df.columns else ""
+    return out
+
+
+def pair_results(df_c, df_v, links=None):
+    """
+    Clinical and vendor results paired on subject/visit/test, with numbers and normalized units per side.
+    With links (rid_l / rid_r row positions from record linkage) rows are paired by position instead;
+    the clinical side's keys are kept.
+    """
+    if links is None:
+        paired = pd.merge(_side(df_c, "c"), _side(df_v, "v"), on=LAB_KEYS, how="inner")
+    else:
+        clin = _side(df_c, "c").iloc[links["rid_l"].to_numpy()].reset_index(drop=True)
+        vend = _side(df_v, "v").iloc[links["rid_r"].to_numpy()].drop(columns=LAB_KEYS).reset_index(drop=True)
+        paired = pd.concat([clin, vend], axis=1)
+    paired["num_c"] = pd.to_numeric(paired["res_c"], errors="coerce")
+    paired["num_v"] = pd.to_numeric(paired["res_v"], errors="coerce")
+    return paired
+
+
+def compare_paired(paired, tolerances=None, conversions=None):
+    """
+    Column-wise comparison of paired results.
+    Returns (value_mismatches, unit_mismatches, unresolved): unresolved holds
+    the rows whose numeric units have no known conversion.
+    A unit left blank on one side is taken to be the other side's unit (factor 1.0).
+    """
+    numeric = paired["num_c"].notna() & paired["num_v"].notna()
+    unit_c = paired["unit_c"].mask(paired["unit_c"] == "", paired["unit_v"])
+    unit_v = paired["unit_v"].mask(paired["unit_v"] == "", paired["unit_c"])
+    factor = conversion_factors(paired["LBTEST"], unit_c, unit_v, conversions)
+    clin_in_vendor_unit = paired["num_c"].to_numpy() * factor
+    diff = np.abs(clin_in_vendor_unit - paired["num_v"].to_numpy())
+    abs_tol, rel_tol = tolerance_arrays(paired["LBTEST"], tolerances)
+    # Small epsilon so a difference of exactly the tolerance is not flagged by float noise
+    limit = np.maximum(abs_tol, rel_tol * np.abs(paired["num_v"].to_numpy())) + 1e-9
+
+    known = numeric.to_numpy() & ~np.isnan(factor)
+    bad = known & (diff > limit)
+    value_mismatches = pd.DataFrame({
+        "Subject": paired["USUBJID"].to_numpy()[bad],
+        "Test": paired["LBTEST"].to_numpy()[bad],
+        "Clinical_Val": paired["num_c"].to_numpy()[bad],
+        "Vendor_Val": paired["num_v"].to_numpy()[bad],
+        "Diff": diff[bad],
+        "_pos": np.flatnonzero(bad),
+    })
+
+    unit_differs = (unit_c != unit_v).to_numpy()
+    unit_bad = ~numeric.to_numpy() & unit_differs
+    unit_mismatches = pd.DataFrame({
+        "Subject": paired["USUBJID"].to_numpy()[unit_bad],
+        "Test": paired["LBTEST"].to_numpy()[unit_bad],
+        "Issue": ("Unit Mismatch: " + paired["unit_c"] + " vs " + paired["unit_v"]).to_numpy()[unit_bad],
+        "_pos": np.flatnonzero(unit_bad),
+    })
+    unresolved = paired[numeric.to_numpy() & np.isnan(factor)]
+    return value_mismatches, unit_mismatches, unresolved
+
+
+def unit_pairs(frame):
+    """Distinct (test, clinical unit, vendor unit) triples of a frame of paired results."""
+    return list(frame[["LBTEST", "unit_c", "unit_v"]].astype(str).drop_duplicates().itertuples(index=False, name=None))
+
+
+def merge_issues(*frames):
+    frames = [f for f in frames if not f.empty]
+    if not frames: return pd.DataFrame()
+    out = pd.concat(frames, ignore_index=True).sort_values("_pos", kind="stable")
+    return out.drop(columns=["_pos"]).reset_index(drop=True)
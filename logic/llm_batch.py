@@ -0,0 +1,75 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def chunked(items, size):
+    """Splits a list into consecutive batches of at most `size` items."""
+    size = max(1, int(size))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def is_rate_limit_error(e):
+    """True for quota / 429 style errors from Vertex AI (or anything that looks like one)."""
+    name = type(e).__name__
+    msg = str(e).upper()
+    return name in ("ResourceExhausted", "TooManyRequests") or "429" in msg or "RESOURCE_EXHAUSTED" in msg or "QUOTA" in msg
+
+
+class RateLimiter:
+    """
+    Spaces LLM calls across all worker threads (requests per minute).
+    A rate-limit error pushes the next slot back for every worker instead of
+    each thread sleeping through its own retry backoff.
+    """
+
+    def __init__(self, requests_per_minute=60, backoff=5.0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.backoff = backoff
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        wait = slot - now
+        if wait > 0: time.sleep(wait)
+
+    def penalize(self, seconds=None):
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + (seconds or self.backoff))
+
+
+def run_bounded(fn, items, max_workers=4, limiter=None, retries=2):
+    """
+    Runs fn(item) for every item on a bounded thread pool.
+    Returns (results, failures): dicts keyed by item position. A failing item
+    never blocks the others; rate-limit errors are retried via the limiter.
+    """
+    results, failures = {}, {}
+    if not items: return results, failures
+
+    def _call(item):
+        for attempt in range(retries + 1):
+            if limiter: limiter.acquire()
+            try:
+                return fn(item)
+            except Exception as e:
+                if attempt < retries and is_rate_limit_error(e):
+                    if limiter: limiter.penalize()
+                    else: time.sleep(1.0 * (attempt + 1))
+                    continue
+                raise
+
+    workers = max(1, min(max_workers, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_call, item): i for i, item in enumerate(items)}
+        for fut, i in futures.items():
+            try:
+                results[i] = fut.result()
+            except Exception as e:
+                failures[i] = e
+
+    return results, failures
@@ -1,3 +1,7 @@
+import pandas as pd
+from datetime import datetime
+from logic.date_parser import parsed_column
+from logic.ctcae_grading import grade_labs
 from logic.recist_engine import RecistCalculator
 
 class OncologyEngine:
@@ -14,56 +18,70 @@ class OncologyEngine:
         pass 
 
 
-    def check_survival_status(self, df_patients):
+    def check_survival_status(self, df_patients, max_days=90):
         """
         Flags patients potentially lost to follow-up (> 90 days since last contact).
         """
-        issues = []
-        today = datetime.now()
-        
         if 'LastContactDate' not in df_patients.columns:
             return pd.DataFrame({"Error": ["Column 'LastContactDate' missing"]})
-            
-        for index, row in df_patients.iterrows():
-            last_date = pd.to_datetime(row['LastContactDate'], errors='coerce')
-            if pd.isna(last_date):
-                continue
-                
-            delta = (today - last_date).days
-            if delta > 90:
-                issues.append({
-                    "Subject": row.get('USUBJID', 'Unknown'),
-                    "Last Contact": last_date.date(),
-                    "Days Since": delta,
-                    "Status": "Risk: Lost to Follow-up"
-                })
-                
-        return pd.DataFrame(issues)
 
-    def check_toxicity_vs_dose(self, df_lb, df_ex):
+        # Parse the whole column once (shared date parser)
+        last_dates = parsed_column(df_patients, 'LastContactDate')
+        days_since = (pd.Timestamp(datetime.now()) - last_dates).dt.days
+        at_risk = (days_since > max_days).fillna(False).to_numpy()
+
+        subjects = df_patients['USUBJID'] if 'USUBJID' in df_patients.columns else pd.Series('Unknown', index=df_patients.index)
+        return pd.DataFrame({
+            "Subject": subjects[at_risk].to_numpy(),
+            "Last Contact": last_dates[at_risk].dt.date.to_numpy(),
+            "Days Since": days_since[at_risk].astype(int).to_numpy(),
+            "Status": "Risk: Lost to Follow-up",
+        }, columns=["Subject", "Last Contact", "Days Since", "Status"])
+
+    def check_toxicity_vs_dose(self, df_lb, df_ex, window_days=None, min_grade=3, lb_date='LBDTC', ex_date='EXSTDTC'):
         """
         Cross-checks Grade 3+ Toxicities against Dose Reductions.
         If Lab Grade >= 3 AND Dose was NOT reduced -> Flag Issue.
+        Grades come from CTCAE_Grade / LBTOXGR, or are derived from raw results (grade_labs).
+        With window_days, only a reduction dated on the toxicity date or up to
+        window_days after it counts (toxicities without a date fall back to any reduction).
         """
-        # Simplified Mock Logic for MVP
-        # In real life, we'd map Lab Value ranges to CTCAE Grades
-        
-        issues = []
-        # Finding high grade toxicities (Mock column 'CTCAE_Grade')
-        if 'CTCAE_Grade' in df_lb.columns and 'DoseReduced' in df_ex.columns:
-             high_tox = df_lb[df_lb['CTCAE_Grade'] >= 3]
-             
-             for idx, row in high_tox.iterrows():
-                 subj = row['USUBJID']
-                 # Check if this subject had a dose reduction
-                 patient_ex = df_ex[df_ex['USUBJID'] == subj]
-                 # If no dose reduction recorded
-                 if patient_ex[patient_ex['DoseReduced'] == 'Yes'].empty:
-                     issues.append({
-                         "Subject": subj,
-                         "Toxicity": row.get('LBTEST', 'Lab'),
-                         "Grade": row['CTCAE_Grade'],
-                         "Issue": "Grade 3+ Toxicity but No Dose Reduction found."
-                     })
-                     
-        return pd.DataFrame(issues)
+        cols = ["Subject", "Toxicity", "Grade", "Issue"]
+        grade_col = next((g for g in ('CTCAE_Grade', 'LBTOXGR') if g in df_lb.columns), None)
+        if grade_col is None and 'LBTESTCD' in df_lb.columns:
+            df_lb, grade_col = grade_labs(df_lb), 'LBTOXGR'  # grade raw results (CTCAE v5)
+        if grade_col is None or 'DoseReduced' not in df_ex.columns:
+            return pd.DataFrame(columns=cols)
+
+        grades = pd.to_numeric(df_lb[grade_col], errors='coerce')
+        high = (grades >= min_grade).fillna(False).to_numpy(dtype=bool)
+        name_col = next((n for n in ('LBTOX', 'LBTEST') if n in df_lb.columns), None)
+        tox = pd.DataFrame({
+            "Subject": df_lb.loc[high, 'USUBJID'].to_numpy(),
+            "Toxicity": df_lb.loc[high, name_col].to_numpy() if name_col else 'Lab',
+            "Grade": grades[high].to_numpy(),
+        })
+
+        # Reductions: one flag per subject, plus dated events for the window join
+        reduced = df_ex['DoseReduced'].astype(str).str.strip().str.upper().isin(["YES", "Y"]).to_numpy()
+        ex = pd.DataFrame({"Subject": df_ex.loc[reduced, 'USUBJID'].to_numpy()}).astype({"Subject": tox["Subject"].dtype})
+        covered = tox["Subject"].isin(ex["Subject"]).to_numpy().copy()
+        issue = "Grade 3+ Toxicity but No Dose Reduction found."
+
+        if window_days is not None and lb_date in df_lb.columns and ex_date in df_ex.columns:
+            tox["_date"] = parsed_column(df_lb, lb_date)[high].to_numpy()
+            ex["_date"] = parsed_column(df_ex, ex_date)[reduced].to_numpy()
+            tox["_row"] = range(len(tox))
+            dated = tox[tox["_date"].notna()].sort_values("_date", kind="stable")
+            events = ex.dropna(subset=["_date"]).sort_values("_date").rename(columns={"_date": "_ex_date"})
+            if events.empty:
+                covered[dated["_row"].to_numpy()] = False  # no dated reduction at all
+            elif not dated.empty:
+                hits = pd.merge_asof(dated, events, left_on="_date", right_on="_ex_date", by="Subject",
+                                     direction="forward", tolerance=pd.Timedelta(days=window_days))
+                covered[hits["_row"].to_numpy()] = hits["_ex_date"].notna().to_numpy()
+            issue = f"Grade 3+ Toxicity but No Dose Reduction within {window_days} days."
+
+        flagged = tox.loc[~covered, ["Subject", "Toxicity", "Grade"]].reset_index(drop=True)
+        flagged["Issue"] = issue
+        return flagged[cols]
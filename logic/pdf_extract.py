@@ -0,0 +1,185 @@
+import os
+import io
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+# pdfplumber is only needed when a document is not cached yet
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+# Persistence Path (same backend_data layout as the other caches)
+CACHE_DIR = os.path.join(os.getcwd(), "backend_data", "pdf_cache")
+PAGES_PER_TASK = 16
+
+
+def _read_bytes(pdf_file):
+    """Raw bytes of a path or file-like (Streamlit UploadedFile); buffers are rewound."""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pos = pdf_file.tell() if hasattr(pdf_file, "tell") else 0
+    data = pdf_file.read()
+    if hasattr(pdf_file, "seek"): pdf_file.seek(pos)
+    return data
+
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _page_count(data):
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_range(data, start, stop, tables):
+    """Worker: text (and raw table rows) of pages [start, stop). Runs in a separate process."""
+    pages = []
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        for page in pdf.pages[start:stop]:
+            pages.append({
+                "page": page.page_number,
+                "text": page.extract_text() or "",
+                "tables": page.extract_tables() if tables else None,
+            })
+            page.flush_cache()
+    return pages
+
+
+class PdfCache:
+    """
+    Extracted pages per document, one JSON file per SHA-256 of the PDF bytes,
+    so every module shares a single parse of the same protocol.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def load(self, digest):
+        try:
+            with open(self._path(digest), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, digest, entry):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(digest)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # read-only deploys just parse again next time
+
+
+def _extract(data, ranges, tables, workers):
+    if len(ranges) > 1 and workers != 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(ranges))) as pool:
+                parts = pool.map(_extract_range, *zip(*[(data, s, e, tables) for s, e in ranges]))
+                return [p for part in parts for p in part]
+        except (OSError, RuntimeError):
+            pass  # no process pool available (sandboxed hosts): parse in-process
+    return [p for s, e in ranges for p in _extract_range(data, s, e, tables)]
+
+
+def _ranges(indices):
+    """Sorted page indices -> contiguous [start, stop) ranges of at most PAGES_PER_TASK pages."""
+    ranges = []
+    for i in indices:
+        if ranges and ranges[-1][1] == i and i - ranges[-1][0] < PAGES_PER_TASK:
+            ranges[-1][1] = i + 1
+        else:
+            ranges.append([i, i + 1])
+    return [tuple(r) for r in ranges]
+
+
+class PdfDocument:
+    """
+    Lazy per-page view of a PDF path or buffer. Pages (and tables) are parsed
+    only as far as the caller reads, in growing page-parallel batches, and
+    cached by file SHA-256 so every module shares a single parse.
+    """
+
+    def __init__(self, pdf_file, cache=None, workers=None):
+        self.cache = cache or PdfCache()
+        self.workers = workers
+        self._data = _read_bytes(pdf_file)
+        self.digest = file_digest(self._data)
+        self._entry = self.cache.load(self.digest) or {"page_count": None, "pages": []}
+
+    @staticmethod
+    def _require():
+        if pdfplumber is None:
+            raise ImportError("PDF extraction requires pdfplumber (pip install pdfplumber).")
+
+    @property
+    def page_count(self):
+        if self._entry["page_count"] is None:
+            self._require()
+            self._entry["page_count"] = _page_count(self._data)
+        return self._entry["page_count"]
+
+    def _ensure(self, stop, tables):
+        """Parses whatever is missing among the first `stop` pages."""
+        pages = self._entry["pages"]
+        missing = [i for i in range(stop) if i >= len(pages) or (tables and pages[i]["tables"] is None)]
+        if not missing: return
+        self._require()
+        for page in _extract(self._data, _ranges(missing), tables, self.workers):
+            i = page["page"] - 1
+            if i < len(pages):
+                if page["tables"] is None: page["tables"] = pages[i]["tables"]
+                pages[i] = page
+            else:
+                pages.append(page)
+        self.cache.save(self.digest, self._entry)
+
+    def pages(self, tables=False, limit=None):
+        """Yields page dicts ({"page", "text", "tables"}), parsing in batches only as far as consumed."""
+        stop = self.page_count if limit is None else min(limit, self.page_count)
+        batch, pos = PAGES_PER_TASK, 0
+        while pos < stop:
+            end = min(pos + batch, stop)
+            self._ensure(end, tables)
+            yield from self._entry["pages"][pos:end]
+            pos, batch = end, min(batch * 2, PAGES_PER_TASK * (self.workers or os.cpu_count() or 1))
+
+    def text(self, max_chars=None, max_pages=None, page_format="{text}\n", skip_empty=True):
+        """Page texts formatted with page_format ({page}, {text}) and joined once, stopping at max_chars."""
+        parts, size = [], 0
+        for page in self.pages(limit=max_pages):
+            if skip_empty and not page["text"]: continue
+            parts.append(page_format.format(page=page["page"], text=page["text"]))
+            size += len(parts[-1])
+            if max_chars is not None and size >= max_chars: break
+        text = "".join(parts)
+        return text if max_chars is None else text[:max_chars]
+
+    def tables(self, limit=None, max_pages=None):
+        """Yields tables (lists of rows) in page order, stopping after `limit` tables."""
+        if limit == 0: return
+        count = 0
+        for page in self.pages(tables=True, limit=max_pages):
+            for table in page["tables"]:
+                yield table
+                count += 1
+                if limit is not None and count >= limit: return
+
+
+def extract_pages(pdf_file, tables=False, max_pages=None, cache=None, workers=None):
+    """
+    Per-page text (and tables as lists of rows when tables=True) of a PDF path or buffer:
+    [{"page": n, "text": str, "tables": [...] or None}, ...].
+    """
+    return list(PdfDocument(pdf_file, cache, workers).pages(tables, max_pages))
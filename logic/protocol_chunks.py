@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import hashlib
+
+# Persistence Path (same backend_data layout as the reconciler header cache)
+CHUNK_CACHE_DIR = os.path.join(os.getcwd(), "backend_data", "digitizer")
+CHUNK_CACHE_FILE = os.path.join(CHUNK_CACHE_DIR, "chunk_results.json")
+
+CHUNK_CHARS = 30000  # ~7.5k tokens of protocol text per extraction call
+
+# "5 STUDY DESIGN", "5.2. Inclusion Criteria", "APPENDIX 3 ...", "SCHEDULE OF ACTIVITIES"
+# (table-of-contents lines end in a page number or dot leaders and are skipped)
+HEADING = re.compile(
+    r'^[ \t]*(?:(?P<num>\d{1,2}(?:\.\d{1,2})*)\.?[ \t]+(?P<title>[A-Z][^\n]{2,100}?)'
+    r'|(?P<appendix>APPENDIX\b[^\n]{0,100}?)'
+    r'|[A-Z][A-Z0-9 ,&/()\-]{5,80}?)[ \t]*(?<![\d.])$', re.MULTILINE)
+
+
+def _key(value):
+    return " ".join(str(value or "").split()).casefold()
+
+
+def _is_title(text):
+    """Heading-style wording ("Study Treatment", "STUDY DESIGN"), not a numbered list item."""
+    return all(w[0].isupper() or not w[0].isalpha() for w in text.split() if len(w) > 3)
+
+
+def split_sections(text):
+    """
+    Protocol text -> [(heading, level, body)] at numbered / appendix / all-caps headings.
+    Level 1 marks top-level sections (an appendix, the next chapter number, or a later one
+    with heading-style wording when chapters were missed); numbered list items continuing
+    1., 2., 3. ..., sub-sections and all-caps titles are level 2. Text before the first
+    heading (title page) comes back with heading "" and level 1.
+    """
+    marks, chapter, list_next = [(0, "", 1)], 0, None
+    for m in HEADING.finditer(text):
+        level, num = 2, m.group("num")
+        if m.group("appendix"):
+            level = 1
+        elif num and "." not in num:
+            n, dotted, title = int(num), m.group(0).strip()[len(num):].startswith("."), m.group("title")
+            in_list = list_next == (n, dotted) and not title.isupper()
+            if not in_list and (n == chapter + 1 or (n > chapter and _is_title(title))):
+                chapter, level, list_next = n, 1, None
+            else:
+                list_next = (n + 1, dotted)
+        if m.start() == 0: marks.pop(0)
+        marks.append((m.start(), m.group(0).strip(), level))
+    ends = [m[0] for m in marks[1:]] + [len(text)]
+    return [(head, level, text[start:end]) for (start, head, level), end in zip(marks, ends) if text[start:end].strip()]
+
+
+def _split_long(body, max_chars):
+    """Oversized section -> pieces at paragraph breaks (hard cut only inside a giant paragraph)."""
+    pieces, current = [], ""
+    for para in re.split(r'(?<=\n\n)', body):
+        while len(para) > max_chars:
+            pieces.append(para[:max_chars])
+            para = para[max_chars:]
+        if current and len(current) + len(para) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += para
+    if current.strip(): pieces.append(current)
+    return pieces
+
+
+def chunk_protocol(text, max_chars=CHUNK_CHARS):
+    """
+    Section-aware chunks [{"section", "text"}] of at most max_chars.
+    Sub-sections are packed only within their top-level section, so an amendment
+    in one section leaves every other chunk (and its cached result) unchanged.
+    """
+    chunks, current = [], None
+    for head, level, body in split_sections(text):
+        fits = current is not None and len(current["text"]) + len(body) <= max_chars
+        if level > 1 and fits:
+            current["text"] += body
+            continue
+        if current: chunks.append(current)
+        current = {"section": head or "Title Page", "text": body}
+        if len(body) > max_chars:
+            *full, last = _split_long(body, max_chars)
+            chunks.extend({"section": current["section"], "text": p} for p in full)
+            current["text"] = last
+    if current: chunks.append(current)
+    return chunks
+
+
+class ChunkResultCache:
+    """
+    Persistent per-chunk extraction results keyed by the SHA-256 of the prompt
+    version and chunk text, so an amended protocol only re-extracts changed sections.
+    """
+
+    def __init__(self, path=CHUNK_CACHE_FILE):
+        self.path = path
+        self._store = None
+
+    @staticmethod
+    def chunk_key(text, version=""):
+        return hashlib.sha256(f"{version}\n{text}".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if self._store is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._store = json.load(f)
+            except (OSError, ValueError):
+                self._store = {}
+        return self._store
+
+    def get(self, key):
+        return self._load().get(key)
+
+    def put_many(self, results):
+        if not results: return
+        self._load().update(results)
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._store, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # read-only deploys keep the in-memory results
+
+
+def _day(visit):
+    """Study day used to order visits (day, else week * 7; unknown last)."""
+    for field, factor in (("day", 1), ("week", 7)):
+        try:
+            return float(visit.get(field)) * factor
+        except (TypeError, ValueError):
+            continue
+    return float("inf")
+
+
+def _union(target, items, seen):
+    for item in items or []:
+        k = _key(item)
+        if k and k not in seen:
+            seen.add(k)
+            target.append(item)
+
+
+def merge_partials(partials):
+    """
+    Deterministic merge of per-chunk digitizer JSON (in document order):
+    first non-empty metadata field wins, arms / visits / cohorts are de-duplicated
+    by normalized name with later chunks only filling gaps, criteria and secondary
+    endpoints are unioned in order, and visits are sorted by study day.
+    """
+    merged = {"metadata": {}, "arms": [], "visit_schedule": [], "cohorts": [], "endpoints": {"primary": None, "secondary": []}}
+    arms, visits, cohorts, seen_secondary = {}, {}, {}, set()
+
+    for part in partials:
+        if not isinstance(part, dict): continue
+        for field, value in (part.get("metadata") or {}).items():
+            if merged["metadata"].get(field) in (None, "") and value not in (None, ""):
+                merged["metadata"][field] = value
+
+        for name, store, target in (("arms", arms, merged["arms"]), ("visit_schedule", visits, merged["visit_schedule"])):
+            label = "name" if name == "arms" else "visit_label"
+            for entry in part.get(name) or []:
+                if not isinstance(entry, dict) or not _key(entry.get(label)): continue
+                known = store.get(_key(entry.get(label)))
+                if known is None:
+                    store[_key(entry.get(label))] = known = dict(entry)
+                    target.append(known)
+                for field, value in entry.items():
+                    if known.get(field) in (None, "") and value not in (None, ""): known[field] = value
+
+        for cohort in part.get("cohorts") or []:
+            if not isinstance(cohort, dict) or not _key(cohort.get("name")): continue
+            known = cohorts.get(_key(cohort["name"]))
+            if known is None:
+                known = cohorts[_key(cohort["name"])] = {"name": cohort["name"], "criteria": [], "_seen": set()}
+                merged["cohorts"].append(known)
+            _union(known["criteria"], cohort.get("criteria"), known["_seen"])
+
+        endpoints = part.get("endpoints") or {}
+        if not merged["endpoints"]["primary"] and endpoints.get("primary"):
+            merged["endpoints"]["primary"] = endpoints["primary"]
+        secondary = endpoints.get("secondary")
+        _union(merged["endpoints"]["secondary"], [secondary] if isinstance(secondary, str) else secondary, seen_secondary)
+
+    for cohort in merged["cohorts"]: cohort.pop("_seen")
+    merged["visit_schedule"].sort(key=_day)  # stable: ties keep document order
+    return merged
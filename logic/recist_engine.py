@@ -1,3 +1,159 @@
+import numpy as np
+import pandas as pd
+
+# RECIST 1.1 thresholds (mm / %)
+SOLID_MIN = 10          # measurable solid lesion: long diameter
+NODE_MIN = 15           # measurable lymph node: short axis
+NODE_NORMAL = 10        # node counts as resolved below this short axis
+MAX_TARGETS = 5
+MAX_PER_ORGAN = 2
+PR_CHANGE = -30         # % from baseline
+PD_CHANGE = 20          # % from nadir
+PD_ABSOLUTE = 5         # mm from nadir
+
+# Long lesion table (TU/TR style); rename via score_recist(..., columns={...})
+COLUMNS = {
+    "subject": "USUBJID", "visit": "VISIT", "visitnum": "VISITNUM", "lesion": "LESION",
+    "organ": "ORGAN", "type": "TYPE", "diameter": "DIAMETER", "category": "CATEGORY", "status": "STATUS",
+}
+NT_PROGRESSION = {"PD", "UNEQUIVOCAL PROGRESSION", "PROGRESSION"}
+NT_ABSENT = {"CR", "ABSENT", "NOT PRESENT"}
+
+
+def target_responses(baseline, nadir, current, complete=None):
+    """
+    Target response per timepoint (arrays): CR / PR / SD / PD / NE.
+    PD is measured from the nadir (smallest sum so far, baseline included), PR from baseline.
+    complete marks timepoints where every target has resolved (defaults to current == 0).
+    """
+    base, low, cur = (np.asarray(a, dtype=float) for a in (baseline, nadir, current))
+    complete = cur == 0 if complete is None else np.asarray(complete, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        from_base = (cur - base) / base * 100
+        rise = cur - low
+        progression = (rise >= low * PD_CHANGE / 100) & (rise >= PD_ABSOLUTE)
+    return np.select(
+        [~(base > 0) | np.isnan(cur), complete, progression, from_base <= PR_CHANGE],
+        ["NE", "CR", "PD", "PR"], "SD").astype(object)
+
+
+def overall_responses(target, non_target, new_lesions):
+    """
+    RECIST 1.1 overall response matrix (arrays). "NA" = no lesions of that kind;
+    subjects without targets follow the non-target-only table (CR / NON-CR/NON-PD / PD / NE).
+    """
+    t = np.asarray(target, dtype=object)
+    nt = np.char.upper(np.asarray(non_target, dtype=str)).astype(object)
+    new = np.asarray(new_lesions, dtype=bool)
+    nt_only = t == "NA"
+    return np.select(
+        [new, t == "PD", nt == "PD",
+         nt_only & (nt == "CR"), nt_only & (nt == "NON-CR/NON-PD"), nt_only,
+         (t == "CR") & np.isin(nt, ["CR", "NA"]), np.isin(t, ["CR", "PR"]), t == "SD"],
+        ["PD", "PD", "PD", "CR", "NON-CR/NON-PD", "NE", "CR", "PR", "SD"], "NE").astype(object)
+
+
+def _measurable(types, sizes):
+    node = types.astype(str).str.upper().str.startswith("NODE").to_numpy()
+    return np.where(node, sizes >= NODE_MIN, sizes >= SOLID_MIN), node
+
+
+def select_targets(baseline):
+    """
+    Target selection on baseline rows (USUBJID / ORGAN / TYPE / DIAMETER) in recorded order: measurable size,
+    at most 2 per organ and 5 in total per subject. Returns (selected mask, reason).
+    """
+    sizes = pd.to_numeric(baseline["DIAMETER"], errors="coerce").fillna(0).to_numpy()
+    measurable, _ = _measurable(baseline["TYPE"], sizes)
+    key = baseline["USUBJID"].to_numpy()
+    organ = baseline["ORGAN"].fillna("Unknown").to_numpy()
+
+    frame = pd.DataFrame({"s": key, "o": organ})
+    per_organ = frame[measurable].groupby(["s", "o"], sort=False).cumcount().reindex(frame.index).to_numpy()
+    organ_ok = measurable & (per_organ < MAX_PER_ORGAN)
+    total = frame[organ_ok].groupby("s", sort=False).cumcount().reindex(frame.index).to_numpy()
+    selected = organ_ok & (total < MAX_TARGETS)
+    reason = np.select([~measurable, ~organ_ok, ~selected], ["Too small", "Organ cap exceeded", f"Total Target Limit ({MAX_TARGETS}) exceeded"], "")
+    return selected, reason
+
+
+def _normalized(df, columns):
+    c = {**COLUMNS, **(columns or {})}
+    out = pd.DataFrame({
+        "USUBJID": df[c["subject"]].astype(str).to_numpy(),
+        "VISIT": df[c["visit"]].to_numpy(),
+        "LESION": df[c["lesion"]].astype(str).to_numpy(),
+        "ORGAN": df[c["organ"]].to_numpy() if c["organ"] in df.columns else "Unknown",
+        "TYPE": df[c["type"]].to_numpy() if c["type"] in df.columns else "Solid",
+        "DIAMETER": pd.to_numeric(df[c["diameter"]], errors="coerce").to_numpy() if c["diameter"] in df.columns else np.nan,
+        "CATEGORY": df[c["category"]].astype(str).str.upper().str.replace("-", " ").to_numpy() if c["category"] in df.columns else "TARGET",
+        "STATUS": df[c["status"]].astype(str).str.upper().str.strip().to_numpy() if c["status"] in df.columns else "",
+    })
+    # Visit order: VISITNUM when given, else first appearance within the subject
+    if c["visitnum"] in df.columns:
+        out["VISITNUM"] = pd.to_numeric(df[c["visitnum"]], errors="coerce").to_numpy()
+    else:
+        first = out.drop_duplicates(["USUBJID", "VISIT"])
+        order = first.assign(VISITNUM=first.groupby("USUBJID", sort=False).cumcount())
+        out = out.merge(order[["USUBJID", "VISIT", "VISITNUM"]], on=["USUBJID", "VISIT"], how="left")
+    return out
+
+
+def score_recist(df, columns=None):
+    """
+    Batch RECIST 1.1 over a long lesion table (one row per subject / visit / lesion).
+    CATEGORY is TARGET (default), NON TARGET or NEW; non-target rows carry STATUS
+    (ABSENT / PRESENT / UNEQUIVOCAL PROGRESSION). The first visit of each subject is baseline.
+    Returns one row per subject / visit: SLD, BASELINE, NADIR, PCHG, TARGET, NON_TARGET, NEW_LESION, OVERALL.
+    """
+    les = _normalized(df, columns)
+    base_visit = les.groupby("USUBJID")["VISITNUM"].transform("min").to_numpy()
+    is_base = les["VISITNUM"].to_numpy() == base_visit
+    target_rows = (les["CATEGORY"] == "TARGET").to_numpy()
+    nt_rows = (les["CATEGORY"] == "NON TARGET").to_numpy()
+
+    # Baseline target selection, then follow the selected lesions across visits
+    base = les[is_base & target_rows]
+    selected, _ = select_targets(base)
+    chosen = base.loc[selected, ["USUBJID", "LESION"]].drop_duplicates()
+    n_targets = chosen.groupby("USUBJID").size()
+    tr = les[target_rows].merge(chosen, on=["USUBJID", "LESION"])
+    _, node = _measurable(tr["TYPE"], tr["DIAMETER"].to_numpy())
+    tr = tr.assign(_measured=tr["DIAMETER"].notna().to_numpy(),
+                   _open=np.where(node, tr["DIAMETER"].to_numpy() >= NODE_NORMAL, tr["DIAMETER"].to_numpy() > 0))
+
+    visits = les[["USUBJID", "VISIT", "VISITNUM"]].drop_duplicates(["USUBJID", "VISITNUM"]).sort_values(["USUBJID", "VISITNUM"], kind="stable")
+    sums = tr.groupby(["USUBJID", "VISITNUM"]).agg(SLD=("DIAMETER", "sum"), _measured=("_measured", "sum"), _open=("_open", "sum"))
+    out = visits.merge(sums, on=["USUBJID", "VISITNUM"], how="left").reset_index(drop=True)
+    expected = out["USUBJID"].map(n_targets).fillna(0).to_numpy()
+    out.loc[out["_measured"].fillna(0).to_numpy() < expected, "SLD"] = np.nan  # a target not assessed -> NE
+    out.loc[expected == 0, "SLD"] = np.nan  # no target lesions: scored on non-targets only
+
+    first = out.groupby("USUBJID")["VISITNUM"].transform("min").to_numpy() == out["VISITNUM"].to_numpy()
+    out["BASELINE"] = out["SLD"].where(first).groupby(out["USUBJID"]).transform("first")
+    out["NADIR"] = out.groupby("USUBJID")["SLD"].cummin().groupby(out["USUBJID"]).shift(1)
+    out["NADIR"] = out.groupby("USUBJID")["NADIR"].ffill()
+    out["PCHG"] = ((out["SLD"] - out["BASELINE"]) / out["BASELINE"] * 100).round(1)
+    out["TARGET"] = target_responses(out["BASELINE"], out["NADIR"], out["SLD"], out["_open"].fillna(1).to_numpy() == 0)
+    out.loc[expected == 0, "TARGET"] = "NA"
+
+    # Non-target and new lesions per visit
+    nt = les[nt_rows]
+    nt_status = nt.assign(_pd=nt["STATUS"].isin(NT_PROGRESSION), _absent=nt["STATUS"].isin(NT_ABSENT)) \
+        .groupby(["USUBJID", "VISITNUM"]).agg(_pd=("_pd", "any"), _absent=("_absent", "all"))
+    out = out.merge(nt_status, on=["USUBJID", "VISITNUM"], how="left")
+    has_nt = out["USUBJID"].isin(les.loc[is_base & nt_rows, "USUBJID"]).to_numpy()
+    out["NON_TARGET"] = np.select(
+        [~has_nt, out["_pd"].isna(), out["_pd"].fillna(False).astype(bool), out["_absent"].fillna(False).astype(bool)],
+        ["NA", "NE", "PD", "CR"], "NON-CR/NON-PD")
+    new_keys = les.loc[(les["CATEGORY"] == "NEW").to_numpy() | (les["STATUS"] == "NEW").to_numpy(), ["USUBJID", "VISITNUM"]].drop_duplicates()
+    out["NEW_LESION"] = out.merge(new_keys.assign(_new=True), on=["USUBJID", "VISITNUM"], how="left")["_new"].fillna(False).astype(bool).to_numpy()
+
+    out["OVERALL"] = overall_responses(out["TARGET"], out["NON_TARGET"], out["NEW_LESION"])
+    out.loc[first, ["TARGET", "NON_TARGET", "OVERALL"]] = ""  # baseline is not a response
+    return out[["USUBJID", "VISIT", "VISITNUM", "SLD", "BASELINE", "NADIR", "PCHG", "TARGET", "NON_TARGET", "NEW_LESION", "OVERALL"]]
+
+
 class RecistCalculator:
     def __init__(self):
         pass
@@ -5,108 +161,51 @@ class RecistCalculator:
     def validate_baseline(self, lesions):
         """
         Validates Baseline Lesions against RECIST 1.1.
-        
+
         Rules:
         - Solid Tumor: Must be >= 10mm (Long Diameter).
         - Lymph Node: Must be >= 15mm (Short Axis).
         - Max Targets: 5 Total, 2 per Organ.
         """
-        valid_lesions = []
+        if not lesions:
+            return {"valid": [], "rejected": [], "baseline_sum": 0}
+        frame = pd.DataFrame({
+            "USUBJID": "-",
+            "TYPE": [l.get('type', 'Solid') for l in lesions],
+            "DIAMETER": [float(l.get('size', 0)) for l in lesions],
+            "ORGAN": [l.get('organ', 'Unknown') for l in lesions],
+        })
+        selected, reason = select_targets(frame)
+
+        valid_lesions = [l for l, keep in zip(lesions, selected) if keep]
         rejected_lesions = []
-        organ_counter = {}
-        
-        for lesion in lesions:
-            # Type Check
-            l_type = lesion.get('type', 'Solid')
-            size = float(lesion.get('size', 0))
-            organ = lesion.get('organ', 'Unknown')
-            
-            # Size Check
-            is_valid_size = False
-            if l_type == 'Solid' and size >= 10:
-                is_valid_size = True
-            elif l_type == 'Node' and size >= 15:
-                is_valid_size = True
-            
-            if not is_valid_size:
-                rejected_lesions.append(f"{l_type} in {organ} too small ({size}mm)")
-                continue
-                
-            # Organ Count Check
-            if organ not in organ_counter:
-                organ_counter[organ] = 0
-            
-            if organ_counter[organ] >= 2:
-                rejected_lesions.append(f"Organ cap exceeded for {organ}")
-                continue
-                
-            # Total Cap Check
-            if len(valid_lesions) >= 5:
-                rejected_lesions.append("Total Target Limit (5) exceeded")
-                continue
-                
-            # Accept
-            organ_counter[organ] += 1
-            valid_lesions.append(lesion)
-            
+        for l, why in zip(lesions, reason):
+            if why == "Too small":
+                rejected_lesions.append(f"{l.get('type', 'Solid')} in {l.get('organ', 'Unknown')} too small ({float(l.get('size', 0))}mm)")
+            elif why == "Organ cap exceeded":
+                rejected_lesions.append(f"Organ cap exceeded for {l.get('organ', 'Unknown')}")
+            elif why:
+                rejected_lesions.append(why)
+
         return {
             "valid": valid_lesions,
             "rejected": rejected_lesions,
             "baseline_sum": sum([float(l['size']) for l in valid_lesions])
         }
 
-    def calculate_target_response(self, baseline_sum, current_sum):
+    def calculate_target_response(self, baseline_sum, current_sum, nadir_sum=None):
         """
-        Determines Response for TARGET lesions.
+        Determines Response for TARGET lesions (PD from the nadir; defaults to baseline).
         """
-        if baseline_sum == 0:
-            return "NE"
-            
-        diff = current_sum - baseline_sum
-        pct_change = (diff / baseline_sum) * 100
-        
-        # CR: 0mm (Special handling for nodes <10mm needed in real life, assuming 0 for now)
-        if current_sum == 0:
-            return "CR"
-            
-        # PD: >= 20% increase AND >= 5mm absolute increase
-        if pct_change >= 20 and diff >= 5:
-            return "PD"
-            
-        # PR: >= 30% decrease
-        if pct_change <= -30:
-            return "PR"
-            
-        return "SD"
+        nadir = baseline_sum if nadir_sum is None else nadir_sum
+        return str(target_responses([baseline_sum], [nadir], [current_sum])[0])
 
     def determine_overall_response(self, target_resp, non_target_resp, new_lesions):
         """
         The Master RECIST Matrix.
         """
-        # 1. New Lesions kills everything
-        if new_lesions:
-            return "PD"
-            
-        # 2. Target Driven
-        if target_resp == "PD":
-            return "PD"
-            
-        if non_target_resp == "PD":
-            return "PD"
-            
-        if target_resp == "CR":
-            if non_target_resp == "CR":
-                return "CR"
-            else:
-                # Non-Target is Non-CR/Non-PD or Not Evaluated
-                return "PR"
-                
-        if target_resp == "PR":
-            # Non-Target cannot be PD (already checked)
-            return "PR"
-            
-        if target_resp == "SD":
-            return "SD"
-            
-        # Fallback
-        return "NE"
+        return str(overall_responses([target_resp], [non_target_resp], [bool(new_lesions)])[0])
+
+    def score_study(self, df, columns=None):
+        """Batch scoring of a whole study's lesion table (see score_recist)."""
+        return score_recist(df, columns)
@@ -1,7 +1,22 @@
+import os
+import json
+import hashlib
+import numpy as np
 import pandas as pd
-from fuzzywuzzy import process
+from logic.lab_recon import UNIT_CONVERSIONS, pair_results, compare_paired, unit_pairs, merge_issues
+from logic.record_linkage import link_records
+from logic.safety_triangulation import FINDINGS, triangulate_deaths, death_findings
+from logic.llm_batch import RateLimiter, chunked, run_bounded
 from langchain_google_vertexai import ChatVertexAI
 
+# Fuzzy fallback: rapidfuzz (C scorer) when installed, fuzzywuzzy otherwise
+try:
+    from rapidfuzz import process, utils as fuzz_utils
+    FUZZY_OPTS = {"processor": fuzz_utils.default_process}
+except ImportError:
+    from fuzzywuzzy import process
+    FUZZY_OPTS = {}
+
 try:
     llm = ChatVertexAI(
         model_name="gemini-1.5-flash-001",
@@ -11,23 +26,103 @@ try:
 except:
     llm = None
 
+# Persistence Path (same backend_data layout as the edit-check rule cache)
+HEADER_CACHE_DIR = os.path.join(os.getcwd(), "backend_data", "reconciler")
+HEADER_CACHE_FILE = os.path.join(HEADER_CACHE_DIR, "header_maps.json")
+
+STANDARD_COLS = ["USUBJID", "VISIT", "LBTEST", "LBORRES", "LBORRESU", "LBORNRLO", "LBORNRHI", "AETERM", "AESTDTC", "DSDECOD"]
+# Vendor spellings that are known to mean a standard column (checked before fuzzy matching)
+HEADER_ALIASES = {
+    "SUBJID": "USUBJID", "SUBJECT": "USUBJID", "SUBJECTID": "USUBJID", "PATIENTID": "USUBJID", "PATID": "USUBJID",
+    "VISITNAME": "VISIT", "TESTNAME": "LBTEST",
+    "RESULT": "LBORRES", "LBRESULT": "LBORRES",
+    "LOWRANGE": "LBORNRLO", "HIGHRANGE": "LBORNRHI", "AESTDAT": "AESTDTC",
+}
+
+
+def _alias_key(col):
+    return "".join(ch for ch in str(col).upper() if ch.isalnum())
+
+
+class HeaderMapCache:
+    """
+    Persistent store of header rename maps.
+    Keyed by the source column signature, so a repeated vendor transfer with
+    the same layout is renamed without any fuzzy matching. The key also covers
+    STANDARD_COLS and HEADER_ALIASES, so editing either retires the old maps.
+    With path=None the maps are kept in memory only.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._store = None
+
+    @staticmethod
+    def column_signature(columns):
+        cols = "|".join(str(c) for c in columns)
+        targets = json.dumps([STANDARD_COLS, sorted(HEADER_ALIASES.items())])
+        return hashlib.sha1(f"{cols}::{targets}".encode("utf-8")).hexdigest()[:16]
+
+    def _load(self):
+        if self._store is None:
+            self._store = {}
+            if self.path is None: return self._store
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._store = json.load(f)
+            except (OSError, ValueError):
+                pass
+        return self._store
+
+    def get(self, columns):
+        return self._load().get(self.column_signature(columns))
+
+    def put(self, columns, rename_map):
+        self._load()[self.column_signature(columns)] = rename_map
+        if self.path is None: return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._store, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # read-only deploys keep the in-memory map
+
+
 class Reconciler:
-    def __init__(self):
-        pass
+    def __init__(self, header_cache=None):
+        # Persisted only when the caller passes a cache with a path (the app uses HEADER_CACHE_FILE)
+        self.header_cache = header_cache or HeaderMapCache()
+        self.last_linkage = None
+
+    def match_header(self, col):
+        """Standard column for one source header: exact, then alias, then fuzzy (score > 85). None if no match."""
+        upper = str(col).upper()
+        if upper in STANDARD_COLS: return upper
+        alias = HEADER_ALIASES.get(_alias_key(col))
+        if alias: return alias
+        match = process.extractOne(upper, STANDARD_COLS, **FUZZY_OPTS)
+        if match and match[1] > 85: # High confidence threshold
+            return match[0]
+        return None
 
     def normalize_headers(self, df):
         """
         Standardizes column names to CDISC (USUBJID, VISIT, etc.) using Fuzzy Matching.
         """
-        standard_cols = ["USUBJID", "VISIT", "LBTEST", "LBORRES", "LBORNRLO", "LBORNRHI", "AETERM", "AESTDTC", "DSDECOD"]
-        
-        rename_map = {}
-        for col in df.columns:
-            # Find best match
-            match, score = process.extractOne(col.upper(), standard_cols)
-            if score > 85: # High confidence threshold
-                rename_map[col] = match
-        
+        columns = [str(c) for c in df.columns]
+        rename_map = self.header_cache.get(columns)
+        if rename_map is None:
+            rename_map, taken = {}, set(columns)
+            for col in columns:
+                match = self.match_header(col)
+                # Never rename onto a column that exists or was already claimed
+                if match and match not in taken:
+                    rename_map[col] = match
+                    taken.add(match)
+            self.header_cache.put(columns, rename_map)
+
         return df.rename(columns=rename_map)
 
     def run_safety_triangulation(self, df_ae, df_ds, df_dd):
@@ -35,72 +130,89 @@ class Reconciler:
         Triangulates Death Events between:
         1. AE (Adverse Events) -> Outcome = FATAL
         2. DS (Disposition) -> Reason = DEATH
-        3. DD (Death Details) -> Form Exists
+        3. DD (Death Details) -> Form Exists (skipped when df_dd is empty)
+        plus concordance of the AE end, DS and DD dates.
         """
-        issues = []
-        
-        # Normalize
         df_ae = self.normalize_headers(df_ae)
         df_ds = self.normalize_headers(df_ds)
-        
-        # Get all subjects with Death indicators
-        ae_deaths = df_ae[df_ae['AEOUT'] == 'FATAL']['USUBJID'].unique() if 'AEOUT' in df_ae.columns else []
-        ds_deaths = df_ds[df_ds['DSDECOD'] == 'DEATH']['USUBJID'].unique() if 'DSDECOD' in df_ds.columns else []
-        
-        all_death_subjs = set(list(ae_deaths) + list(ds_deaths))
-        
-        for subj in all_death_subjs:
-            in_ae = subj in ae_deaths
-            in_ds = subj in ds_deaths
-            
-            if in_ae and not in_ds:
-                issues.append({"Subject": subj, "Issue": "fatal AE recorded but Disposition not marked as Death."})
-            if in_ds and not in_ae:
-                issues.append({"Subject": subj, "Issue": "Disposition is Death but no Fatal AE recorded."})
-                
-        return pd.DataFrame(issues)
-
-    def run_lab_reconciliation(self, df_clinical, df_vendor):
+        df_dd = self.normalize_headers(df_dd) if df_dd is not None and not df_dd.empty else None
+
+        found = death_findings(triangulate_deaths(df_ae, df_ds, df_dd))
+        return pd.DataFrame({
+            "Subject": found["Subject"],
+            "Issue": found["Check"].map(FINDINGS),
+            "Detail": found["Detail"],
+        })
+
+    def run_lab_reconciliation(self, df_clinical, df_vendor, tolerances=None, conversions=None):
         """
         Reconciles Clinical DB vs Lab Vendor DB.
-        Matches on Subject + Visit + Test.
-        Checks Result Value (with 0.1 tolerance).
+        Matches on Subject + Visit + Test via record linkage, so differently formatted
+        IDs and visit labels still pair up; records left unmatched are reported.
+        Checks Result Value against per-test tolerances (TOLERANCE_RULES), after
+        converting clinical units to vendor units with the local conversion table.
+        Only unit pairs missing from the table go to the LLM (once per pair, batched).
         """
         df_c = self.normalize_headers(df_clinical)
         df_v = self.normalize_headers(df_vendor)
-        
-        # Merge on Keys
-        merged = pd.merge(df_c, df_v, on=["USUBJID", "VISIT", "LBTEST"], suffixes=('_clin', '_vend'), how='inner')
-        
-        mismatches = []
-        
-        for idx, row in merged.iterrows():
-            val_c = pd.to_numeric(row.get('LBORRES_clin'), errors='coerce')
-            val_v = pd.to_numeric(row.get('LBORRES_vend'), errors='coerce')
-            
-            if pd.notna(val_c) and pd.notna(val_v):
-                # Hard Check: Tolerance 0.1
-                if abs(val_c - val_v) > 0.1:
-                    mismatches.append({
-                        "Subject": row['USUBJID'],
-                        "Test": row['LBTEST'],
-                        "Clinical_Val": val_c,
-                        "Vendor_Val": val_v,
-                        "Diff": abs(val_c - val_v)
-                    })
-            else:
-                # Soft Check: Unit Mismatch or string value?
-                unit_c = row.get('LBORRESU_clin', '')
-                unit_v = row.get('LBORRESU_vend', '')
-                
-                if unit_c != unit_v and llm:
-                    # Ask AI if units are equivalent
-                    # For performance, we'd batch this, but for now linear call
-                    # (Skipping API call in loop for speed, treating as mismatch)
-                    mismatches.append({
-                        "Subject": row['USUBJID'],
-                        "Test": row['LBTEST'],
-                        "Issue": f"Unit Mismatch: {unit_c} vs {unit_v}"
-                    })
-
-        return pd.DataFrame(mismatches)
+
+        conversions = dict(conversions or UNIT_CONVERSIONS)
+        # Keys rarely agree exactly across vendors (0101 vs 001-0101, V3 vs Visit 3): link, don't inner-join
+        self.last_linkage = link_records(df_c, df_v)
+        paired = pair_results(df_c, df_v, self.last_linkage.pairs)
+        values, units, unresolved = compare_paired(paired, tolerances, conversions)
+
+        if not unresolved.empty:
+            learned = self.resolve_unit_pairs(unit_pairs(unresolved))
+            conversions.update({(t.upper(), uc, uv): f for (t, uc, uv), f in learned.items()})
+            still_values, _, still_unresolved = compare_paired(unresolved, tolerances, conversions)
+            # paired has a RangeIndex, so index labels are the row positions used for ordering
+            still_values["_pos"] = unresolved.index.to_numpy()[still_values["_pos"].to_numpy()]
+            units = pd.concat([units, pd.DataFrame({
+                "Subject": still_unresolved["USUBJID"].to_numpy(),
+                "Test": still_unresolved["LBTEST"].to_numpy(),
+                "Issue": ("Unit Mismatch: " + still_unresolved["unit_c"] + " vs " + still_unresolved["unit_v"]).to_numpy(),
+                "_pos": still_unresolved.index.to_numpy(),
+            })], ignore_index=True)
+            values = pd.concat([values, still_values], ignore_index=True)
+
+        # Records that found no partner go last, clinical side first
+        unmatched = pd.concat([
+            pd.DataFrame({"Subject": frame["USUBJID"].to_numpy(), "Test": frame["LBTEST"].to_numpy(),
+                          "Issue": (f"Unmatched {side} Record: " + frame["VISIT"].astype(str)).to_numpy()})
+            for side, frame in (("Clinical", self.last_linkage.unmatched_left), ("Vendor", self.last_linkage.unmatched_right))
+        ], ignore_index=True)
+        unmatched["_pos"] = len(paired) + np.arange(len(unmatched))
+        return merge_issues(values, units, unmatched)
+
+    def resolve_unit_pairs(self, pairs, batch_size=25):
+        """
+        Asks the LLM for conversion factors of (test, from unit, to unit) triples.
+        Returns {triple: factor} for the ones it could convert.
+        """
+        if not llm or not pairs: return {}
+
+        def ask(batch):
+            numbered = "\n".join(f"{i + 1}. {t}: {uc} -> {uv}" for i, (t, uc, uv) in enumerate(batch))
+            prompt = (
+                "Role: Clinical Laboratory Scientist.\n"
+                "For each numbered lab test, give the factor F so that value_in_target = value_in_source * F.\n"
+                f"{numbered}\n"
+                f"OUTPUT ONLY A JSON ARRAY OF {len(batch)} NUMBERS IN ORDER. Use null if the units are not convertible. NO MARKDOWN."
+            )
+            reply = llm.invoke(prompt).content
+            factors = json.loads(reply.replace("```json", "").replace("```", "").strip())
+            if not isinstance(factors, list) or len(factors) != len(batch):
+                raise ValueError(f"Unit reply has {len(factors) if isinstance(factors, list) else 'no'} factors for {len(batch)} pairs.")
+            return factors
+
+        batches = chunked(list(pairs), batch_size)
+        results, _ = run_bounded(ask, batches, max_workers=4, limiter=RateLimiter())
+        learned = {}
+        for i, batch in enumerate(batches):
+            for triple, factor in zip(batch, results.get(i, [])):
+                try:
+                    if factor is not None and float(factor) > 0: learned[triple] = float(factor)
+                except (TypeError, ValueError):
+                    pass
+        return learned
@@ -0,0 +1,152 @@
+from difflib import SequenceMatcher
+import numpy as np
+import pandas as pd
+from logic.date_parser import parse_dates
+from logic.visit_labels import canonical_visits
+
+# Score = weighted visit / test / date similarity; pairs below MIN_SCORE stay unmatched
+WEIGHTS = {"visit": 0.4, "test": 0.4, "date": 0.2}
+MIN_SCORE = 0.75
+MIN_TEST_SIM = 0.85
+DATE_WINDOW_DAYS = 7
+MAX_ROUNDS = 3
+# Candidate blocks, tightest first: same subject and test, then same subject number, then subject only.
+# Subject-number blocks only pair records whose site/study prefixes agree (or one side has none).
+BLOCKS = [("block", "test_block"), ("suffix", "test_block"), ("block",), ("suffix",)]
+
+
+def _per_unique(series, fn):
+    """fn applied to the distinct values only (a study has thousands of subjects, not millions)."""
+    codes, uniq = pd.factorize(series.astype(str))
+    return pd.Series(fn(pd.Series(uniq)).to_numpy()[codes], index=series.index) if len(uniq) else series.astype(str)
+
+
+def subject_key(series):
+    """'STUDY1-001-0101', 'study1 001 101' -> 'STUDY1-1-101' (separators unified, leading zeros dropped)."""
+    tokens = series.astype(str).str.upper().str.findall(r'[A-Z0-9]+')
+    return tokens.map(lambda ts: "-".join(t.lstrip("0") or "0" if t.isdigit() else t for t in ts))
+
+
+def subject_suffix(series):
+    """Last numeric token of the subject ID: the fallback block when site/study prefixes differ."""
+    return series.astype(str).str.extract(r'(\d+)\D*$')[0].str.replace(r'^0+(?=\d)', '', regex=True)
+
+
+def subject_prefix(keys):
+    """Subject key without its last token ('SITE01-101' -> 'SITE01', '101' -> '')."""
+    parts = keys.astype(str).str.rsplit("-", n=1)
+    return parts.map(lambda p: p[0] if len(p) > 1 else "")
+
+
+def _prefix_compatible(a, b):
+    """Prefixes agree when equal, when one is empty, or when one ends the other ('1' vs 'STUDY1-1')."""
+    codes, labels = pd.factorize(np.concatenate([a, b]))
+    pair_codes = codes[:len(a)].astype(np.int64) * len(labels) + codes[len(a):]
+    uniq, inverse = np.unique(pair_codes, return_inverse=True)
+    ok = np.array([not x or not y or x == y or x.endswith("-" + y) or y.endswith("-" + x)
+                   for x, y in ((labels[i], labels[j]) for i, j in zip(uniq // len(labels), uniq % len(labels)))], dtype=bool)
+    return ok[inverse] if len(ok) else np.zeros(0, dtype=bool)
+
+
+def _test_key(series):
+    return series.astype(str).str.upper().str.replace(r'[^A-Z0-9]+', ' ', regex=True).str.strip()
+
+
+def _date_col(df):
+    return next((c for c in df.columns if str(c).upper().endswith("DTC") or str(c).upper().endswith("DAT")), None)
+
+
+def _prepare(df, subj, visit, test, study=None):
+    out = pd.DataFrame({
+        "rid": np.arange(len(df)),
+        "block": _per_unique(df[subj], subject_key).to_numpy(),
+        "suffix": _per_unique(df[subj], subject_suffix).to_numpy(),
+        "prefix": _per_unique(df[subj], lambda u: subject_prefix(subject_key(u))).to_numpy(),
+        "visit": canonical_visits(df[visit], study).to_numpy() if visit in df.columns else "",
+        "test": _per_unique(df[test], _test_key).to_numpy(),
+    })
+    out["test_block"] = out["test"]  # join copy, so test stays available for scoring
+    date_col = _date_col(df)
+    out["date"] = parse_dates(df[date_col]).to_numpy() if date_col else pd.NaT
+    return out
+
+
+def _string_sim(a, b):
+    """Similarity in [0, 1] per row; each distinct (a, b) pair is scored once."""
+    codes, labels = pd.factorize(np.concatenate([a, b]))
+    pair_codes = codes[:len(a)].astype(np.int64) * len(labels) + codes[len(a):]
+    uniq, inverse = np.unique(pair_codes, return_inverse=True)
+    sims = np.array([1.0 if x == y else SequenceMatcher(None, labels[x], labels[y]).ratio()
+                     for x, y in zip(uniq // len(labels), uniq % len(labels))])
+    return sims[inverse] if len(sims) else np.zeros(0)
+
+
+def score_candidates(cand):
+    """Vectorized visit / test / date similarity for candidate pairs (columns suffixed _l / _r)."""
+    visit_sim = _string_sim(cand["visit_l"].to_numpy(), cand["visit_r"].to_numpy())
+    test_sim = _string_sim(cand["test_l"].to_numpy(), cand["test_r"].to_numpy())
+    days = (cand["date_l"] - cand["date_r"]).dt.days.abs().to_numpy(dtype=float)
+    # No date on either side: neutral, neither rewarded nor penalized
+    date_sim = np.where(np.isnan(days), 0.5, np.clip(1 - days / DATE_WINDOW_DAYS, 0, 1))
+    score = WEIGHTS["visit"] * visit_sim + WEIGHTS["test"] * test_sim + WEIGHTS["date"] * date_sim
+    return np.where(test_sim >= MIN_TEST_SIM, score, 0.0)
+
+
+def _one_to_one(cand):
+    """Best-scoring pairs with every record used at most once (greedy, a few vectorized rounds)."""
+    picked = []
+    cand = cand.sort_values("score", ascending=False, kind="stable")
+    for _ in range(MAX_ROUNDS):
+        if cand.empty: break
+        best = cand.drop_duplicates("rid_l").drop_duplicates("rid_r")
+        picked.append(best)
+        cand = cand[~cand["rid_l"].isin(best["rid_l"]) & ~cand["rid_r"].isin(best["rid_r"])]
+    return pd.concat(picked, ignore_index=True) if picked else cand.iloc[0:0]
+
+
+class LinkageResult:
+    """Row pairs (positions into left / right) plus the records left unmatched on each side."""
+
+    def __init__(self, pairs, left, right):
+        self.pairs = pairs
+        used_l, used_r = np.zeros(len(left), dtype=bool), np.zeros(len(right), dtype=bool)
+        used_l[pairs["rid_l"].to_numpy()] = True
+        used_r[pairs["rid_r"].to_numpy()] = True
+        self.unmatched_left = left[~used_l]
+        self.unmatched_right = right[~used_r]
+
+
+def link_records(left, right, subj="USUBJID", visit="VISIT", test="LBTEST", study=None):
+    """
+    Links left and right records when subject, visit and test labels disagree in format.
+    1. Exact join on normalized keys (subject key, canonical visit, test), one to one:
+       repeated keys are paired in order of appearance.
+    2. Leftovers are blocked (BLOCKS: subject key or subject number, with and
+       without the test), candidate pairs inside each block are scored, and the
+       best pair above MIN_SCORE is kept, one record per side.
+    Returns a LinkageResult; pairs has rid_l, rid_r, score and method columns.
+    """
+    l, r = _prepare(left, subj, visit, test, study), _prepare(right, subj, visit, test, study)
+
+    keys = ["block", "visit", "test"]
+    l["rank"], r["rank"] = l.groupby(keys, sort=False).cumcount(), r.groupby(keys, sort=False).cumcount()
+    exact = l.merge(r, on=keys + ["rank"], suffixes=("_l", "_r"))
+    exact = exact.assign(score=1.0, method="exact")[["rid_l", "rid_r", "score", "method"]]
+    found = [exact]
+
+    rest_l, rest_r = l[~l["rid"].isin(exact["rid_l"])], r[~r["rid"].isin(exact["rid_r"])]
+    for block in BLOCKS:
+        if rest_l.empty or rest_r.empty: break
+        cand = rest_l.merge(rest_r, on=list(block), suffixes=("_l", "_r"))
+        cand = cand[cand[block[0]].notna() & (cand[block[0]] != "")]
+        if block[0] == "suffix":
+            cand = cand[_prefix_compatible(cand["prefix_l"].to_numpy(), cand["prefix_r"].to_numpy())]
+        if cand.empty: continue
+        cand = cand.assign(score=score_candidates(cand))
+        cand = cand[cand["score"] >= MIN_SCORE]
+        best = _one_to_one(cand).assign(method="fuzzy")[["rid_l", "rid_r", "score", "method"]]
+        found.append(best)
+        rest_l, rest_r = rest_l[~rest_l["rid"].isin(best["rid_l"])], rest_r[~rest_r["rid"].isin(best["rid_r"])]
+
+    pairs = pd.concat([f for f in found if not f.empty] or [exact], ignore_index=True)
+    return LinkageResult(pairs.sort_values(["rid_l", "rid_r"], kind="stable").reset_index(drop=True), left, right)
@@ -8,6 +8,7 @@ from fuzzywuzzy import process
 from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import PromptTemplate
+from logic.recist_engine import target_responses
 
 # --- AI CONFIGURATION ---
 try:
@@ -321,38 +322,29 @@ class OncologyWorkflows:
             nadir = float(nadir_sld)
             curr = float(current_sld)
             
-            # Logic
-            response = "Unknown"
-            reason = ""
-            
-            # 1. PD (Progressive Disease)
-            pd_threshold = nadir * 1.20 # 20% increase
-            abs_increase = curr - nadir
-            
+            # Shared RECIST 1.1 rule set (PD from nadir, PR from baseline)
+            code = target_responses([base], [nadir], [curr])[0]
             if new_lesions:
                 response = "PD (Progressive Disease)"
                 reason = "New Lesions appeared."
-            elif (curr >= pd_threshold) and (abs_increase >= 5.0):
+            elif code == "PD":
                 pct = round(((curr - nadir) / nadir) * 100, 1)
                 response = "PD (Progressive Disease)"
                 reason = f"Increase of {pct}% from Nadir AND >5mm absolute increase."
-            
-            # 2. CR (Complete Response)
-            elif curr == 0:
+            elif code == "CR":
                 response = "CR (Complete Response)"
                 reason = "Disappearance of all target lesions."
-                
-            # 3. PR (Partial Response)
-            elif curr <= (base * 0.70): # 30% decrease
+            elif code == "PR":
                 pct = round(((base - curr) / base) * 100, 1)
                 response = "PR (Partial Response)"
                 reason = f"Decrease of {pct}% from Baseline."
-                
-            # 4. SD (Stable Disease)
-            else:
+            elif code == "SD":
                 pct_base = round(((curr - base) / base) * 100, 1)
                 response = "SD (Stable Disease)"
                 reason = f"Assuming insufficient shrinkage for PR and insufficient increase for PD (Change from Base: {pct_base}%)."
+            else:
+                response = "NE (Not Evaluable)"
+                reason = "Baseline sum is zero or missing."
                 
             return {
                 "Response": response,
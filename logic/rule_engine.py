@@ -0,0 +1,327 @@
+import os
+import re
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Persistence Path (same backend_data layout as the LearningEngine brain)
+RULE_CACHE_DIR = os.path.join(os.getcwd(), "backend_data", "edit_checks")
+RULE_CACHE_FILE = os.path.join(RULE_CACHE_DIR, "query_cache.json")
+
+DISCREPANCY_COLS = ["Row", "SubjectID", "CheckID", "Description", "Logic", "Status", "Data_Snippet"]
+SUBJECT_CANDIDATES = ["SubjectID", "SUBJID", "USUBJID"]
+
+# Query fragments that need neighbouring rows (cannot be judged one chunk at a time)
+CROSS_ROW_MARKERS = (".shift(", ".diff(", ".duplicated(", ".groupby(", ".rank(", ".rolling(",
+                     ".cumsum(", ".cummax(", ".cummin(", ".mean(", ".median(", ".std(", ".sum(",
+                     ".min(", ".max(", ".count(", ".nunique(", ".value_counts(", ".transform(", "@")
+IDENT_PATTERN = re.compile(r"`([^`]+)`|\b([A-Za-z_][A-Za-z0-9_]*)\b")
+STRING_CMP = r"(?:(?:==|!=|<=|>=|<|>)\s*['\"]|\.str\.|\.isin\()"
+NUMERIC_CMP = r"\s*(?:==|!=|<=|>=|<|>)\s*-?\d"
+
+
+class RuleCache:
+    """
+    Persistent store of AI-translated `.query()` strings.
+    Keyed by (rule text, column signature) so a spec re-run against the same
+    EDC layout never goes back to the LLM.
+    """
+
+    def __init__(self, path=RULE_CACHE_FILE):
+        self.path = path
+        self._store = None
+        self._dirty = False
+
+    @staticmethod
+    def column_signature(columns):
+        cols = "|".join(sorted(str(c) for c in columns))
+        return hashlib.sha1(cols.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def make_key(rule_text, columns):
+        rule = " ".join(str(rule_text).split())  # case matters: 'Male' and 'male' are different values
+        raw = f"{rule}::{RuleCache.column_signature(columns)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if self._store is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._store = json.load(f)
+            except (OSError, ValueError):
+                self._store = {}
+        return self._store
+
+    def get(self, rule_text, columns):
+        return self._load().get(self.make_key(rule_text, columns))
+
+    def put(self, rule_text, columns, query):
+        self._load()[self.make_key(rule_text, columns)] = query
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty: return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._store, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+class CompiledRule:
+    """One spec row after translation: the query plus its spec metadata."""
+
+    def __init__(self, check_id, description, logic, query=None, status="Ready", message=""):
+        self.check_id = check_id
+        self.description = description
+        self.logic = logic
+        self.query = query
+        self.status = status
+        self.message = message
+
+    @property
+    def runnable(self):
+        return self.status == "Ready" and bool(self.query)
+
+    @property
+    def cross_row(self):
+        """True if the query looks at other rows, i.e. needs a second (full column) pass."""
+        return bool(self.query) and any(m in self.query for m in CROSS_ROW_MARKERS)
+
+
+def compile_spec(df_spec, columns, translate, cache=None, translate_many=None):
+    """
+    Translates every spec row into a CompiledRule.
+    `translate(rule_text, cols_str)` is only called on cache misses. When
+    `translate_many(rule_texts, cols_str)` is given, all misses are sent in one
+    call; it returns {rule_text: query or Exception}.
+    """
+    cols_str = ", ".join(str(c) for c in columns)
+    spec_rows = list(zip(df_spec["CheckID"], df_spec["Description"], df_spec["Logic_Rule"]))
+
+    # 1. Resolve from cache, collect the distinct misses
+    cached = {}
+    for _, _, logic in spec_rows:
+        if logic in cached: continue
+        cached[logic] = cache.get(logic, columns) if cache is not None else None
+    misses = [logic for logic, query in cached.items() if query is None]
+
+    # 2. Translate misses (batched if supported)
+    translated = {}
+    if misses and translate_many is not None:
+        translated = translate_many(misses, cols_str)
+    else:
+        for logic in misses:
+            try:
+                translated[logic] = translate(logic, cols_str)
+            except Exception as e:
+                translated[logic] = e
+
+    # 3. Build rules, caching every clean translation
+    rules = []
+    for check_id, desc, logic in spec_rows:
+        query = cached[logic]
+        if query is None:
+            query = translated.get(logic)
+            if isinstance(query, Exception):
+                rules.append(CompiledRule(check_id, desc, logic, status="Execution Error", message=str(query)))
+                continue
+            if not query or "Error" in query:
+                rules.append(CompiledRule(check_id, desc, logic, status="Logic Error", message="AI could not generate query."))
+                continue
+            if cache is not None:
+                cache.put(logic, columns, query)
+        rules.append(CompiledRule(check_id, desc, logic, query=query))
+
+    if cache is not None:
+        cache.save()
+    return rules
+
+
+def _eval_rule(df, query):
+    try:
+        result = df.eval(query)
+    except Exception:
+        # numexpr cannot run method calls such as `.notnull()`
+        result = df.eval(query, engine="python")
+
+    if isinstance(result, pd.Series) and len(result) == len(df):
+        return result.fillna(False).to_numpy(dtype=bool)
+    raise ValueError(f"Query '{query}' did not return a row mask.")
+
+
+def evaluate_rules(df, rules):
+    """
+    Evaluates all runnable rules into a (rows x rules) boolean mask matrix.
+    Rules that fail at runtime are marked 'Execution Error' in place.
+    """
+    runnable = [r for r in rules if r.runnable]
+    mask = np.zeros((len(df), len(runnable)), dtype=bool)
+
+    for j, rule in enumerate(runnable):
+        try:
+            mask[:, j] = _eval_rule(df, rule.query)
+        except Exception as e:
+            rule.status, rule.message = "Execution Error", str(e)
+
+    return mask, runnable
+
+
+def _detect_subject(df):
+    return next((c for c in SUBJECT_CANDIDATES if c in df.columns), None)
+
+
+def _snippets(df):
+    """Builds the dict-style Data_Snippet for every row, one column at a time."""
+    if df.empty or len(df.columns) == 0:
+        return pd.Series("{}", index=df.index)
+    parts = [f"{c!r}: " + df[c].map(repr) for c in df.columns]
+    out = parts[0]
+    for p in parts[1:]:
+        out = out + ", " + p
+    return "{" + out + "}"
+
+
+def build_discrepancies(df, runnable, mask, snippets=True):
+    """
+    Emits the discrepancy log as a columnar frame straight from the mask matrix
+    (rule-major order, one row per failing record per check).
+    """
+    rule_pos, row_pos = np.nonzero(mask.T)
+    if len(row_pos) == 0:
+        return pd.DataFrame(columns=DISCREPANCY_COLS)
+
+    check_ids = np.array([r.check_id for r in runnable], dtype=object)
+    descs = np.array([r.description for r in runnable], dtype=object)
+    logics = np.array([r.logic for r in runnable], dtype=object)
+
+    subj_col = _detect_subject(df)
+    subjects = df[subj_col].to_numpy()[row_pos] if subj_col else np.full(len(row_pos), "Unknown", dtype=object)
+
+    out = pd.DataFrame({
+        "Row": df.index.to_numpy()[row_pos],
+        "SubjectID": subjects,
+        "CheckID": check_ids[rule_pos],
+        "Description": descs[rule_pos],
+        "Logic": logics[rule_pos],
+        "Status": "Fail",
+    })
+
+    if snippets:
+        # Render each failing record once, then gather by position
+        uniq, inverse = np.unique(row_pos, return_inverse=True)
+        out["Data_Snippet"] = _snippets(df.iloc[uniq]).to_numpy()[inverse]
+    else:
+        out["Data_Snippet"] = ""
+    return out
+
+
+def referenced_columns(rules, columns):
+    """Data columns a set of rules actually touches (for `usecols`)."""
+    known = set(str(c) for c in columns)
+    used = set()
+    for rule in rules:
+        if not rule.query: continue
+        for quoted, bare in IDENT_PATTERN.findall(rule.query):
+            name = quoted or bare
+            if name in known: used.add(name)
+    return [c for c in columns if str(c) in used]
+
+
+def infer_dtypes(rules, columns):
+    """
+    Dtype hints from the compiled queries.
+    Returns (str_cols, numeric_cols): columns compared against string literals
+    are read as text, columns compared against numbers are coerced to numeric
+    so every chunk agrees on the type.
+    """
+    str_cols, numeric_cols = [], []
+    text = " ".join(r.query for r in rules if r.query)
+    for col in referenced_columns(rules, columns):
+        name = re.escape(str(col))
+        ref = rf"(?:`{name}`|\b{name}\b)"
+        if re.search(ref + r"\s*" + STRING_CMP, text):
+            str_cols.append(col)
+        elif re.search(ref + NUMERIC_CMP, text):
+            numeric_cols.append(col)
+    return str_cols, numeric_cols
+
+
+def _rewind(data_file):
+    if hasattr(data_file, "seek"): data_file.seek(0)
+    return data_file
+
+
+def read_header(data_file):
+    """Column names of a CSV without loading any rows."""
+    cols = pd.read_csv(_rewind(data_file), nrows=0).columns.tolist()
+    _rewind(data_file)
+    return cols
+
+
+def _read_projection(data_file, columns, rules, chunksize=None):
+    subj_col = next((c for c in SUBJECT_CANDIDATES if c in columns), None)
+    usecols = referenced_columns(rules, columns)
+    if subj_col and subj_col not in usecols: usecols.append(subj_col)
+    str_cols, numeric_cols = infer_dtypes(rules, columns)
+    dtype = {c: str for c in str_cols + ([subj_col] if subj_col else [])}
+
+    reader = pd.read_csv(_rewind(data_file), usecols=usecols or None, dtype=dtype, chunksize=chunksize)
+    chunks = reader if chunksize else [reader]
+    for chunk in chunks:
+        for c in numeric_cols:
+            chunk[c] = pd.to_numeric(chunk[c], errors="coerce")
+        yield chunk
+
+
+def run_chunked(data_file, rules, columns, chunksize=250_000, second_pass=True, check_chunk=None):
+    """
+    Streams a CSV in chunks, reading only the columns the rules reference.
+    Row-local rules are evaluated per chunk and merged as they complete
+    (check_chunk(chunk, i, row_rules) replaces that evaluation, e.g. for delta mode).
+    Cross-row rules (shift/duplicated/groupby...) are flagged and, if
+    `second_pass`, evaluated afterwards on a narrow projection of their own columns.
+    """
+    runnable = [r for r in rules if r.runnable]
+    row_rules = [r for r in runnable if not r.cross_row]
+    cross_rules = [r for r in runnable if r.cross_row]
+
+    # 1. Pass one: bounded memory, chunk by chunk
+    parts = []
+    if row_rules:
+        for i, chunk in enumerate(_read_projection(data_file, columns, row_rules, chunksize)):
+            if check_chunk:
+                found = check_chunk(chunk, i, row_rules)
+            else:
+                mask, evaluated = evaluate_rules(chunk, row_rules)
+                found = build_discrepancies(chunk, evaluated, mask)
+            if not found.empty: parts.append(found)
+
+    # 2. Pass two: cross-row rules see the whole (narrow) column set
+    for rule in cross_rules:
+        if not second_pass:
+            rule.status, rule.message = "Deferred", "Cross-row rule: needs a second (full column) pass."
+            continue
+        for df_narrow in _read_projection(data_file, columns, [rule]):
+            mask, evaluated = evaluate_rules(df_narrow, [rule])
+            found = build_discrepancies(df_narrow, evaluated, mask)
+            if not found.empty: parts.append(found)
+
+    _rewind(data_file)
+    if not parts:
+        return pd.DataFrame(columns=DISCREPANCY_COLS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def rule_errors(rules):
+    """Discrepancy rows for rules that could not be translated or executed."""
+    failed = [r for r in rules if r.status != "Ready"]
+    if not failed:
+        return pd.DataFrame(columns=["CheckID", "Status", "Message"])
+    return pd.DataFrame({
+        "CheckID": [r.check_id for r in failed],
+        "Status": [r.status for r in failed],
+        "Message": [r.message for r in failed],
+    })
@@ -0,0 +1,93 @@
+import pandas as pd
+from logic.date_parser import parse_dates
+
+FATAL_PATTERN = 'FATAL|DEATH'
+SUBJECT_CANDIDATES = ["USUBJID", "SUBJID", "SUBJECT", "KEY"]
+
+# Finding codes -> default wording (entry points may relabel them)
+FINDINGS = {
+    "ZOMBIE": "Fatal AE recorded but Disposition not marked as Death.",
+    "GHOST": "Disposition is Death but no Fatal AE recorded.",
+    "DD_MISSING": "Death reported in AE/DS but no Death Details form.",
+    "DD_ORPHAN": "Death Details form exists but no Fatal AE or Death Disposition.",
+    "DATE_DISCORDANT": "Death dates disagree across AE, DS and DD.",
+}
+
+
+def _pick(df, exact, contains):
+    if exact in df.columns: return exact
+    return next((c for c in df.columns if any(s in str(c).upper() for s in contains)), None)
+
+
+def _subject(df, subj=None):
+    col = subj or next((c for c in SUBJECT_CANDIDATES if c in df.columns), df.columns[0])
+    return df[col].astype(str).str.strip().str.upper()
+
+
+def _first_date(keys, dates, how="max"):
+    frame = pd.DataFrame({"KEY": keys.to_numpy(), "DATE": dates.to_numpy()})
+    return frame.groupby("KEY")["DATE"].agg(how)
+
+
+def triangulate_deaths(df_ae, df_ds, df_dd=None, subj=None, ae_out=None, ds_dec=None):
+    """
+    One row per subject seen in any domain with death flags and dates:
+    AE_FATAL / AE_DATE (latest end date of a fatal AE), DS_DEATH / DS_DATE,
+    DD_EXISTS / DD_DATE. DD columns are None when no DD data was supplied.
+    """
+    ae_key, ds_key = _subject(df_ae, subj), _subject(df_ds, subj)
+    ae_out = ae_out if ae_out in df_ae.columns else _pick(df_ae, "AEOUT", ["OUT"])
+    ds_dec = ds_dec if ds_dec in df_ds.columns else _pick(df_ds, "DSDECOD", ["DECOD", "REAS"])
+
+    fatal = df_ae[ae_out].astype(str).str.contains(FATAL_PATTERN, case=False, na=False) if ae_out else pd.Series(False, index=df_ae.index)
+    dead = df_ds[ds_dec].astype(str).str.upper().str.contains("DEATH", regex=False, na=False) if ds_dec else pd.Series(False, index=df_ds.index)
+
+    subjects = pd.Index(pd.unique(pd.concat([ae_key, ds_key], ignore_index=True)), name="KEY")
+    out = pd.DataFrame(index=subjects)
+    out["AE_FATAL"] = subjects.isin(ae_key[fatal.to_numpy()])
+    out["DS_DEATH"] = subjects.isin(ds_key[dead.to_numpy()])
+
+    ae_date_col = _pick(df_ae, "AEENDTC", ["ENDTC", "ENDAT", "ENDT"])
+    ds_date_col = _pick(df_ds, "DSSTDTC", ["DTC", "DAT"])
+    out["AE_DATE"] = _first_date(ae_key[fatal.to_numpy()], parse_dates(df_ae.loc[fatal.to_numpy(), ae_date_col])) if ae_date_col else pd.NaT
+    out["DS_DATE"] = _first_date(ds_key[dead.to_numpy()], parse_dates(df_ds.loc[dead.to_numpy(), ds_date_col]), "min") if ds_date_col else pd.NaT
+
+    if df_dd is not None and not df_dd.empty:
+        dd_key = _subject(df_dd, subj)
+        out = out.reindex(subjects.union(pd.Index(dd_key.unique(), name="KEY"), sort=False))
+        out[["AE_FATAL", "DS_DEATH"]] = out[["AE_FATAL", "DS_DEATH"]].fillna(False).astype(bool)
+        out["DD_EXISTS"] = out.index.isin(dd_key)
+        dd_date_col = _pick(df_dd, "DDDTC", ["DTHDTC", "DTC", "DAT"])
+        out["DD_DATE"] = _first_date(dd_key, parse_dates(df_dd[dd_date_col]), "min") if dd_date_col else pd.NaT
+    else:
+        out["DD_EXISTS"] = None
+        out["DD_DATE"] = pd.NaT
+    return out
+
+
+def death_findings(tri, date_tolerance_days=0):
+    """
+    Set algebra over triangulate_deaths() flags. Returns Subject / Check / Detail rows,
+    ordered by subject then check. Check is a FINDINGS code.
+    """
+    ae, ds = tri["AE_FATAL"].to_numpy(dtype=bool), tri["DS_DEATH"].to_numpy(dtype=bool)
+    masks = {"ZOMBIE": ae & ~ds, "GHOST": ds & ~ae}
+    if tri["DD_EXISTS"].notna().any():
+        dd = tri["DD_EXISTS"].fillna(False).to_numpy(dtype=bool)
+        masks["DD_MISSING"] = (ae | ds) & ~dd
+        masks["DD_ORPHAN"] = dd & ~(ae | ds)
+
+    dates = tri[["AE_DATE", "DS_DATE", "DD_DATE"]].apply(pd.to_datetime)
+    spread = (dates.max(axis=1) - dates.min(axis=1)).dt.days
+    masks["DATE_DISCORDANT"] = ((dates.notna().sum(axis=1) >= 2) & (spread > date_tolerance_days)).to_numpy()
+    fmt = dates.apply(lambda s: s.dt.strftime("%Y-%m-%d")).fillna("-")
+    date_detail = "AE " + fmt["AE_DATE"] + " / DS " + fmt["DS_DATE"] + " / DD " + fmt["DD_DATE"]
+
+    frames = []
+    for order, (code, mask) in enumerate(masks.items()):
+        if not mask.any(): continue
+        detail = date_detail[mask].to_numpy() if code == "DATE_DISCORDANT" else FINDINGS[code]
+        frames.append(pd.DataFrame({"Subject": tri.index[mask], "Check": code, "Detail": detail, "_chk": order}))
+    if not frames: return pd.DataFrame(columns=["Subject", "Check", "Detail"])
+    out = pd.concat(frames, ignore_index=True).sort_values(["Subject", "_chk"], kind="stable")
+    return out.drop(columns=["_chk"]).reset_index(drop=True)
@@ -0,0 +1,122 @@
+import pandas as pd
+from logic.date_parser import parse_dates
+from logic.sdtm_mapping import COMMON_VARS, DOMAIN_VARS, normalize_header
+
+ID_VARS = ["STUDYID", "DOMAIN", "USUBJID"]
+
+# Sort order of each domain ("--" is the domain prefix); missing keys are skipped
+DOMAIN_KEYS = {
+    "DM": ["STUDYID", "USUBJID"],
+    "AE": ["STUDYID", "USUBJID", "AEDECOD", "AETERM", "AESTDTC"],
+    "LB": ["STUDYID", "USUBJID", "LBTESTCD", "LBTEST", "VISITNUM", "LBDTC"],
+    "VS": ["STUDYID", "USUBJID", "VSTESTCD", "VSTEST", "VISITNUM", "VSDTC"],
+    "MH": ["STUDYID", "USUBJID", "MHDECOD", "MHTERM", "MHSTDTC"],
+    "CM": ["STUDYID", "USUBJID", "CMTRT", "CMSTDTC"],
+    "DS": ["STUDYID", "USUBJID", "DSSTDTC", "DSDECOD"],
+}
+# Study day variables: --DTC -> --DY, --STDTC -> --STDY, --ENDTC -> --ENDY
+DY_SUFFIXES = [("DTC", "DY"), ("STDTC", "STDY"), ("ENDTC", "ENDY")]
+SUPP_COLS = ["STUDYID", "RDOMAIN", "USUBJID", "IDVAR", "IDVARVAL", "QNAM", "QLABEL", "QVAL", "QORIG", "QEVAL"]
+
+
+def _complete_date(values):
+    return values.astype(str).str.strip().str.len().to_numpy() >= 10
+
+
+def study_day(dates, ref):
+    """
+    SDTM study day: date - RFSTDTC (+1 on/after the reference, no day 0).
+    Null unless both --DTC and RFSTDTC are complete dates (partial dates are not imputed).
+    """
+    dates, ref = pd.Series(dates), pd.Series(ref, index=pd.Series(dates).index)
+    days = (parse_dates(dates) - parse_dates(ref)).dt.days
+    days = days.where(days < 0, days + 1).astype("Int64")
+    return days.where(_complete_date(dates) & _complete_date(ref))
+
+
+def _qnams(columns):
+    """QNAM per column: 8 alphanumeric characters starting with a letter, made unique with a numeric tail."""
+    names, seen = {}, set()
+    for col in columns:
+        key = normalize_header(col)
+        base = (key.lstrip("0123456789") or (f"Q{key}" if key else "QVAL"))[:8]
+        name, i = base, 1
+        while name in seen:
+            tail = str(i)
+            name, i = base[:8 - len(tail)] + tail, i + 1
+        names[col] = name
+        seen.add(name)
+    return names
+
+
+def _reference_starts(df, dm):
+    """RFSTDTC per row, from the domain itself or looked up from DM by subject."""
+    if "RFSTDTC" in df.columns: return df["RFSTDTC"]
+    if dm is None or "RFSTDTC" not in dm.columns or "USUBJID" not in df.columns: return None
+    ref = dm.drop_duplicates("USUBJID").set_index("USUBJID")["RFSTDTC"]
+    return df["USUBJID"].map(ref)
+
+
+def build_domain(df, domain, dm=None, studyid=None):
+    """
+    Builds a conformant SDTM domain from a mapped frame (column by column, no row loops).
+    - STUDYID / DOMAIN filled in, --DY variables derived from RFSTDTC (DM or the frame itself)
+    - rows sorted by the domain keys, --SEQ = running number per subject
+    - columns that are not SDTM variables of the domain move to a long SUPP-- frame
+    Returns (domain_df, supp_df).
+    """
+    domain = domain.upper()
+    df = df.copy()
+    if "STUDYID" not in df.columns and studyid is not None: df["STUDYID"] = studyid
+    df["DOMAIN"] = domain
+
+    ref = _reference_starts(df, dm)
+    dy_vars = []
+    if ref is not None:
+        for dtc, dy in DY_SUFFIXES:
+            if f"{domain}{dtc}" in df.columns:
+                df[f"{domain}{dy}"] = study_day(df[f"{domain}{dtc}"], ref)
+                dy_vars.append(f"{domain}{dy}")
+
+    keys = [k for k in DOMAIN_KEYS.get(domain, ["STUDYID", "USUBJID"]) if k in df.columns]
+    if keys: df = df.sort_values(keys, kind="stable", na_position="last").reset_index(drop=True)
+
+    seq = f"{domain}SEQ"
+    if domain != "DM" and "USUBJID" in df.columns:
+        df[seq] = df.groupby("USUBJID", sort=False).cumcount() + 1
+
+    standard = ID_VARS + [seq] + [v for v in COMMON_VARS if v not in ID_VARS] + DOMAIN_VARS.get(domain, []) + dy_vars
+    ordered = list(dict.fromkeys(c for c in standard if c in df.columns))
+    # RFSTDTC merged in for --DY belongs to DM, not to this domain's SUPP
+    extra = [c for c in df.columns if c not in ordered and c != "RFSTDTC"]
+
+    supp = build_supp(df, domain, extra, seq if seq in df.columns else None)
+    return df[ordered], supp
+
+
+def build_supp(df, domain, columns, idvar=None):
+    """Long SUPP-- frame (one row per non-empty value) for the given non-standard columns."""
+    if not columns or "USUBJID" not in df.columns:
+        return pd.DataFrame(columns=SUPP_COLS)
+    ids = [c for c in ["STUDYID", "USUBJID", idvar] if c and c in df.columns]
+    qnams = _qnams(columns)
+    long = df[ids + list(columns)].melt(id_vars=ids, value_vars=list(columns), var_name="QLABEL", value_name="QVAL")
+    long = long[long["QVAL"].notna()]
+    long["QVAL"] = long["QVAL"].astype(str).str.strip()
+    long = long[long["QVAL"] != ""]
+
+    supp = pd.DataFrame({
+        "STUDYID": long["STUDYID"].to_numpy() if "STUDYID" in long.columns else "",
+        "RDOMAIN": domain,
+        "USUBJID": long["USUBJID"].to_numpy(),
+        "IDVAR": idvar or "",
+        "IDVARVAL": long[idvar].astype(str).to_numpy() if idvar else "",
+        "QNAM": long["QLABEL"].map(qnams).to_numpy(),
+        "QLABEL": long["QLABEL"].astype(str).str[:40].to_numpy(),
+        "QVAL": long["QVAL"].to_numpy(),
+        "QORIG": "CRF",
+        "QEVAL": "",
+    }, columns=SUPP_COLS)
+    if idvar:
+        supp = supp.assign(_seq=long[idvar].to_numpy()).sort_values(["USUBJID", "_seq", "QNAM"], kind="stable").drop(columns="_seq")
+    return supp.reset_index(drop=True)
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+from logic.date_parser import iso8601_mask
+
+MAX_CHAR_LENGTH = 200
+MAX_NAME_LENGTH = 8
+
+# Controlled terminology (subset of CDISC CT used by our domains)
+CODELISTS = {
+    "NY": ["N", "Y", "U", "NA"],
+    "SEX": ["M", "F", "U", "UNDIFFERENTIATED"],
+    "AGEU": ["YEARS", "MONTHS", "WEEKS", "DAYS", "HOURS"],
+    "AESEV": ["MILD", "MODERATE", "SEVERE"],
+    "OUT": ["RECOVERED/RESOLVED", "RECOVERING/RESOLVING", "NOT RECOVERED/NOT RESOLVED",
+            "RECOVERED/RESOLVED WITH SEQUELAE", "FATAL", "UNKNOWN"],
+    "ACN": ["DOSE INCREASED", "DOSE NOT CHANGED", "DOSE RATE REDUCED", "DOSE REDUCED",
+            "DRUG INTERRUPTED", "DRUG WITHDRAWN", "NOT APPLICABLE", "UNKNOWN"],
+    "NRIND": ["NORMAL", "LOW", "HIGH", "ABNORMAL", "LOW LOW", "HIGH HIGH"],
+}
+# Variable -> codelist ("--" is the domain prefix)
+VARIABLE_CODELISTS = {
+    "SEX": "SEX", "AGEU": "AGEU", "AESER": "NY", "AESEV": "AESEV", "AEOUT": "OUT", "AEACN": "ACN",
+    "--NRIND": "NRIND", "--BLFL": "NY",
+}
+
+# Core variables by observation class
+REQUIRED = {
+    "ALL": ["STUDYID", "DOMAIN", "USUBJID"],
+    "DM": ["SUBJID", "SITEID", "SEX", "COUNTRY"],
+    "AE": ["AESEQ", "AETERM", "AEDECOD"],
+    "MH": ["MHSEQ", "MHTERM"],
+    "CM": ["CMSEQ", "CMTRT"],
+    "DS": ["DSSEQ", "DSTERM", "DSDECOD"],
+    "LB": ["LBSEQ", "LBTESTCD", "LBTEST"],
+    "VS": ["VSSEQ", "VSTESTCD", "VSTEST"],
+}
+EXPECTED = {
+    "DM": ["RFSTDTC", "AGE", "AGEU", "ARM"],
+    "AE": ["AESTDTC", "AESER", "AEREL", "AEOUT"],
+    "MH": ["MHSTDTC"],
+    "CM": ["CMSTDTC", "CMINDC"],
+    "DS": ["DSSTDTC"],
+    "LB": ["LBORRES", "LBORRESU", "LBDTC", "VISITNUM"],
+    "VS": ["VSORRES", "VSORRESU", "VSDTC", "VISITNUM"],
+}
+KEYS = {"DM": ["STUDYID", "USUBJID"]}  # other domains: STUDYID, USUBJID, --SEQ
+
+RESULT_COLS = ["Rule", "Severity", "Variable", "Count", "Rows", "Example", "Message"]
+# Our own rule IDs (LV prefix): they are not Pinnacle 21 / CDISC rule IDs
+DATE_FORMAT_RULE = "LV0007"
+
+
+def _finding(rule, severity, variable, mask, values=None, message=""):
+    """One failing rule; mask=None for structural findings (no rows involved)."""
+    rows = np.flatnonzero(mask) if mask is not None else np.array([], dtype=int)
+    example = values.iloc[rows[0]] if values is not None and len(rows) else ""
+    return {"Rule": rule, "Severity": severity, "Variable": variable, "Count": len(rows),
+            "Rows": rows, "Example": example, "Message": message}
+
+
+class _Distinct:
+    """Each column factorized once; rule tests run on its distinct non-null values only."""
+
+    def __init__(self, df):
+        self.df = df
+        self._cache = {}
+
+    def mask(self, var, test):
+        """test() evaluated per distinct value, spread back to every row (nulls -> False)."""
+        if var not in self._cache: self._cache[var] = pd.factorize(self.df[var])
+        codes, uniq = self._cache[var]
+        if not len(uniq): return np.zeros(len(codes), dtype=bool)
+        per_value = np.append(np.asarray(test(pd.Series(uniq, dtype=object)), dtype=bool), False)
+        return per_value[codes]  # code -1 (null) picks the trailing False
+
+
+def codelist_for(var, domain):
+    name = VARIABLE_CODELISTS.get(var)
+    if name is None and var.startswith(domain):
+        name = VARIABLE_CODELISTS.get("--" + var[len(domain):])
+    return name
+
+
+def check_conformance(df, domain):
+    """
+    Checks every value of every variable of an SDTM domain against the rule table.
+    Returns one row per failing rule / variable with the count and the failing row positions.
+    """
+    domain = domain.upper()
+    found, distinct = [], _Distinct(df)
+
+    for var in REQUIRED["ALL"] + REQUIRED.get(domain, []):
+        if var not in df.columns:
+            found.append(_finding("LV0001", "Error", var, None, message="Missing Required Variable"))
+        else:
+            blank = df[var].isna().to_numpy() | distinct.mask(var, lambda u: u.astype(str).str.strip() == "")
+            if blank.any(): found.append(_finding("LV0002", "Error", var, blank, message="Required Variable has null values"))
+    for var in EXPECTED.get(domain, []):
+        if var not in df.columns:
+            found.append(_finding("LV0003", "Warning", var, None, message="Missing Expected Variable"))
+
+    if "DOMAIN" in df.columns:
+        wrong = (df["DOMAIN"].astype(str) != domain).to_numpy()
+        if wrong.any(): found.append(_finding("LV0004", "Error", "DOMAIN", wrong, df["DOMAIN"], f"DOMAIN is not '{domain}'"))
+
+    keys = KEYS.get(domain, ["STUDYID", "USUBJID", f"{domain}SEQ"])
+    if all(k in df.columns for k in keys):
+        dup = df.duplicated(keys, keep=False).to_numpy()
+        if dup.any(): found.append(_finding("LV0005", "Error", ", ".join(keys), dup, message="Duplicate key values"))
+
+    for var in df.columns:
+        name = str(var)
+        if len(name) > MAX_NAME_LENGTH:
+            found.append(_finding("LV0006", "Error", name, None, message=f"Variable name longer than {MAX_NAME_LENGTH}"))
+        col = df[var]
+        if name.endswith("DTC"):
+            bad = distinct.mask(var, lambda u: ~iso8601_mask(u).to_numpy())
+            if bad.any(): found.append(_finding(DATE_FORMAT_RULE, "Warning", name, bad, col, "Date value not ISO 8601"))
+
+        codelist = codelist_for(name, domain)
+        if codelist:
+            allowed = CODELISTS[codelist]
+            # Submission values are case- and space-sensitive: compare exactly
+            bad = distinct.mask(var, lambda u: (u.astype(str).str.strip() != "") & ~u.astype(str).isin(allowed))
+            if bad.any(): found.append(_finding("LV0008", "Error", name, bad, col, f"Value not in codelist {codelist}"))
+
+        if col.dtype == object or pd.api.types.is_string_dtype(col):
+            too_long = distinct.mask(var, lambda u: u.astype(str).str.len() > MAX_CHAR_LENGTH)
+            if too_long.any(): found.append(_finding("LV0009", "Error", name, too_long, col, f"Value longer than {MAX_CHAR_LENGTH} characters"))
+
+    return pd.DataFrame(found, columns=RESULT_COLS)
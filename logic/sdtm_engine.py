@@ -3,6 +3,8 @@ import json
 import re
 from langchain_google_vertexai import ChatVertexAI
 from langchain_core.prompts import PromptTemplate
+from logic.sdtm_conformance import DATE_FORMAT_RULE, check_conformance
+from logic.sdtm_mapping import MappingStore, validate_mapping
 
 # --- CONFIG ---
 # Reusing the existing AI setup pattern
@@ -17,9 +19,13 @@ except Exception as e:
     print(f"Warning: AI not connected. SDTM Engine will default to mock mode. {e}")
     llm = None
 
-def auto_map_to_sdtm(raw_csv_path, domain):
+def auto_map_to_sdtm(raw_csv_path, domain, store=None):
     """
     Ingests a raw CSV and maps columns to SDTM 3.3 variables for the specified Domain.
+    Headers are resolved locally first (approved layouts, exact names, synonyms);
+    only the residual unknown headers are sent to the AI, and its answer is checked
+    against the domain's variables. Nothing is stored: the draft mapping is returned in
+    df.attrs["sdtm_mapping"] ({"headers", "mapping", "unknown"}) for approve_mapping.
     """
     try:
         df = pd.read_csv(raw_csv_path)
@@ -27,15 +33,19 @@ def auto_map_to_sdtm(raw_csv_path, domain):
         return pd.DataFrame(), f"Error reading CSV: {e}"
 
     headers = df.columns.tolist()
+    store = store or MappingStore()
+    mapping_dict, unknown = store.resolve(headers, domain)
+    local_count = len(mapping_dict)
 
-    if llm:
-        # AI MAPPING
+    if unknown and llm:
+        # AI MAPPING (residual headers only)
         template = """
         You are a generic Clinical Data CDISC Expert.
         
         TASK: Map the following Raw Data Headers to standard SDTM IG 3.3 Variables for the Domain '{domain}'.
         
         RAW HEADERS: {headers}
+        ALREADY MAPPED (do not reuse these variables): {mapped}
         
         RULES:
         1. Return ONLY a valid JSON dictionary: {{"RawHeader": "SDTMVariable"}}
@@ -49,14 +59,15 @@ def auto_map_to_sdtm(raw_csv_path, domain):
         chain = prompt | llm
         
         try:
-            response = chain.invoke({"domain": domain, "headers": str(headers)})
+            response = chain.invoke({"domain": domain, "headers": str(unknown), "mapped": str(sorted(mapping_dict.values()))})
             mapping_text = response.content.replace("```json", "").replace("```", "").strip()
-            mapping_dict = json.loads(mapping_text)
+            ai_mapping = json.loads(mapping_text)
         except Exception as e:
-            return df, f"AI Mapping Failed: {e}"
-    else:
-        # FALLBACK / MOCK
-        mapping_dict = {} # No mapping in mock mode unless hardcoded
+            return df.rename(columns=mapping_dict), f"AI Mapping Failed: {e}"
+        # Invalid, duplicate or missing answers stay unknown for the reviewer
+        accepted, unknown = validate_mapping(ai_mapping if isinstance(ai_mapping, dict) else {}, unknown, domain,
+                                             taken=set(mapping_dict.values()) | (set(headers) - set(mapping_dict) - set(unknown)))
+        mapping_dict.update(accepted)
 
     # TRANSFORMATION
     # Rename columns
@@ -73,39 +84,41 @@ def auto_map_to_sdtm(raw_csv_path, domain):
             df_sdtm.rename(columns={"PatientID": "USUBJID"}, inplace=True)
         # else: take a guess? For now, we leave it for the validator to catch.
 
-    return df_sdtm, f"✅ SDTM Conversion Complete (Mapped {len(mapping_dict)} columns)"
+    df_sdtm.attrs["sdtm_mapping"] = {"headers": headers, "mapping": dict(mapping_dict), "unknown": list(unknown)}
+    open_note = f", {len(unknown)} unmapped" if unknown else ""
+    return df_sdtm, f"✅ SDTM Conversion Complete (Mapped {len(mapping_dict)} columns, {local_count} from mapping store{open_note})"
+
+
+def approve_mapping(headers, domain, mapping, store=None):
+    """
+    Stores a mapping the user approved. The whole layout is frozen only when every
+    header maps to a distinct, valid variable; otherwise only the single headers are learned.
+    """
+    store = store or MappingStore()
+    mapped = {h: v for h, v in mapping.items() if h in headers}
+    accepted, _ = validate_mapping(mapped, list(mapped), domain)
+    passthrough = [h for h in headers if h not in mapping]
+    _, open_headers = validate_mapping({h: h for h in passthrough}, passthrough, domain, taken=accepted.values())
+    store.approve(headers, domain, accepted, complete=len(accepted) == len(mapped) and not open_headers)
+    return accepted
+
 
 def validate_sdtm_structure(df, domain):
     """
     Validates the structure of a draft SDTM dataframe.
+    Every value of every variable is checked (see logic/sdtm_conformance).
     """
-    issues = []
-    
-    # 1. Mandatory Variables (General)
-    required_vars = ["USUBJID", "DOMAIN"]
-    # Domain specific sequence
-    seq_var = f"{domain}SEQ"
-    # required_vars.append(seq_var) # Usually auto-generated, but let's check if user expects it
-    
-    for var in required_vars:
-        if var not in df.columns:
-            issues.append(f"❌ Missing Required Variable: {var}")
-            
-    # 2. Date Format Check (ISO 8601 YYYY-MM-DD)
-    # Find columns ending in DTC
-    date_cols = [c for c in df.columns if c.endswith("DTC")]
-    
-    iso_pattern = re.compile(r'^\d{4}-\d{2}-\d{2}')
-    
-    for col in date_cols:
-        # Check first non-null value
-        sample = df[col].dropna().iloc[0] if not df[col].dropna().empty else None
-        if sample:
-             # simplistic check: string must start with YYYY-MM-DD
-             if not iso_pattern.match(str(sample)):
-                 issues.append(f"⚠️ Date Format Warning ({col}): '{sample}' does not look like ISO-8601 (YYYY-MM-DD).")
+    findings = check_conformance(df, domain)
+    if findings.empty:
+        return "✅ Conformance Report: 100% Pass (Structure, Dates, Terminology & Keys)"
 
-    if not issues:
-        return "✅ Conformance Report: 100% Pass (Structure & Dates)"
-    else:
-        return "\n".join(issues)
+    issues = []
+    for f in findings.itertuples(index=False):
+        icon = "❌" if f.Severity == "Error" else "⚠️"
+        if f.Rule == DATE_FORMAT_RULE:
+            issues.append(f"⚠️ Date Format Warning ({f.Variable}): {f.Count} value(s) not ISO-8601, e.g. '{f.Example}'.")
+        elif f.Count:
+            issues.append(f"{icon} {f.Message} ({f.Variable}): {f.Count} row(s), e.g. '{f.Example}'.")
+        else:
+            issues.append(f"{icon} {f.Message}: {f.Variable}")
+    return "\n".join(issues)
@@ -0,0 +1,233 @@
+import os
+import struct
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from logic.sdtm_mapping import DOMAIN_LABELS, variable_label
+
+# Parquet is optional (pyarrow); XPT needs nothing beyond numpy
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CHUNK_ROWS = 100_000
+FILE_ROWS = 1_000_000  # rows per Parquet part file
+
+# SAS XPORT v5 limits
+XPT_NAME_LENGTH = 8
+XPT_LABEL_LENGTH = 40
+XPT_CHAR_LENGTH = 200
+
+_RECORD = 80
+_LIBRARY_HEADER = "HEADER RECORD*******LIBRARY HEADER RECORD!!!!!!!000000000000000000000000000000  "
+_MEMBER_HEADER = "HEADER RECORD*******MEMBER  HEADER RECORD!!!!!!!000000000000000001600000000140  "
+_DSCRPTR_HEADER = "HEADER RECORD*******DSCRPTR HEADER RECORD!!!!!!!000000000000000000000000000000  "
+_OBS_HEADER = "HEADER RECORD*******OBS     HEADER RECORD!!!!!!!000000000000000000000000000000  "
+_NAMESTR = struct.Struct(">hhhh8s40s8shhh2s8shhl52s")  # 140 bytes per variable
+_MISSING = np.uint64(0x2E << 56)  # SAS missing numeric "."
+
+
+def _text(value, width):
+    return str(value)[:width].ljust(width).encode("ascii", "replace")
+
+
+def _padded(raw):
+    """Pads a header block with blanks to the next 80-byte record."""
+    return raw + b" " * (-len(raw) % _RECORD)
+
+
+def _ibm_floats(values):
+    """
+    IEEE float64 -> 8-byte IBM mainframe doubles (big-endian), NaN -> SAS missing.
+    Values too small for the IBM exponent (< 16^-65) become 0; values too large
+    (>= 16^63, or infinite) raise ValueError.
+    """
+    x = np.asarray(values, dtype="float64")
+    out = np.zeros(len(x), dtype=np.uint64)
+    m, e = np.frexp(np.abs(np.where(np.isfinite(x), x, 0)))  # |x| = m * 2^e, m in [0.5, 1)
+    e16 = -np.floor_divide(-e, 4)                # |x| = f * 16^e16, f in [1/16, 1)
+    too_big = np.isinf(x) | (e16 + 64 > 127)
+    if too_big.any():
+        raise ValueError(f"Not XPT v5 compliant: {x[too_big][0]} is outside the IBM float range")
+    ok = np.isfinite(x) & (x != 0) & (e16 + 64 >= 0)
+    m, e16 = m[ok], e16[ok]
+    shift = 4 * e16 - e[ok]
+    frac = (m * 2.0 ** 53).astype(np.uint64) << (3 - shift).astype(np.uint64)
+    exp = (e16 + 64).astype(np.uint64)
+    sign = np.signbit(x[ok]).astype(np.uint64)
+    out[ok] = (sign << np.uint64(63)) | (exp << np.uint64(56)) | frac
+    out[np.isnan(x)] = _MISSING
+    return out.astype(">u8")
+
+
+def _is_numeric(col):
+    return pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col)
+
+
+def _encoded(col):
+    """UTF-8 bytes for every row, each distinct value encoded once (nulls -> b'')."""
+    codes, uniq = pd.factorize(col)
+    enc = np.array([str(u).encode("utf-8") for u in uniq] + [b""], dtype=object)
+    return enc[codes]
+
+
+def _char_length(col):
+    uniq = pd.unique(col.dropna())
+    return max((len(str(u).encode("utf-8")) for u in uniq), default=0)
+
+
+def xpt_variables(df, domain=None, labels=None):
+    """
+    XPT v5 variable metadata (name, type, length, label, offset) for a frame.
+    Raises ValueError for names longer than 8 or character values longer than 200.
+    """
+    labels, problems, variables, pos = labels or {}, [], [], 0
+    for i, col in enumerate(df.columns):
+        name = str(col).upper()
+        numeric = _is_numeric(df[col])
+        length = 8 if numeric else max(_char_length(df[col]), 1)
+        if len(name) > XPT_NAME_LENGTH: problems.append(f"{name}: name longer than {XPT_NAME_LENGTH}")
+        if length > XPT_CHAR_LENGTH: problems.append(f"{name}: values up to {length} bytes (max {XPT_CHAR_LENGTH})")
+        label = labels.get(col) or variable_label(name, domain or "")
+        variables.append({"column": col, "name": name, "numeric": numeric, "length": length,
+                          "label": label[:XPT_LABEL_LENGTH], "position": pos, "number": i + 1})
+        pos += length
+    if problems:
+        raise ValueError("Not XPT v5 compliant: " + "; ".join(problems))
+    return variables
+
+
+def _header(name, label, variables, stamp):
+    sas = _text("SAS", 8)
+    head = _LIBRARY_HEADER.encode() + sas + sas + _text("SASLIB", 8) + _text("9.4", 8) + _text("X64_7PRO", 8) + b" " * 24 + stamp
+    head += _padded(stamp)
+    head += _MEMBER_HEADER.encode() + _DSCRPTR_HEADER.encode()
+    head += sas + _text(name, 8) + _text("SASDATA", 8) + _text("9.4", 8) + _text("X64_7PRO", 8) + b" " * 24 + stamp
+    head += stamp + b" " * 16 + _text(label, XPT_LABEL_LENGTH) + _text("", 8)
+    head += f"HEADER RECORD*******NAMESTR HEADER RECORD!!!!!!!000000{len(variables):04d}00000000000000000000  ".encode()
+    namestrs = b"".join(_NAMESTR.pack(
+        1 if v["numeric"] else 2, 0, v["length"], v["number"], _text(v["name"], 8), _text(v["label"], 40),
+        _text("", 8), 0, 0, 0, b"\0\0", _text("", 8), 0, 0, v["position"], b"\0" * 52) for v in variables)
+    return head + _padded(namestrs) + _OBS_HEADER.encode()
+
+
+def _record_bytes(chunk, variables):
+    """One chunk of observations as fixed-width XPT records (no per-row Python)."""
+    dtype = np.dtype([(f"v{v['number']}", ">u8" if v["numeric"] else f"S{v['length']}") for v in variables])
+    rec = np.empty(len(chunk), dtype=dtype)
+    for v in variables:
+        field = f"v{v['number']}"
+        if v["numeric"]:
+            rec[field] = _ibm_floats(pd.to_numeric(chunk[v["column"]], errors="coerce").to_numpy(dtype="float64", na_value=np.nan))
+        else:
+            raw = _encoded(chunk[v["column"]]).astype(f"S{v['length']}")
+            grid = raw.view(np.uint8).reshape(len(chunk), v["length"])
+            grid[grid == 0] = 32  # XPT pads character values with blanks
+            rec[field] = raw
+    return rec.tobytes()
+
+
+def write_xpt(df, target, name, label=None, labels=None, chunk_rows=CHUNK_ROWS):
+    """
+    Writes one dataset as SAS XPORT v5 to a path or binary file object.
+    Observations are serialized chunk by chunk straight into the file.
+    """
+    name = str(name).upper()
+    if len(name) > XPT_NAME_LENGTH:
+        raise ValueError(f"Not XPT v5 compliant: dataset name {name} longer than {XPT_NAME_LENGTH}")
+    domain = name[4:] if name.startswith("SUPP") else name
+    variables = xpt_variables(df, domain, labels)
+    label = label if label is not None else DOMAIN_LABELS.get(name, f"Supplemental Qualifiers for {domain}" if name != domain else "")
+    stamp = datetime.now().strftime("%d%b%y:%H:%M:%S").upper().encode()
+
+    f = open(target, "wb") if isinstance(target, (str, os.PathLike)) else target
+    try:
+        f.write(_header(name, label, variables, stamp))
+        written = 0
+        for start in range(0, len(df), chunk_rows):
+            block = _record_bytes(df.iloc[start:start + chunk_rows], variables)
+            f.write(block)
+            written += len(block)
+        f.write(b" " * (-written % _RECORD))
+    finally:
+        if f is not target: f.close()
+    return variables
+
+
+def read_xpt(source, chunk_rows=None):
+    """Reads an XPT file back (character values decoded and right-trimmed)."""
+    reader = pd.read_sas(source, format="xport", encoding="utf-8", chunksize=chunk_rows)
+    if chunk_rows: return (_trimmed(c) for c in reader)
+    return _trimmed(reader)
+
+
+def _trimmed(df):
+    for col in df.columns:
+        if pd.api.types.is_string_dtype(df[col]): df[col] = df[col].str.rstrip()
+    return df
+
+
+def _arrow_schema(df):
+    fields = []
+    for col in df.columns:
+        if df[col].dtype == object: fields.append(pa.field(str(col), pa.string()))
+        else: fields.append(pa.Schema.from_pandas(df[[col]], preserve_index=False).field(str(col)))
+    return pa.schema(fields)
+
+
+def _as_text(chunk):
+    """Object columns as str (nulls kept) so every chunk matches the schema."""
+    obj = [c for c in chunk.columns if chunk[c].dtype == object]
+    if not obj: return chunk
+    chunk = chunk.copy()
+    for c in obj: chunk[c] = chunk[c].where(chunk[c].isna(), chunk[c].astype(str))
+    return chunk
+
+
+def write_parquet(domains, root, chunk_rows=CHUNK_ROWS, file_rows=FILE_ROWS):
+    """
+    Writes {name: frame} as a partitioned Parquet tree (<root>/<name>/part-00000.parquet, ...):
+    a new part file every file_rows rows, one row group per chunk. Parts left by an earlier
+    export are removed first. Returns {name: folder}.
+    """
+    if pq is None:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow).")
+    file_rows = max(file_rows, chunk_rows)
+    paths = {}
+    for name, df in domains.items():
+        folder = os.path.join(root, str(name).upper())
+        os.makedirs(folder, exist_ok=True)
+        for old in os.listdir(folder):
+            if old.startswith("part-") and old.endswith(".parquet"): os.remove(os.path.join(folder, old))
+        schema = _arrow_schema(df)
+        for part, first in enumerate(range(0, max(len(df), 1), file_rows)):
+            rows = df.iloc[first:first + file_rows]
+            with pq.ParquetWriter(os.path.join(folder, f"part-{part:05d}.parquet"), schema) as writer:
+                for start in range(0, max(len(rows), 1), chunk_rows):
+                    chunk = _as_text(rows.iloc[start:start + chunk_rows])
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        paths[str(name).upper()] = folder
+    return paths
+
+
+def read_parquet(root, name):
+    if pq is None:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow).")
+    return pq.read_table(os.path.join(root, str(name).upper())).to_pandas()
+
+
+def export_domains(domains, out_dir, formats=("xpt", "parquet"), chunk_rows=CHUNK_ROWS, file_rows=FILE_ROWS):
+    """Exports {name: frame} (SDTM or ADaM) as <out_dir>/<name>.xpt and/or a partitioned Parquet tree."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    if "xpt" in formats:
+        for name, df in domains.items():
+            path = os.path.join(out_dir, f"{str(name).lower()}.xpt")
+            write_xpt(df, path, name, chunk_rows=chunk_rows)
+            written[f"{name}.xpt"] = path
+    if "parquet" in formats:
+        for name, path in write_parquet(domains, os.path.join(out_dir, "parquet"), chunk_rows, file_rows).items():
+            written[f"{name}.parquet"] = path
+    return written
@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import hashlib
+
+# Persistence Path (same backend_data layout as the edit-check rule cache)
+MAPPING_DIR = os.path.join(os.getcwd(), "backend_data", "sdtm")
+MAPPING_FILE = os.path.join(MAPPING_DIR, "mapping_store.json")
+
+# Identifier / timing variables valid in every domain
+COMMON_VARS = ["STUDYID", "DOMAIN", "USUBJID", "SUBJID", "SITEID", "VISIT", "VISITNUM", "EPOCH"]
+
+# SDTMIG 3.3 variables of each domain in standard order (identifiers above are repeated where the IG lists them)
+DOMAIN_VARS = {
+    "DM": ["RFSTDTC", "RFENDTC", "RFXSTDTC", "RFXENDTC", "RFICDTC", "RFPENDTC", "DTHDTC", "DTHFL", "INVID", "INVNAM",
+           "BRTHDTC", "AGE", "AGEU", "SEX", "RACE", "ETHNIC", "ARMCD", "ARM", "ACTARMCD", "ACTARM", "ARMNRS", "ACTARMUD",
+           "COUNTRY", "DMDTC", "DMDY"],
+    "AE": ["AESEQ", "AEGRPID", "AEREFID", "AESPID", "AETERM", "AEMODIFY", "AELLT", "AELLTCD", "AEDECOD", "AEPTCD",
+           "AEHLT", "AEHLTCD", "AEHLGT", "AEHLGTCD", "AECAT", "AESCAT", "AEPRESP", "AEBODSYS", "AEBDSYCD", "AESOC", "AESOCCD",
+           "AELOC", "AESEV", "AESER", "AEACN", "AEACNOTH", "AEREL", "AERELNST", "AEPATT", "AEOUT", "AESCAN", "AESCONG",
+           "AESDISAB", "AESDTH", "AESHOSP", "AESLIFE", "AESOD", "AESMIE", "AECONTRT", "AETOXGR", "TAETORD", "AEDTC",
+           "AESTDTC", "AEENDTC", "AEDY", "AESTDY", "AEENDY", "AEDUR", "AEENRF", "AEENRTPT", "AEENTPT"],
+    "LB": ["LBSEQ", "LBGRPID", "LBREFID", "LBSPID", "LBTESTCD", "LBTEST", "LBCAT", "LBSCAT", "LBORRES", "LBORRESU",
+           "LBORNRLO", "LBORNRHI", "LBSTRESC", "LBSTRESN", "LBSTRESU", "LBSTNRLO", "LBSTNRHI", "LBSTNRC", "LBNRIND",
+           "LBSTAT", "LBREASND", "LBNAM", "LBLOINC", "LBSPEC", "LBSPCCND", "LBMETHOD", "LBBLFL", "LBLOBXFL", "LBFAST",
+           "LBDRVFL", "LBTOX", "LBTOXGR", "VISITDY", "TAETORD", "LBDTC", "LBENDTC", "LBDY", "LBENDY", "LBTPT",
+           "LBTPTNUM", "LBELTM", "LBTPTREF", "LBRFTDTC"],
+    "VS": ["VSSEQ", "VSGRPID", "VSSPID", "VSTESTCD", "VSTEST", "VSCAT", "VSSCAT", "VSPOS", "VSORRES", "VSORRESU",
+           "VSSTRESC", "VSSTRESN", "VSSTRESU", "VSSTAT", "VSREASND", "VSLOC", "VSLAT", "VSBLFL", "VSLOBXFL", "VSDRVFL",
+           "VSTOX", "VSTOXGR", "VISITDY", "TAETORD", "VSDTC", "VSDY", "VSTPT", "VSTPTNUM", "VSELTM", "VSTPTREF", "VSRFTDTC"],
+    "MH": ["MHSEQ", "MHGRPID", "MHREFID", "MHSPID", "MHTERM", "MHMODIFY", "MHDECOD", "MHEVDTYP", "MHCAT", "MHSCAT",
+           "MHPRESP", "MHOCCUR", "MHSTAT", "MHREASND", "MHBODSYS", "MHLOC", "MHSEV", "VISITDY", "TAETORD", "MHDTC",
+           "MHSTDTC", "MHENDTC", "MHDY", "MHENRF", "MHENRTPT", "MHENTPT"],
+    "CM": ["CMSEQ", "CMGRPID", "CMSPID", "CMTRT", "CMMODIFY", "CMDECOD", "CMCAT", "CMSCAT", "CMPRESP", "CMOCCUR",
+           "CMSTAT", "CMREASND", "CMINDC", "CMCLAS", "CMCLASCD", "CMDOSE", "CMDOSTXT", "CMDOSU", "CMDOSFRM", "CMDOSFRQ",
+           "CMDOSTOT", "CMDOSRGM", "CMROUTE", "CMADJ", "CMRSDISC", "VISITDY", "TAETORD", "CMDTC", "CMSTDTC", "CMENDTC",
+           "CMDY", "CMSTDY", "CMENDY", "CMDUR", "CMSTRF", "CMENRF", "CMSTRTPT", "CMSTTPT", "CMENRTPT", "CMENTPT"],
+    "DS": ["DSSEQ", "DSGRPID", "DSREFID", "DSSPID", "DSTERM", "DSDECOD", "DSCAT", "DSSCAT", "VISITDY", "TAETORD",
+           "DSDTC", "DSSTDTC", "DSDY", "DSSTDY"],
+}
+
+# Normalized raw header -> variable. "--" is replaced by the domain prefix.
+SYNONYMS = {
+    "PATIENT": "USUBJID", "PATIENTID": "USUBJID", "PATID": "USUBJID", "SUBJECT": "USUBJID",
+    "SUBJECTID": "USUBJID", "SUBJECTNUMBER": "USUBJID", "PARTICIPANTID": "USUBJID",
+    "SITE": "SITEID", "SITENUMBER": "SITEID", "SITENO": "SITEID", "STUDY": "STUDYID", "PROTOCOL": "STUDYID",
+    "VISITNAME": "VISIT", "FOLDER": "VISIT", "VISITNUMBER": "VISITNUM",
+    "VISITDATE": "--DTC", "DATE": "--DTC", "COLLECTIONDATE": "--DTC", "ASSESSMENTDATE": "--DTC",
+    "RESULT": "--ORRES", "VALUE": "--ORRES", "UNIT": "--ORRESU", "UNITS": "--ORRESU",
+    "TEST": "--TEST", "TESTNAME": "--TEST", "TESTCODE": "--TESTCD",
+    "STARTDATE": "--STDTC", "ONSETDATE": "--STDTC", "ENDDATE": "--ENDTC", "STOPDATE": "--ENDTC",
+    "TERM": "--TERM", "VERBATIM": "--TERM",
+    # DM
+    "GENDER": "SEX", "DOB": "BRTHDTC", "DATEOFBIRTH": "BRTHDTC", "BIRTHDATE": "BRTHDTC",
+    "CONSENTDATE": "RFICDTC", "ICFDATE": "RFICDTC", "TREATMENTARM": "ARM",
+    # AE
+    "ADVERSEEVENT": "AETERM", "EVENT": "AETERM", "SERIOUS": "AESER", "SEVERITY": "AESEV",
+    "CAUSALITY": "AEREL", "RELATIONSHIP": "AEREL", "OUTCOME": "AEOUT", "ACTIONTAKEN": "AEACN",
+    # LB
+    "LOWRANGE": "LBORNRLO", "LOW": "LBORNRLO", "HIGHRANGE": "LBORNRHI", "HIGH": "LBORNRHI",
+    # CM / MH
+    "MEDICATION": "CMTRT", "DRUG": "CMTRT", "INDICATION": "CMINDC", "DOSE": "CMDOSE", "ROUTE": "CMROUTE",
+    "CONDITION": "MHTERM", "MEDICALHISTORY": "MHTERM",
+    "DISPOSITION": "DSDECOD", "REASON": "DSDECOD",
+}
+
+DOMAIN_LABELS = {
+    "DM": "Demographics", "AE": "Adverse Events", "LB": "Laboratory Test Results", "VS": "Vital Signs",
+    "MH": "Medical History", "CM": "Concomitant Medications", "DS": "Disposition",
+}
+
+# Variable labels (max 40 characters). "--" is the domain prefix.
+VARIABLE_LABELS = {
+    "STUDYID": "Study Identifier", "DOMAIN": "Domain Abbreviation", "USUBJID": "Unique Subject Identifier",
+    "SUBJID": "Subject Identifier for the Study", "SITEID": "Study Site Identifier",
+    "VISIT": "Visit Name", "VISITNUM": "Visit Number", "EPOCH": "Epoch",
+    "--SEQ": "Sequence Number", "--TESTCD": "Test or Examination Short Name", "--TEST": "Test or Examination Name",
+    "--CAT": "Category", "--ORRES": "Result or Finding in Original Units", "--ORRESU": "Original Units",
+    "--ORNRLO": "Reference Range Lower Limit in Orig Unit", "--ORNRHI": "Reference Range Upper Limit in Orig Unit",
+    "--STRESN": "Numeric Result/Finding in Standard Units", "--STRESU": "Standard Units",
+    "--NRIND": "Reference Range Indicator", "--TERM": "Reported Term", "--DECOD": "Dictionary-Derived Term",
+    "--BODSYS": "Body System or Organ Class", "--DTC": "Date/Time of Collection",
+    "--STDTC": "Start Date/Time", "--ENDTC": "End Date/Time",
+    "--DY": "Study Day of Collection", "--STDY": "Study Day of Start", "--ENDY": "Study Day of End",
+    # DM
+    "RFSTDTC": "Subject Reference Start Date/Time", "RFENDTC": "Subject Reference End Date/Time",
+    "RFICDTC": "Date/Time of Informed Consent", "BRTHDTC": "Date/Time of Birth", "AGE": "Age", "AGEU": "Age Units",
+    "SEX": "Sex", "RACE": "Race", "ETHNIC": "Ethnicity", "ARMCD": "Planned Arm Code",
+    "ARM": "Description of Planned Arm", "COUNTRY": "Country",
+    # AE / CM / VS / MH
+    "AESEV": "Severity/Intensity", "AESER": "Serious Event", "AEREL": "Causality",
+    "AEACN": "Action Taken with Study Treatment", "AEOUT": "Outcome of Adverse Event", "AETOXGR": "Standard Toxicity Grade",
+    "CMTRT": "Reported Name of Drug, Med, or Therapy", "CMINDC": "Indication", "CMDOSE": "Dose per Administration",
+    "CMDOSU": "Dose Units", "CMROUTE": "Route of Administration",
+    "VSPOS": "Vital Signs Position of Subject", "VSLOC": "Location of Vital Signs Measurement",
+    "MHENRF": "End Relative to Reference Period",
+    # SUPP--
+    "RDOMAIN": "Related Domain Abbreviation", "IDVAR": "Identifying Variable", "IDVARVAL": "Identifying Variable Value",
+    "QNAM": "Qualifier Variable Name", "QLABEL": "Qualifier Variable Label", "QVAL": "Data Value",
+    "QORIG": "Origin", "QEVAL": "Evaluator",
+}
+
+
+def normalize_header(header):
+    return re.sub(r'[^A-Z0-9]', '', str(header).upper())
+
+
+def domain_variables(domain):
+    return set(COMMON_VARS) | set(DOMAIN_VARS.get(domain, []))
+
+
+def variable_label(var, domain):
+    var, domain = str(var).upper(), str(domain).upper()
+    label = VARIABLE_LABELS.get(var)
+    if label is None and var.startswith(domain):
+        label = VARIABLE_LABELS.get("--" + var[len(domain):])
+    return label or ""
+
+
+def _synonym(key, domain):
+    var = SYNONYMS.get(key)
+    if not var: return None
+    var = var.replace("--", domain)
+    return var if var in domain_variables(domain) else None
+
+
+def validate_mapping(suggested, headers, domain, taken=()):
+    """
+    Keeps suggested {raw: variable} pairs only for known headers mapped to a valid,
+    not yet used variable of the domain. Returns (accepted, leftover headers).
+    """
+    valid, used = domain_variables(domain), set(taken)
+    accepted, leftovers = {}, []
+    for h in headers:
+        var = str(suggested.get(h) or "").strip().upper()
+        if var in valid and var not in used:
+            accepted[h] = var
+            used.add(var)
+        else:
+            leftovers.append(h)
+    return accepted, leftovers
+
+
+class MappingStore:
+    """
+    Persistent SDTM header mappings.
+    Approved mappings are kept per layout (domain + header set) and per header,
+    so a repeated EDC export is mapped locally and new layouts reuse what
+    was learned header by header.
+    """
+
+    def __init__(self, path=MAPPING_FILE):
+        self.path = path
+        self._store = None
+
+    @staticmethod
+    def layout_key(headers, domain):
+        raw = f"{domain}::" + "|".join(sorted(str(h) for h in headers))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    def _load(self):
+        if self._store is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._store = json.load(f)
+            except (OSError, ValueError):
+                self._store = {}
+            self._store.setdefault("layouts", {})
+            self._store.setdefault("headers", {})
+        return self._store
+
+    def resolve(self, headers, domain):
+        """
+        Local mapping for headers: approved layout, then exact variable name,
+        approved header, synonym. Returns ({raw: variable}, [unresolved headers]).
+        """
+        store = self._load()
+        layout = store["layouts"].get(self.layout_key(headers, domain))
+        if layout is not None:
+            return dict(layout), []  # the whole layout was decided already
+
+        valid, learned = domain_variables(domain), store["headers"].get(domain, {})
+        mapping, used, unknown = {}, set(), []
+        for h in headers:
+            key = normalize_header(h)
+            var = key if key in valid else learned.get(key) or _synonym(key, domain)
+            if var and var not in used:
+                if var != h: mapping[h] = var
+                used.add(var)
+            else:
+                unknown.append(h)  # no local match, or its variable is already taken
+        return mapping, unknown
+
+    def approve(self, headers, domain, mapping, complete=True):
+        """
+        Stores a user-approved mapping for each of its headers, and for the whole
+        layout when complete (the user reviewed every header of the layout).
+        """
+        store = self._load()
+        if complete:
+            store["layouts"][self.layout_key(headers, domain)] = {str(k): str(v) for k, v in mapping.items()}
+        learned = store["headers"].setdefault(domain, {})
+        for raw, var in mapping.items():
+            if str(var) in domain_variables(domain): learned[normalize_header(raw)] = str(var)
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(store, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # read-only deploys keep the in-memory store
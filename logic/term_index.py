@@ -0,0 +1,46 @@
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+
+GRAM = 3
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class SubjectTermIndex:
+    """
+    Per-subject trigram index over free-text terms (AE terms, MH terms).
+    Answers "does any term of this subject contain this text?" without
+    scanning every term: the needle's trigrams narrow the candidates, and
+    only those are checked with a real substring test.
+    """
+
+    def __init__(self, keys, terms):
+        self.terms = defaultdict(set)
+        self.postings = defaultdict(set)
+        for key, term in set(zip(keys, terms)):
+            self.terms[key].add(term)
+            for g in _grams(term):
+                self.postings[(key, g)].add(term)
+
+    def contains(self, key, needle):
+        if needle in self.terms.get(key, ()): return True
+        if len(needle) < GRAM:
+            return any(needle in t for t in self.terms.get(key, ()))
+        candidates = None
+        # Rarest trigrams first so the intersection shrinks quickly
+        for g in sorted(_grams(needle), key=lambda g: len(self.postings.get((key, g), ()))):
+            posting = self.postings.get((key, g))
+            if not posting: return False
+            candidates = set(posting) if candidates is None else candidates & posting
+            if not candidates: return False
+        return any(needle in t for t in candidates)
+
+    def match(self, keys, needles):
+        """Boolean array: needles[i] is a substring of some term of keys[i]. Each pair is looked up once."""
+        pairs = pd.DataFrame({"k": keys, "n": needles})
+        uniq = pairs.drop_duplicates()
+        hits = {(k, n): self.contains(k, n) for k, n in zip(uniq["k"], uniq["n"])}
+        return np.fromiter((hits[p] for p in zip(pairs["k"], pairs["n"])), dtype=bool, count=len(pairs))
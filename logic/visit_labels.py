@@ -0,0 +1,88 @@
+import os
+import re
+import json
+from functools import lru_cache
+import pandas as pd
+
+# Persistence Path (same backend_data layout as the SDTM mapping store)
+VISIT_DIR = os.path.join(os.getcwd(), "backend_data", "visits")
+VISIT_ALIAS_FILE = os.path.join(VISIT_DIR, "visit_aliases.json")
+
+# Generic label shapes -> canonical prefix ("Visit 03" -> V3, "Wk 4" -> WEEK4)
+VISIT_PATTERNS = [
+    (re.compile(r'^(?:V|VIS|VISIT)\s*0*(\d+)$'), "V"),
+    (re.compile(r'^(?:D|DAY)\s*0*(\d+)$'), "DAY"),
+    (re.compile(r'^(?:W|WK|WEEK)\s*0*(\d+)$'), "WEEK"),
+    (re.compile(r'^(?:M|MO|MONTH)\s*0*(\d+)$'), "MONTH"),
+    (re.compile(r'^(?:C|CYCLE)\s*0*(\d+)$'), "CYCLE"),
+]
+NAMED_VISITS = {
+    "SCR": "SCREENING", "SCRN": "SCREENING", "SCREEN": "SCREENING",
+    "BL": "BASELINE", "EOT": "END OF TREATMENT", "EOS": "END OF STUDY",
+    "FU": "FOLLOW UP", "FOLLOW-UP": "FOLLOW UP", "FOLLOWUP": "FOLLOW UP",
+    "UNS": "UNSCHEDULED", "UNSCH": "UNSCHEDULED",
+}
+
+
+class VisitAliasStore:
+    """Study-specific visit schedules, persisted as {study: {canonical label: study visit}}."""
+
+    def __init__(self, path=VISIT_ALIAS_FILE):
+        self.path = path
+        self._store = None
+
+    def _load(self):
+        if self._store is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._store = json.load(f)
+            except (OSError, ValueError):
+                self._store = {}
+        return self._store
+
+    def get(self, study):
+        return self._load().get(str(study), {}) if study is not None else {}
+
+    def set(self, study, aliases):
+        store = self._load()
+        store[str(study)] = aliases
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(store, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # read-only deploys keep the in-memory store
+
+
+ALIAS_STORE = VisitAliasStore()
+
+
+@lru_cache(maxsize=65536)
+def _generic(label):
+    text = re.sub(r'\(.*?\)', ' ', str(label).upper())  # "VISIT 2 (DAY 30)" -> "VISIT 2"
+    text = re.sub(r'[_\s]+', ' ', text).strip()
+    text = re.sub(r'\s+VISIT$', '', text) if text != "VISIT" else text
+    text = NAMED_VISITS.get(text, text)
+    for pattern, prefix in VISIT_PATTERNS:
+        m = pattern.match(text)
+        if m: return f"{prefix}{int(m.group(1))}"
+    return text
+
+
+def register_visit_aliases(study, aliases):
+    """Study-specific schedule, e.g. {"Month 1 Visit": "V3"}; saved for later sessions."""
+    ALIAS_STORE.set(study, {_generic(k): _generic(v) for k, v in aliases.items()})
+
+
+def canonical_visit(label, study=None):
+    key = _generic(label)
+    return ALIAS_STORE.get(study).get(key, key)
+
+
+def canonical_visits(series, study=None):
+    """Canonical key for every label; each distinct label is resolved once per call."""
+    labels = series.astype(str)
+    mapping = {u: canonical_visit(u, study) for u in pd.unique(labels)}
+    return labels.map(mapping)
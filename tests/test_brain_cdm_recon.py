@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from logic import visit_labels
+from logic.brain_cdm import BrainCDM
+from logic.visit_labels import VisitAliasStore, canonical_visits, register_visit_aliases
+
+class TestBrainCdmRecon(unittest.TestCase):
+    def setUp(self):
+        self.brain = BrainCDM()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.alias_path = os.path.join(self.tmp.name, "visit_aliases.json")
+        patcher = mock.patch.object(visit_labels, "ALIAS_STORE", VisitAliasStore(self.alias_path))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_sae_checks_keep_row_order(self):
+        edc = pd.DataFrame({"USUBJID": ["001", "002", "003"], "AESER": ["Y", "N", "Y"],
+                            "AEREL": ["RELATED", "NONE", "POSSIBLE"]})
+        ext = pd.DataFrame({"USUBJID": ["001", "002", "003"], "AEREL": ["RELATED", "UNLIKELY", "UNLIKELY"]})
+        out, metrics = self.brain.run_recon(edc, ext, "SAE")
+        self.assertEqual(list(zip(out["Subject"], out["Issue"])), [
+            ("002", "Seriousness Mismatch"), ("002", "Causality Conflict"), ("003", "Causality Conflict")])
+        self.assertEqual(list(out.columns), ["Subject", "Issue", "Detail", "Action"])
+        self.assertEqual(metrics["Issues"], 3)
+
+    def test_key_join_matches_outer_merge(self):
+        edc = pd.DataFrame({"USUBJID": ["b", " A", "c", "a", None, "b"], "AESER": list("YNYNYN"), "AEREL": list("uvwxyz")})
+        ext = pd.DataFrame({"SUBJID": ["A", "B", "b ", "d", None], "AEREL": list("pqrst")})
+        out, _ = self.brain.run_recon(edc, ext, "SAE")
+
+        keyed = [df.assign(KEY=df[c].astype(str).str.strip().str.upper()) for df, c in ((edc, "USUBJID"), (ext, "SUBJID"))]
+        merged = pd.merge(*keyed, on="KEY", how="outer", suffixes=("_EDC", "_EXT"), indicator=True)
+        both = merged[merged["_merge"] == "both"]
+        expected = [(k, "Causality Conflict") for k in both["KEY"]]
+        self.assertEqual([r for r in zip(out["Subject"], out["Issue"]) if r[1] == "Causality Conflict"], expected)
+        self.assertEqual(len(expected), 7)  # A: 2 EDC x 1 EXT, B: 2 x 2, missing ID: 1 x 1
+
+    def test_labs_qns_and_date_window(self):
+        edc = pd.DataFrame({"USUBJID": ["001", "002"], "VISITDAT": ["2025-01-01", "01-Jan-2025"]})
+        ext = pd.DataFrame({"USUBJID": ["001", "002"], "LBDAT": ["2025-01-02", "2025-01-10"],
+                            "LBORRES": [10, None], "LBCOMM": ["OK", "sample QNS"]})
+        out, _ = self.brain.run_recon(edc, ext, "Labs")
+        self.assertEqual(out["Detail"].tolist(), ["Lab Rejected: sample QNS", "Lab drawn 9 days from visit."])
+
+    def test_death_and_coding(self):
+        ae = pd.DataFrame({"USUBJID": ["001", "002"], "AEOUT": ["FATAL", "RECOVERED"]})
+        ds = pd.DataFrame({"USUBJID": ["001", "002"], "DSDECOD": ["COMPLETED", "DEATH"]})
+        out, _ = self.brain.run_recon(ae, ds, "Death")
+        self.assertEqual(out["Issue"].tolist(), ["Zombie Record", "Ghost Record"])
+
+        coding = pd.DataFrame({"USUBJID": ["1", "2", "3"], "AETERM": ["HEADACHE"] * 3, "AELLT": ["10019211", "10019211", "10019233"]})
+        out, _ = self.brain.run_recon(coding, coding, "Coding")
+        self.assertEqual(out["Detail"].tolist(), ["'HEADACHE' coded as ['10019211', '10019233']"])
+
+    def test_conmed_indications_matched_per_subject(self):
+        ae = pd.DataFrame({"USUBJID": ["001", "001", "002"], "AETERM": ["Tension Headache", "RASH", "NAUSEA"]})
+        cm = pd.DataFrame({"USUBJID": ["001", "001", "001", "002", "003"],
+                           "CMINDC": ["headache", "Nausea", "Prophylaxis", "NAUSEA", "PAIN"]})
+        out, _ = self.brain.run_recon(ae, cm, "AE_ConMed")
+        self.assertEqual(list(zip(out["Subject"], out["Detail"])), [
+            ("001", "Indication 'NAUSEA' has no matching AE."), ("003", "Indication 'PAIN' has no matching AE.")])
+
+        mh = pd.DataFrame({"USUBJID": ["001"], "MHTERM": ["TYPE 2 DIABETES"]})
+        cm = pd.DataFrame({"USUBJID": ["001", "001"], "CMINDC": ["DIABETES", "GOUT"]})
+        out, _ = self.brain.run_recon(cm, mh, "MH_ConMed")
+        self.assertEqual(out["Detail"].tolist(), ["Med for 'GOUT' exists, but not in Medical History."])
+
+    def test_pd_recon_joins_on_canonical_visit(self):
+        register_visit_aliases("STUDY-A", {"Month 1 Visit": "V3"})
+        pd_log = pd.DataFrame({"STUDYID": "STUDY-A", "USUBJID": ["001", "002"], "DVCAT": ["MISSED VISIT", "WINDOW"],
+                               "VISIT": ["Visit 3", "Month 1"]})
+        edc = pd.DataFrame({"USUBJID": ["001", "002", "002"], "FOLDER": ["V03", "V3", "VISIT 30"],
+                            "VISITDAT": ["2025-02-01", "2025-02-03", "2025-09-01"], "WINDOW": ["IN", "OUT", "OUT"]})
+        out, _ = self.brain.run_recon(pd_log, edc, "PD_Recon")
+        self.assertEqual(list(zip(out["Subject"], out["Issue"])), [("001", "Zombie Visit"), ("002", "Unreported Deviation")])
+        self.assertEqual(out["Detail"].iloc[1], "Visit 'VISIT 30' OOW in EDC, missing in PD Log.")
+
+        # The schedule is saved per study and read back by a fresh store (next session)
+        with mock.patch.object(visit_labels, "ALIAS_STORE", VisitAliasStore(self.alias_path)):
+            self.assertEqual(canonical_visits(pd.Series(["Month 1 Visit"]), "STUDY-A").tolist(), ["V3"])
+            self.assertEqual(canonical_visits(pd.Series(["Month 1 Visit"]), "STUDY-B").tolist(), ["MONTH1"])
+
+    def test_visit_label_canonicalization(self):
+        labels = pd.Series(["V3", "Visit 3", "visit_03", "Wk 4", "Week 04 Visit", "SCR", "Day 1"])
+        self.assertEqual(canonical_visits(labels).tolist(), ["V3", "V3", "V3", "WEEK4", "WEEK4", "SCREENING", "DAY1"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
 import pandas as pd
 from logic.data_cleaner import DataCleaner
-from logic.reconciler import Reconciler
+from logic.reconciler import Reconciler, HeaderMapCache
 
 class TestCoreSuite(unittest.TestCase):
     def setUp(self):
@@ -34,6 +37,25 @@ class TestCoreSuite(unittest.TestCase):
         
         # Check if column count remains same
         self.assertEqual(len(norm_df.columns), 2)
+        # No cache path configured: nothing is written into the working tree
+        self.assertIsNone(self.reconciler.header_cache.path)
+
+    def test_header_map_cached_per_layout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            reconciler = Reconciler(HeaderMapCache(os.path.join(tmp, "maps.json")))
+            df = pd.DataFrame(columns=["Subject", "Visit Name", "LBORRES", "Site"])
+            self.assertEqual(list(reconciler.normalize_headers(df).columns), ["USUBJID", "VISIT", "LBORRES", "Site"])
+
+            # Same layout in a fresh process: renamed from the stored map, no matching at all
+            again = Reconciler(HeaderMapCache(os.path.join(tmp, "maps.json")))
+            with patch.object(again, "match_header", side_effect=AssertionError("matched again")):
+                self.assertEqual(list(again.normalize_headers(df).columns), ["USUBJID", "VISIT", "LBORRES", "Site"])
+
+    def test_header_map_key_tracks_aliases(self):
+        key = HeaderMapCache.column_signature(["Subject", "Result"])
+        with patch.dict("logic.reconciler.HEADER_ALIASES", {"RESULTVALUE": "LBORRES"}):
+            self.assertNotEqual(HeaderMapCache.column_signature(["Subject", "Result"]), key)
+        self.assertEqual(HeaderMapCache.column_signature(["Subject", "Result"]), key)
 
 if __name__ == '__main__':
     unittest.main()
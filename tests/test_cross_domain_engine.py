@@ -0,0 +1,48 @@
+import unittest
+import pandas as pd
+from logic.cross_domain_engine import CrossDomainEngine, parse_cross_rules
+
+class TestCrossDomainEngine(unittest.TestCase):
+    def setUp(self):
+        self.domains = {
+            "DM": pd.DataFrame({"USUBJID": ["001", "002", "003"],
+                                "RFICDTC": ["2024-01-10", "2024-02-01", "2024-03-01"]}),
+            "AE": pd.DataFrame({"USUBJID": ["001", "001", "002", "004"],
+                                "AESTDTC": ["2024-01-05", "2024-01-20", "2024-02-02", "2024-01-01"]}),
+            "VS": pd.DataFrame({"USUBJID": ["001", "001", "001", "002", "002"],
+                                "VISITNUM": [3, 1, 2, 1, 2],
+                                "VSDTC": ["2024-02-10", "2024-01-10", "2024-02-20", "2024-02-01", "2024-02-15"]}),
+        }
+        self.engine = CrossDomainEngine(self.domains)
+
+    def test_ae_after_consent(self):
+        rules = [{"CheckID": "X1", "Rule_Type": "CROSS", "Left": "AE.AESTDTC", "Op": ">=", "Right": "DM.RFICDTC"}]
+        out = self.engine.run(rules)
+        # 001 AE before consent; 004 has no DM record so it cannot be judged
+        self.assertEqual(out["SubjectID"].tolist(), ["001"])
+        self.assertEqual(out["Row"].tolist(), [0])
+
+    def test_partial_date_not_evaluable(self):
+        # 2024-01 may well be on/after 2024-01-10: neither a pass nor a fail
+        self.domains["AE"].loc[0, "AESTDTC"] = "2024-01"
+        engine = CrossDomainEngine(self.domains)
+        rules = [{"CheckID": "X1", "Rule_Type": "CROSS", "Left": "AE.AESTDTC", "Op": ">=", "Right": "DM.RFICDTC"}]
+        self.assertTrue(engine.run(rules).empty)
+
+    def test_visit_dates_increase(self):
+        rules = [{"CheckID": "L1", "Rule_Type": "LAG", "Left": "VS.VSDTC", "Op": ">", "Order_By": "VISITNUM"}]
+        out = self.engine.run(rules)
+        # Subject 001: visit 3 (Feb 10) is before visit 2 (Feb 20)
+        self.assertEqual(out["SubjectID"].tolist(), ["001"])
+        self.assertEqual(out["Row"].tolist(), [0])
+
+    def test_bad_rule_is_reported(self):
+        out = self.engine.run([{"CheckID": "B1", "Left": "AE.AESTDTC", "Op": ">=", "Right": "XX.NOPE"}])
+        self.assertEqual(out["Status"].tolist(), ["Execution Error"])
+
+    def test_parse_spec(self):
+        spec = pd.DataFrame({"CheckID": ["A", "B"], "Rule_Type": ["ROW", "lag"], "Left": [None, "VS.VSDTC"]})
+        self.assertEqual([r["CheckID"] for r in parse_cross_rules(spec)], ["B"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import pandas as pd
+from logic.ctcae_grading import grade_labs, shift_table
+
+class TestCtcaeGrading(unittest.TestCase):
+    def setUp(self):
+        self.lb = pd.DataFrame({
+            "USUBJID": ["A", "A", "A", "A", "B", "B", "B", "B"],
+            "LBTESTCD": ["ALT", "ALT", "HGB", "HGB", "ALT", "alt ", "K", "XYZ"],
+            "LBSTRESN": [30, 250, 130, 75, 80, 200, 2.4, 5],
+            "LBSTRESU": ["U/L", "U/L", "g/L", "g/L", "U/L", "U/L", "mmol/L", None],
+            "LBSTNRLO": [0, 0, 120, 120, 0, 0, 3.5, 0], "LBSTNRHI": [40, 40, 160, 160, 40, 40, 5.1, 1],
+            "VISITNUM": [2, 1, 1, 2, 1, 2, 2, 1]})
+
+    def test_grades(self):
+        g = grade_labs(self.lb)
+        # ALT 6.25x ULN -> 3; HGB 75 g/L = 7.5 g/dL -> 3; B's ALT vs abnormal baseline 80: 2.5x -> 1; K 2.4 -> 4
+        self.assertEqual(g["LBTOXGR"].tolist()[:7], [0, 3, 0, 3, 1, 1, 4])
+        self.assertTrue(pd.isna(g["LBTOXGR"].iloc[7]))
+        self.assertEqual(g["LBTOX"].iloc[3], "Anemia")
+        self.assertEqual(g["LBTOX"].iloc[6], "Hypokalemia")
+        self.assertEqual(g["LBBLFL"].tolist(), ["", "Y", "Y", "", "Y", "", "Y", "Y"])
+
+    def test_unconvertible_unit_is_not_graded(self):
+        lb = pd.DataFrame({"USUBJID": "A", "LBTESTCD": "PLAT", "LBSTRESN": [20, 20], "LBSTRESU": ["GI/L", "10^9/L"],
+                           "LBSTNRLO": 150, "LBSTNRHI": 400})
+        g = grade_labs(lb)
+        self.assertTrue(pd.isna(g["LBTOXGR"].iloc[0]))   # not grade 1 from the LLN cut-off alone
+        self.assertEqual(g["LBTOXGR"].iloc[1], 4)
+
+    def test_shift_table(self):
+        shift = shift_table(grade_labs(self.lb))
+        self.assertEqual(shift.loc[("ALT", 3), 0], 1)   # A: baseline grade 3, worst post-baseline 0
+        self.assertEqual(shift.loc[("HGB", 0), 3], 1)
+
+    def test_feeds_toxicity_check(self):
+        from logic.oncology_engine import OncologyEngine
+        ex = pd.DataFrame({"USUBJID": ["B"], "DoseReduced": ["Yes"]})
+        out = OncologyEngine().check_toxicity_vs_dose(self.lb, ex)
+        self.assertEqual(out[["Subject", "Toxicity", "Grade"]].values.tolist(),
+                         [["A", "Alanine aminotransferase increased", 3], ["A", "Anemia", 3]])
+
+if __name__ == '__main__':
+    unittest.main()
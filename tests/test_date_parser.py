@@ -0,0 +1,57 @@
+import gc
+import unittest
+import pandas as pd
+from logic import date_parser
+from logic.date_parser import parse_dates, parsed_column, normalize_date, iso8601_mask, infer_format
+
+class TestDateParser(unittest.TestCase):
+    def test_mixed_clinical_formats(self):
+        s = pd.Series(["2024-03-15", "2024-03", "2024", "UNK-JAN-2024", "15-Feb-2024",
+                       "UNK-UNK-2023", None, "garbage", "2024-03-15T10:30"])
+        out = parse_dates(s, impute=True).dt.strftime("%Y-%m-%d").tolist()
+        self.assertEqual(out[:6], ["2024-03-15", "2024-03-01", "2024-01-01", "2024-01-01", "2024-02-15", "2023-01-01"])
+        self.assertTrue(pd.isna(out[6]) and pd.isna(out[7]))
+        self.assertEqual(out[8], "2024-03-15")
+
+    def test_partial_dates_not_imputed_by_default(self):
+        s = pd.Series(["2024-03-15", "2024-03", "2024", "UNK-JAN-2024", "JAN-2024", "15-Feb-2024"])
+        out = parse_dates(s)
+        self.assertEqual(out.isna().tolist(), [False, True, True, True, True, False])
+        self.assertEqual([normalize_date(v) is None for v in s], out.isna().tolist())
+        self.assertEqual(str(normalize_date("2024-03", impute=True)), "2024-03-01")
+
+    def test_format_inferred_per_column(self):
+        # 25/03 only fits day-first, so the whole column is read day-first
+        self.assertEqual(infer_format(pd.Series(["25/03/2024", "01/02/2024"])), "%d/%m/%Y")
+        self.assertEqual(infer_format(pd.Series(["03/25/2024", "01/02/2024"])), "%m/%d/%Y")
+        self.assertEqual(parse_dates(pd.Series(["03/25/2024", "01/02/2024"])).iloc[1], pd.Timestamp("2024-01-02"))
+
+    def test_scalar_helper(self):
+        self.assertEqual(str(normalize_date("15-Feb-2024")), "2024-02-15")
+        self.assertIsNone(normalize_date(""))
+        self.assertIsNone(normalize_date(float("nan")))
+        # Same results as the column parser
+        values = ["2024-03-15", "2024-03", "2024", "UNK-JAN-2024", "15-Feb-2024", "UNK-UNK-2023", "garbage", "2024-03-15T10:30", "20240102"]
+        for impute in (False, True):
+            expected = [None if pd.isna(d) else d.date() for d in parse_dates(pd.Series(values), impute=impute)]
+            self.assertEqual([normalize_date(v, impute) for v in values], expected)
+
+    def test_iso_mask(self):
+        s = pd.Series(["2024-03-15", "2024-03", "2024-13-01", "01/02/2024", "2024-03-15T10:30:00"])
+        self.assertEqual(iso8601_mask(s).tolist(), [True, True, False, False, True])
+
+    def test_memo_per_frame(self):
+        df = pd.DataFrame({"AESTDTC": ["2024-01-01", "2024-02-01"]})
+        first = parsed_column(df, "AESTDTC")
+        self.assertIs(parsed_column(df, "AESTDTC"), first)
+
+        df.loc[1, "AESTDTC"] = "2024-05-01" # in-place edit invalidates
+        self.assertEqual(parsed_column(df, "AESTDTC").iloc[1], pd.Timestamp("2024-05-01"))
+
+        frame_id = id(df)
+        del df
+        gc.collect()
+        self.assertFalse(any(k[0] == frame_id for k in date_parser._MEMO))
+
+if __name__ == '__main__':
+    unittest.main()
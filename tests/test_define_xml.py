@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from logic.define_xml import DefineStatsCache, build_define_xml, column_stats, define_metadata, ODM_NS, DEF_NS
+
+class TestDefineXml(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "define_stats.json")
+        self.lb = pd.DataFrame({"STUDYID": ["ST1"] * 3, "DOMAIN": ["LB"] * 3, "USUBJID": ["S1", "S1", "S2"], "LBSEQ": [1, 2, 1],
+                                "LBTESTCD": ["ALT", "GLUC", "ALT"], "LBSTRESN": [12.5, 5.25, np.nan],
+                                "LBNRIND": ["HIGH", "normal", "BORDERLINE"], "LBDTC": ["2024-01-02", "2024-01-03", None]})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_column_stats(self):
+        self.assertEqual(column_stats(self.lb["LBSTRESN"], "LBSTRESN", "LB")["DataType"], "float")
+        self.assertEqual(column_stats(self.lb["LBSTRESN"], "LBSTRESN", "LB")["SignificantDigits"], 2)
+        self.assertEqual(column_stats(self.lb["LBSEQ"], "LBSEQ", "LB")["DataType"], "integer")
+        self.assertEqual(column_stats(self.lb["LBDTC"], "LBDTC", "LB")["DataType"], "date")
+        nrind = column_stats(self.lb["LBNRIND"], "LBNRIND", "LB")
+        self.assertEqual((nrind["CodeList"], nrind["Values"], nrind["Length"]), ("NRIND", ["BORDERLINE", "HIGH", "NORMAL"], 10))
+
+    def test_document(self):
+        root = ET.fromstring(build_define_xml({"LB": self.lb}, "ST1", cache=DefineStatsCache(self.cache_path)))
+        ns = {"odm": ODM_NS, "def": DEF_NS}
+        refs = root.findall(".//odm:ItemGroupDef[@Name='LB']/odm:ItemRef", ns)
+        self.assertEqual(len(refs), 8)
+        self.assertEqual(refs[2].get("Mandatory"), "Yes")
+        seq = root.find(".//odm:ItemDef[@Name='LBSEQ']", ns)
+        self.assertEqual(seq.find("def:Origin", ns).get("Type"), "Derived")
+        items = root.findall(".//odm:CodeList[@OID='CL.NRIND']/odm:EnumeratedItem", ns)
+        self.assertEqual([(i.get("CodedValue"), i.get(f"{{{DEF_NS}}}ExtendedValue")) for i in items],
+                         [("HIGH", None), ("NORMAL", None), ("BORDERLINE", "Yes")])
+
+    def test_cache_rescans_changed_columns_only(self):
+        define_metadata({"LB": self.lb}, cache=DefineStatsCache(self.cache_path))
+        edited = self.lb.copy()
+        edited.loc[0, "LBTESTCD"] = "BILIRUBIN"
+        with mock.patch("logic.define_xml.column_stats", wraps=column_stats) as scan:
+            meta = define_metadata({"LB": edited}, cache=DefineStatsCache(self.cache_path))
+        self.assertEqual([c.args[1] for c in scan.call_args_list], ["LBTESTCD"])
+        self.assertEqual(meta[0]["variables"][4]["Length"], 9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from logic.delta_engine import ChunkedDelta, DeltaStore, run_incremental
+
+def negative_values(df):
+    bad = df[df["VSORRES"] < 0]
+    return pd.DataFrame({"Row": bad.index, "USUBJID": bad["USUBJID"].values, "Issue": "Negative Value"})
+
+class TestDeltaEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = DeltaStore("vs", sig="v1", base_dir=self.tmp.name)
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _check(self, df):
+        self.calls.append(len(df))
+        return negative_values(df)
+
+    def test_only_changed_rows_are_rechecked(self):
+        night1 = pd.DataFrame({"USUBJID": ["001", "002", "003", "004"], "VSORRES": [120, -5, 80, 90]})
+        issues, stats = run_incremental(night1, self._check, self.store)
+        self.assertEqual(stats["Added"], 4)
+        self.assertEqual(issues["USUBJID"].tolist(), ["002"])
+
+        # 003 modified, 004 removed, 005 added, rows reordered
+        night2 = pd.DataFrame({"USUBJID": ["005", "001", "002", "003"], "VSORRES": [-1, 120, -5, -3]})
+        issues, stats = run_incremental(night2, self._check, self.store)
+        self.assertEqual(self.calls[-1], 2)
+        self.assertEqual((stats["Added"], stats["Modified"], stats["Removed"], stats["Unchanged"]), (1, 1, 1, 2))
+        self.assertEqual(sorted(issues["USUBJID"].tolist()), ["002", "003", "005"])
+        # Carried finding is re-pointed at today's row label
+        self.assertEqual(issues.loc[issues["USUBJID"] == "002", "Row"].tolist(), [2])
+
+    def test_changed_check_set_forces_full_run(self):
+        df = pd.DataFrame({"USUBJID": ["001", "002"], "VSORRES": [1, -1]})
+        run_incremental(df, self._check, self.store)
+        _, stats = run_incremental(df, self._check, DeltaStore("vs", sig="v2", base_dir=self.tmp.name))
+        self.assertEqual(stats["Rechecked"], 2)
+
+    def test_chunks_share_one_snapshot(self):
+        def run(df, size=2):
+            delta = ChunkedDelta(self._check, self.store, ["USUBJID"])
+            parts = [delta.check(df.iloc[i:i + size]) for i in range(0, len(df), size)]
+            return pd.concat(parts, ignore_index=True), delta.finish()
+
+        night1 = pd.DataFrame({"USUBJID": ["001", "002", "003", "004", "004"], "VSORRES": [1, -1, 3, -4, 5]})
+        run(night1)
+        # One row inserted at the top shifts every later row into the next chunk
+        night2 = pd.concat([pd.DataFrame({"USUBJID": ["000"], "VSORRES": [7]}), night1], ignore_index=True)
+        issues, stats = run(night2)
+        self.assertEqual((stats["Added"], stats["Modified"], stats["Removed"], stats["Unchanged"]), (1, 0, 0, 5))
+        self.assertEqual(self.calls[-1], 1)
+        self.assertEqual(issues["Row"].tolist(), [2, 4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+import pandas as pd
+from logic.hard_checks import CheckRegistry, ColumnCache, default_registry
+
+class TestHardChecks(unittest.TestCase):
+    def test_default_checks(self):
+        df = pd.DataFrame({
+            "USUBJID": ["001", " ", "003"],
+            "VSORRES": [120, -5, 80],
+            "AESTDTC": ["2023-01-01", "2099-01-01", None]
+        })
+        issues = default_registry().run(df)
+        self.assertEqual(issues["Issue"].tolist(), ["Future Date", "Negative Value", "Missing Key ID"])
+        self.assertEqual(issues["Row"].tolist(), [1, 1, 1])
+        self.assertEqual(issues.iloc[1]["Value"], -5)
+
+    def test_range_check_and_shared_parse(self):
+        df = pd.DataFrame({"VSORRES": [30, 200, 90], "AESTDTC": ["2099-01-01"] * 3})
+        registry = default_registry().add_range_check(["VSORRES"], 40, 180)
+        cache = ColumnCache(df)
+        issues = registry.run(df, cache)
+        self.assertEqual(issues[issues["Issue"] == "Out of Range"]["Row"].tolist(), [0, 1])
+        # Negative + range checks share one numeric parse
+        self.assertEqual(list(cache._numbers), ["VSORRES"])
+
+    def test_unknown_test_rejected(self):
+        with self.assertRaises(ValueError):
+            CheckRegistry().register("X", ["A"], "nope")
+
+    def test_definition_tracks_parameters(self):
+        base = default_registry().definition()
+        self.assertEqual(base, default_registry().definition())
+        self.assertNotEqual(default_registry().add_range_check(["VSORRES"], 40, 180).definition(),
+                            default_registry().add_range_check(["VSORRES"], 40, 200).definition())
+        self.assertIn("Future Date|date_columns|future_date|[]", base)
+
+if __name__ == '__main__':
+    unittest.main()
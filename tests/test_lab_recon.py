@@ -0,0 +1,36 @@
+import unittest
+import pandas as pd
+from logic.lab_recon import pair_results, compare_paired, conversion_factors, unit_pairs, merge_issues
+
+class TestLabRecon(unittest.TestCase):
+    def setUp(self):
+        keys = {"USUBJID": ["1", "1", "2", "3"], "VISIT": "V1", "LBTEST": ["GLUCOSE", "CREATININE", "ALT", "FOO"]}
+        self.clin = pd.DataFrame({**keys, "LBORRES": [90, 1.0, "<5", 10], "LBORRESU": ["mg/dL", "MG/DL", "U/L", "x"]})
+        self.vend = pd.DataFrame({**keys, "LBORRES": [5.0, 95, "<5", 20], "LBORRESU": ["mmol/L", "umol/L", "mg/L", "y"]})
+
+    def test_units_converted_before_tolerance(self):
+        values, units, unresolved = compare_paired(pair_results(self.clin, self.vend))
+        # 90 mg/dL glucose = 4.995 mmol/L (within tolerance); 1.0 mg/dL creatinine = 88.42 umol/L (not)
+        self.assertEqual(values["Test"].tolist(), ["CREATININE"])
+        self.assertAlmostEqual(values["Diff"].iloc[0], 6.58, places=2)
+        self.assertEqual(units["Issue"].tolist(), ["Unit Mismatch: U/L vs mg/L"])
+        self.assertEqual(unit_pairs(unresolved), [("FOO", "x", "y")])
+        self.assertEqual(merge_issues(values, units)["Test"].tolist(), ["CREATININE", "ALT"])
+
+    def test_blank_unit_takes_the_other_side(self):
+        clin = self.clin.assign(LBORRESU=[None, "", "U/L", "x"], LBORRES=[5.0, 88.0, "<5", 10])
+        values, units, unresolved = compare_paired(pair_results(clin, self.vend))
+        # Blank units compare as mmol/L / umol/L: glucose matches, creatinine 88 vs 95 differs, nothing for the LLM
+        self.assertEqual(values["Test"].tolist(), ["CREATININE"])
+        self.assertEqual(units["Issue"].tolist(), ["Unit Mismatch: U/L vs mg/L"])
+        self.assertEqual(unit_pairs(unresolved), [("FOO", "x", "y")])
+
+    def test_per_test_tolerance_and_inverse_factors(self):
+        values, _, _ = compare_paired(pair_results(self.clin, self.vend), tolerances={"CREATININE": {"abs": 0.0, "rel": 0.1}})
+        self.assertTrue(values.empty)
+        tests, src, dst = pd.Series(["GLUCOSE", "HB"]), pd.Series(["mmol/L", "g/L"]), pd.Series(["mg/dL", "g/dL"])
+        self.assertAlmostEqual(conversion_factors(tests, src, dst)[0], 1 / 0.0555)
+        self.assertAlmostEqual(conversion_factors(tests, src, dst)[1], 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
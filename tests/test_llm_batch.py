@@ -0,0 +1,34 @@
+import unittest
+from logic.llm_batch import RateLimiter, chunked, run_bounded
+
+class ResourceExhausted(Exception):
+    pass
+
+class TestLlmBatch(unittest.TestCase):
+    def test_chunked(self):
+        self.assertEqual(chunked([1, 2, 3, 4, 5], 2), [[1, 2], [3, 4], [5]])
+
+    def test_failures_do_not_stall_other_items(self):
+        def work(x):
+            if x == 3: raise ValueError("bad rule")
+            return x * 10
+
+        results, failures = run_bounded(work, [1, 2, 3, 4], max_workers=2)
+        self.assertEqual(results, {0: 10, 1: 20, 3: 40})
+        self.assertIsInstance(failures[2], ValueError)
+
+    def test_rate_limit_errors_are_retried(self):
+        calls = []
+        def flaky(x):
+            calls.append(x)
+            if len(calls) == 1: raise ResourceExhausted("429 quota")
+            return x
+
+        limiter = RateLimiter(requests_per_minute=0, backoff=0.01)
+        results, failures = run_bounded(flaky, ["a"], limiter=limiter)
+        self.assertEqual(results, {0: "a"})
+        self.assertEqual(failures, {})
+        self.assertEqual(len(calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+import pandas as pd
+from logic.oncology_engine import OncologyEngine
+
+class TestOncologyEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = OncologyEngine()
+        self.lb = pd.DataFrame({"USUBJID": ["A", "A", "B", "C", "C"], "LBTEST": ["ALT", "HGB", "ALT", "PLT", "PLT"],
+                                "CTCAE_Grade": [3, 2, 4, "3", 3], "LBDTC": ["2024-01-01", "2024-01-01", "2024-02-01", "2024-03-01", None]})
+        self.ex = pd.DataFrame({"USUBJID": ["A", "C", "C"], "DoseReduced": ["Yes", "Yes", "No"],
+                                "EXSTDTC": ["2024-01-05", "2024-04-20", "2024-03-02"]})
+
+    def test_toxicity_any_reduction(self):
+        out = self.engine.check_toxicity_vs_dose(self.lb, self.ex)
+        self.assertEqual(out[["Subject", "Toxicity", "Grade"]].values.tolist(), [["B", "ALT", 4]])
+
+    def test_toxicity_reduction_window(self):
+        out = self.engine.check_toxicity_vs_dose(self.lb, self.ex, window_days=14)
+        # C's reduction is 50 days after the dated PLT toxicity; the undated one falls back to "any reduction"
+        self.assertEqual(out["Subject"].tolist(), ["B", "C"])
+        self.assertTrue(out["Issue"].str.contains("within 14 days").all())
+
+    def test_window_without_reductions(self):
+        ex = self.ex.assign(DoseReduced="No")
+        out = self.engine.check_toxicity_vs_dose(self.lb, ex, window_days=14)
+        self.assertEqual(sorted(out["Subject"]), ["A", "B", "C", "C"])
+        ex_num = pd.DataFrame({"USUBJID": [1], "DoseReduced": ["Yes"], "EXSTDTC": ["2024-01-03"]})
+        lb_num = self.lb.assign(USUBJID=[1, 1, 2, 3, 3])
+        out = self.engine.check_toxicity_vs_dose(lb_num, ex_num, window_days=14)
+        self.assertEqual(sorted(out["Subject"]), [2, 3, 3])
+
+    def test_survival_status(self):
+        out = self.engine.check_survival_status(pd.DataFrame({"USUBJID": ["A", "B"], "LastContactDate": ["2020-01-01", "2099-01-01"]}))
+        self.assertEqual(out["Subject"].tolist(), ["A"])
+        self.assertGreater(out["Days Since"].iloc[0], 90)
+
+if __name__ == '__main__':
+    unittest.main()
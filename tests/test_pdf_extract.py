@@ -0,0 +1,52 @@
+import io
+import tempfile
+import unittest
+from unittest import mock
+from logic import pdf_extract
+from logic.pdf_extract import PdfCache, PdfDocument, extract_pages
+
+def fake_range(data, start, stop, tables):
+    return [{"page": i + 1, "text": f"page {i + 1}" if i % 2 == 0 else "",
+             "tables": [[["A", "B"], [str(i), "x"]]] if tables else None} for i in range(start, stop)]
+
+class TestPdfExtract(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = PdfCache(self.tmp.name)
+        patches = [mock.patch.object(pdf_extract, "pdfplumber", object()),
+                   mock.patch.object(pdf_extract, "_page_count", return_value=40),
+                   mock.patch.object(pdf_extract, "_extract_range", side_effect=fake_range)]
+        self.mocks = [p.start() for p in patches]
+        for p in patches: self.addCleanup(p.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_pages_split_and_cached(self):
+        pages = extract_pages(io.BytesIO(b"%PDF-1"), cache=self.cache, workers=1)
+        self.assertEqual([p["page"] for p in pages], list(range(1, 41)))
+        self.assertEqual(self.mocks[2].call_count, 3)  # 16-page ranges
+        again = extract_pages(io.BytesIO(b"%PDF-1"), cache=self.cache, workers=1)
+        self.assertEqual(again, pages)
+        self.assertEqual(self.mocks[2].call_count, 3)  # same SHA-256 -> no second parse
+
+    def test_tables_and_page_limit(self):
+        first = extract_pages(io.BytesIO(b"%PDF-2"), max_pages=10, cache=self.cache, workers=1)
+        self.assertEqual(len(first), 10)
+        self.assertIsNone(first[0]["tables"])
+        with_tables = extract_pages(io.BytesIO(b"%PDF-2"), tables=True, max_pages=10, cache=self.cache, workers=1)
+        self.assertEqual(with_tables[3]["tables"], [[["A", "B"], ["3", "x"]]])
+        text_only = extract_pages(io.BytesIO(b"%PDF-2"), max_pages=5, cache=self.cache, workers=1)
+        self.assertEqual(text_only[3]["tables"], [[["A", "B"], ["3", "x"]]])  # served from cache
+        self.assertEqual(len(extract_pages(io.BytesIO(b"%PDF-2"), cache=self.cache, workers=1)), 40)
+
+    def test_lazy_document(self):
+        doc = PdfDocument(io.BytesIO(b"%PDF-3"), cache=self.cache, workers=1)
+        text = doc.text(max_chars=20, page_format="[{page}]{text}")
+        self.assertEqual(text, "[1]page 1[3]page 3[5")
+        self.assertEqual(self.mocks[2].call_args_list, [mock.call(b"%PDF-3", 0, 16, False)])  # first batch only
+        self.assertEqual(len(list(doc.tables(limit=2))), 2)
+        self.assertEqual(self.mocks[2].call_args_list[-1], mock.call(b"%PDF-3", 0, 16, True))
+        self.assertTrue(doc.text().endswith("page 39\n"))
+        self.assertEqual(len(PdfCache(self.tmp.name).load(doc.digest)["pages"]), 40)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from logic.protocol_chunks import ChunkResultCache, chunk_protocol, merge_partials, split_sections
+
+PROTOCOL = """Protocol ABC-123: A Phase 2 Study
+Sponsor: Acme Bio
+
+TABLE OF CONTENTS
+1 Introduction ........ 5
+2 Study Population .... 9
+
+1 INTRODUCTION
+Background text.
+
+2 STUDY POPULATION
+2.1 Inclusion Criteria
+1. Signed informed consent
+2. Aged 18 years or older
+3. Pregnant or breastfeeding women are excluded
+
+3 SCHEDULE OF ACTIVITIES
+Screening Day -28, Baseline Day 1, Week 4 Day 29.
+
+APPENDIX 1 LABORATORY TESTS
+Hematology and chemistry.
+"""
+
+class TestProtocolChunks(unittest.TestCase):
+    def test_sections(self):
+        tops = [head for head, level, _ in split_sections(PROTOCOL) if level == 1]
+        self.assertEqual(tops, ["", "1 INTRODUCTION", "2 STUDY POPULATION", "3 SCHEDULE OF ACTIVITIES", "APPENDIX 1 LABORATORY TESTS"])
+
+    def test_sentence_case_and_resync(self):
+        text = ("1 INTRODUCTION\nText.\n2 Study objectives and endpoints\n1. Primary objective is ORR\n"
+                "2. Secondary objective is PFS\n3. Exploratory biomarkers are collected\n"
+                "3 Study design\nText.\n4 Study population\n1. Signed consent\n2. Adults only\n"
+                "3. Measurable disease per RECIST\n4. Adequate organ function\n5. No prior therapy\n"
+                "5 Treatments\nText.\n8 Safety Reporting\nText.\n")
+        tops = [head for head, level, _ in split_sections(text) if level == 1]
+        self.assertEqual(tops, ["1 INTRODUCTION", "2 Study objectives and endpoints", "3 Study design",
+                                "4 Study population", "5 Treatments", "8 Safety Reporting"])
+
+    def test_chunks_cover_text_and_stay_stable(self):
+        chunks = chunk_protocol(PROTOCOL, max_chars=120)
+        self.assertEqual("".join(c["text"] for c in chunks), PROTOCOL)
+        self.assertTrue(all(len(c["text"]) <= 120 for c in chunks))
+        self.assertIn("2 STUDY POPULATION", [c["section"] for c in chunks])
+
+        amended = PROTOCOL.replace("Background text.", "Background text, amended with a much longer rationale paragraph.")
+        before = {c["text"] for c in chunks}
+        changed = [c for c in chunk_protocol(amended, max_chars=120) if c["text"] not in before]
+        self.assertEqual([c["section"] for c in changed], ["1 INTRODUCTION"])
+
+    def test_long_section_split(self):
+        text = "1 INTRODUCTION\n" + "\n\n".join("word " * 30 for _ in range(5))
+        chunks = chunk_protocol(text, max_chars=200)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(c["text"] for c in chunks), text)
+        self.assertEqual({c["section"] for c in chunks}, {"1 INTRODUCTION"})
+
+    def test_merge(self):
+        merged = merge_partials([
+            {"metadata": {"protocol_title": "ABC", "phase": None}, "arms": [{"name": "Arm A", "description": None}],
+             "visit_schedule": [{"visit_label": "Week 4", "week": 4, "day": None}],
+             "cohorts": [{"name": "Inclusion Criteria", "criteria": ["Age >= 18"]}],
+             "endpoints": {"primary": None, "secondary": ["PFS"]}},
+            {"metadata": {"protocol_title": "Other", "phase": "2"}, "arms": [{"name": "arm  a", "description": "Drug X"}],
+             "visit_schedule": [{"visit_label": "Screening", "week": -4, "day": -28}, {"visit_label": "WEEK 4", "day": 29}],
+             "cohorts": [{"name": "inclusion criteria", "criteria": ["age >= 18", "Consent"]}],
+             "endpoints": {"primary": "ORR", "secondary": "pfs"}},
+        ])
+        self.assertEqual(merged["metadata"], {"protocol_title": "ABC", "phase": "2"})
+        self.assertEqual(merged["arms"], [{"name": "Arm A", "description": "Drug X"}])
+        self.assertEqual([(v["visit_label"], v["day"]) for v in merged["visit_schedule"]], [("Screening", -28), ("Week 4", 29)])
+        self.assertEqual(merged["cohorts"], [{"name": "Inclusion Criteria", "criteria": ["Age >= 18", "Consent"]}])
+        self.assertEqual(merged["endpoints"], {"primary": "ORR", "secondary": ["PFS"]})
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chunks.json")
+            key = ChunkResultCache.chunk_key("section text", "1")
+            self.assertNotEqual(key, ChunkResultCache.chunk_key("section text", "2"))
+            ChunkResultCache(path).put_many({key: {"arms": []}})
+            self.assertEqual(ChunkResultCache(path).get(key), {"arms": []})
+
+if __name__ == '__main__':
+    unittest.main()
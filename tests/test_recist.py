@@ -1,5 +1,6 @@
 import unittest
-from logic.recist_engine import RecistCalculator
+import pandas as pd
+from logic.recist_engine import RecistCalculator, score_recist, target_responses
 
 class TestRecist(unittest.TestCase):
     def setUp(self):
@@ -39,5 +40,51 @@ class TestRecist(unittest.TestCase):
         ovr2 = self.calc.determine_overall_response("CR", "CR", True)
         self.assertEqual(ovr2, "PD")
 
+    def test_target_rules_shared_with_workflows(self):
+        # (Base, Nadir, Curr) scenarios of OncologyWorkflows.calculate_recist
+        got = target_responses([100, 100, 100, 100, 50, 0], [100, 100, 100, 60, 50, 0], [0, 65, 80, 75, 52, 10])
+        self.assertEqual(list(got), ["CR", "PR", "SD", "PD", "SD", "NE"])
+        self.assertEqual(self.calc.calculate_target_response(100, 75, nadir_sum=60), "PD")
+
+    def test_batch_scoring(self):
+        rows = []
+        for vn, (liver, neck) in enumerate([(30, 20), (15, 12), (12, 8), (18, 8)]):
+            rows.append(("A", f"V{vn}", vn, "T1", "LIVER", "Solid", liver, "TARGET", ""))
+            rows.append(("A", f"V{vn}", vn, "T2", "NECK", "Node", neck, "TARGET", ""))
+        rows += [("A", "V0", 0, "T3", "LIVER", "Solid", 8, "TARGET", ""),          # too small: not a target
+                 ("A", "V0", 0, "NT1", "BONE", "Solid", None, "NON-TARGET", "PRESENT"),
+                 ("A", "V2", 2, "NT1", "BONE", "Solid", None, "NON-TARGET", "PRESENT"),
+                 ("B", "BL", 0, "T1", "LUNG", "Solid", 20, "TARGET", ""), ("B", "BL", 0, "T2", "NECK", "Node", 16, "TARGET", ""),
+                 ("B", "W6", 1, "T1", "LUNG", "Solid", 0, "TARGET", ""), ("B", "W6", 1, "T2", "NECK", "Node", 8, "TARGET", ""),
+                 ("B", "W12", 2, "T1", "LUNG", "Solid", 0, "TARGET", ""), ("B", "W12", 2, "T2", "NECK", "Node", 8, "TARGET", ""),
+                 ("B", "W12", 2, "N1", "BRAIN", "Solid", 5, "NEW", "")]
+        df = pd.DataFrame(rows, columns=["USUBJID", "VISIT", "VISITNUM", "LESION", "ORGAN", "TYPE", "DIAMETER", "CATEGORY", "STATUS"])
+        out = score_recist(df)
+
+        a = out[out["USUBJID"] == "A"]
+        self.assertEqual(a["SLD"].tolist(), [50, 27, 20, 26])
+        self.assertEqual(a["NADIR"].tolist()[1:], [50, 27, 20])
+        self.assertEqual(a["TARGET"].tolist(), ["", "PR", "PR", "PD"])   # 26 vs nadir 20: +30% and +6mm
+        self.assertEqual(a["NON_TARGET"].tolist(), ["", "NE", "NON-CR/NON-PD", "NE"])
+        b = out[out["USUBJID"] == "B"]
+        self.assertEqual(b["TARGET"].tolist(), ["", "CR", "CR"])         # node below 10mm counts as resolved
+        self.assertEqual(b["OVERALL"].tolist(), ["", "CR", "PD"])        # new lesion
+
+    def test_non_target_only_subject(self):
+        rows = [("C", "BL", 0, "NT1", "BONE", "Solid", None, "NON-TARGET", "PRESENT"),
+                ("C", "BL", 0, "NT2", "LUNG", "Solid", None, "NON-TARGET", "PRESENT"),
+                ("C", "W6", 1, "NT1", "BONE", "Solid", None, "NON-TARGET", "PRESENT"),
+                ("C", "W6", 1, "NT2", "LUNG", "Solid", None, "NON-TARGET", "ABSENT"),
+                ("C", "W12", 2, "NT1", "BONE", "Solid", None, "NON-TARGET", "ABSENT"),
+                ("C", "W12", 2, "NT2", "LUNG", "Solid", None, "NON-TARGET", "ABSENT"),
+                ("C", "W18", 3, "NT1", "BONE", "Solid", None, "NON-TARGET", "UNEQUIVOCAL PROGRESSION"),
+                ("C", "W24", 4, "N1", "LIVER", "Solid", 12, "NEW", "")]
+        df = pd.DataFrame(rows, columns=["USUBJID", "VISIT", "VISITNUM", "LESION", "ORGAN", "TYPE", "DIAMETER", "CATEGORY", "STATUS"])
+        out = score_recist(df)
+        self.assertEqual(out["TARGET"].tolist(), ["", "NA", "NA", "NA", "NA"])
+        self.assertEqual(out["OVERALL"].tolist(), ["", "NON-CR/NON-PD", "CR", "PD", "PD"])
+        self.assertEqual(self.calc.determine_overall_response("NA", "Non-CR/Non-PD", False), "NON-CR/NON-PD")
+        self.assertEqual(self.calc.determine_overall_response("NA", "NE", False), "NE")
+
 if __name__ == '__main__':
     unittest.main()
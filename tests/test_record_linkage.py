@@ -0,0 +1,49 @@
+import unittest
+import pandas as pd
+from logic.record_linkage import link_records, subject_key, subject_prefix, subject_suffix
+
+class TestRecordLinkage(unittest.TestCase):
+    def test_subject_keys(self):
+        ids = pd.Series(["001-0101", "1 101", "0102", "S-0"])
+        self.assertEqual(subject_key(ids).tolist(), ["1-101", "1-101", "102", "S-0"])
+        self.assertEqual(subject_suffix(ids).tolist(), ["101", "101", "102", "0"])
+        self.assertEqual(subject_prefix(subject_key(ids)).tolist(), ["1", "1", "", "S"])
+
+    def test_near_miss_pairs_recovered(self):
+        clin = pd.DataFrame({"USUBJID": ["001-0101", "001-0101", "001-0102", "001-0103", "001-0104"],
+                             "VISIT": ["Visit 1", "Visit 2", "V1", "Week 4", "V9"],
+                             "LBTEST": ["Glucose", "Glucose", "ALT", "HGB", "ALT"],
+                             "LBDTC": ["2024-01-01", "2024-02-01", "2024-01-03", "2024-03-01", None]})
+        vend = pd.DataFrame({"USUBJID": ["1-101", "1-101", "0102", "001-0103", "9-999"],
+                             "VISIT": ["V01", "VISIT 2 (Day 30)", "V1", "WK4 unsched", "V1"],
+                             "LBTEST": ["GLUCOSE", "GLUCOSE", "ALT", "HGB", "ALT"],
+                             "LBDTC": ["2024-01-01", "2024-02-02", "2024-01-03", "2024-03-01", "2024-01-01"]})
+        res = link_records(clin, vend)
+        self.assertEqual(list(zip(res.pairs["rid_l"], res.pairs["rid_r"])), [(0, 0), (1, 1), (2, 2), (3, 3)])
+        self.assertEqual(res.pairs["method"].tolist(), ["exact", "exact", "fuzzy", "fuzzy"])
+        self.assertEqual(res.unmatched_left["USUBJID"].tolist(), ["001-0104"])
+        self.assertEqual(res.unmatched_right["USUBJID"].tolist(), ["9-999"])
+
+    def test_each_record_linked_once(self):
+        clin = pd.DataFrame({"USUBJID": ["1", "1"], "VISIT": ["V1 repeat", "V1 retest"], "LBTEST": ["ALT", "ALT"]})
+        vend = pd.DataFrame({"USUBJID": ["1"], "VISIT": ["V1 retest"], "LBTEST": ["ALT"]})
+        res = link_records(clin, vend)
+        self.assertEqual(res.pairs["rid_l"].tolist(), [1])
+        self.assertEqual(len(res.unmatched_left), 1)
+
+    def test_same_number_at_other_site_not_linked(self):
+        clin = pd.DataFrame({"USUBJID": ["SITE01-0101"], "VISIT": ["Visit 1"], "LBTEST": ["ALT"], "LBDTC": ["2024-01-01"]})
+        vend = pd.DataFrame({"USUBJID": ["SITE02-0101"], "VISIT": ["V1"], "LBTEST": ["ALT"], "LBDTC": ["2024-01-01"]})
+        res = link_records(clin, vend)
+        self.assertTrue(res.pairs.empty)
+        self.assertEqual(len(res.unmatched_left), 1)
+
+    def test_exact_stage_one_to_one(self):
+        clin = pd.DataFrame({"USUBJID": ["1", "1"], "VISIT": ["V1", "V1"], "LBTEST": ["ALT", "ALT"]})
+        vend = pd.DataFrame({"USUBJID": ["1"], "VISIT": ["V1"], "LBTEST": ["ALT"]})
+        res = link_records(clin, vend)
+        self.assertEqual(list(zip(res.pairs["rid_l"], res.pairs["rid_r"])), [(0, 0)])
+        self.assertEqual(len(res.unmatched_left), 1)
+
+if __name__ == '__main__':
+    unittest.main()
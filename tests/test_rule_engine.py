@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from logic.rule_engine import RuleCache, CompiledRule, compile_spec, evaluate_rules, build_discrepancies, rule_errors, infer_dtypes, run_chunked
+
+class TestRuleEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = RuleCache(os.path.join(self.tmp.name, "cache.json"))
+        self.df = pd.DataFrame({
+            "SubjectID": ["001", "002", "003"],
+            "Age": [17, 40, 70],
+            "Gender": ["Male", "Male", "Female"],
+            "Pregnancy": [None, "Y", None]
+        })
+        self.spec = pd.DataFrame({
+            "CheckID": ["C1", "C2", "C3"],
+            "Description": ["Adult", "Male not pregnant", "Untranslatable"],
+            "Logic_Rule": ["Age must be > 18", "If Male, Pregnancy null", "???"]
+        })
+        self.answers = {
+            "Age must be > 18": "Age <= 18",
+            "If Male, Pregnancy null": "Gender == 'Male' and Pregnancy.notnull()",
+            "???": None
+        }
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _translate(self, rule, cols):
+        self.calls.append(rule)
+        return self.answers[rule]
+
+    def test_mask_matrix_and_columnar_output(self):
+        rules = compile_spec(self.spec, self.df.columns, self._translate, self.cache)
+        mask, runnable = evaluate_rules(self.df, rules)
+        self.assertEqual(mask.shape, (3, 2))
+
+        out = build_discrepancies(self.df, runnable, mask)
+        self.assertEqual(out["CheckID"].tolist(), ["C1", "C2"])
+        self.assertEqual(out["SubjectID"].tolist(), ["001", "002"])
+        self.assertIn("'Age': 17", out.iloc[0]["Data_Snippet"])
+
+        errors = rule_errors(rules)
+        self.assertEqual(errors["Status"].tolist(), ["Logic Error"])
+
+    def test_cache_skips_translation(self):
+        compile_spec(self.spec, self.df.columns, self._translate, self.cache)
+        self.calls.clear()
+
+        reloaded = RuleCache(self.cache.path)
+        compile_spec(self.spec, self.df.columns, self._translate, reloaded)
+        # Only the failed rule goes back to the LLM
+        self.assertEqual(self.calls, ["???"])
+
+        # A different column layout is a different cache key
+        compile_spec(self.spec, ["SubjectID", "Age"], self._translate, reloaded)
+        self.assertIn("Age must be > 18", self.calls)
+
+    def test_batch_translation_path(self):
+        batches = []
+        def translate_many(rule_texts, cols):
+            batches.append(list(rule_texts))
+            out = {r: self.answers[r] for r in rule_texts}
+            out["???"] = RuntimeError("batch reply malformed")
+            return out
+
+        rules = compile_spec(self.spec, self.df.columns, self._translate, self.cache, translate_many=translate_many)
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(self.calls, [])
+        self.assertEqual([r.status for r in rules], ["Ready", "Ready", "Execution Error"])
+
+    def test_cache_key_keeps_case(self):
+        cols = self.df.columns
+        self.assertEqual(RuleCache.make_key("If Gender is  Male,\n Pregnancy null", cols), RuleCache.make_key("If Gender is Male, Pregnancy null", cols))
+        self.assertNotEqual(RuleCache.make_key("Gender must be 'M'", cols), RuleCache.make_key("Gender must be 'm'", cols))
+
+    def test_chunked_matches_in_memory(self):
+        df = pd.DataFrame({
+            "SubjectID": [f"S{i:03d}" for i in range(10)],
+            "Age": [10, 20, 30, 15, 50, 60, 12, 80, 90, 17],
+            "Gender": ["Male", "Female"] * 5,
+            "Notes": ["x"] * 10
+        })
+        path = os.path.join(self.tmp.name, "data.csv")
+        df.to_csv(path, index=False)
+
+        rules = [CompiledRule("C1", "Adult", "", query="Age <= 18"),
+                 CompiledRule("C2", "Unique", "", query="SubjectID.duplicated()"),
+                 CompiledRule("C3", "Male", "", query="Gender == 'Male'")]
+        self.assertEqual(infer_dtypes(rules, df.columns), (["Gender"], ["Age"]))
+        self.assertTrue(rules[1].cross_row)
+
+        streamed = run_chunked(path, rules, df.columns.tolist(), chunksize=3)
+        mask, runnable = evaluate_rules(df, rules)
+        whole = build_discrepancies(df, runnable, mask)
+
+        key = ["CheckID", "Row"]
+        self.assertEqual(streamed.sort_values(key)[key].values.tolist(), whole.sort_values(key)[key].values.tolist())
+        # Unreferenced columns are never loaded
+        self.assertNotIn("Notes", streamed.iloc[0]["Data_Snippet"])
+
+    def test_cross_row_rules_can_be_deferred(self):
+        path = os.path.join(self.tmp.name, "data.csv")
+        self.df.to_csv(path, index=False)
+        rules = [CompiledRule("C9", "Unique", "", query="SubjectID.duplicated()")]
+        run_chunked(path, rules, self.df.columns.tolist(), chunksize=2, second_pass=False)
+        self.assertEqual(rules[0].status, "Deferred")
+
+    def test_chunked_delta_mode(self):
+        from logic.delta_engine import DeltaStore, run_incremental
+        df = pd.DataFrame({"SubjectID": [f"S{i:03d}" for i in range(8)], "Age": [10, 20, 30, 15, 50, 60, 12, 80]})
+        path = os.path.join(self.tmp.name, "data.csv")
+        rules = [CompiledRule("C1", "Adult", "", query="Age <= 18")]
+
+        def run():
+            rechecked = []
+            def check_chunk(chunk, i, row_rules):
+                def check(subset):
+                    mask, evaluated = evaluate_rules(subset, row_rules)
+                    return build_discrepancies(subset, evaluated, mask)
+                found, stats = run_incremental(chunk, check, DeltaStore(f"chunk{i}", base_dir=self.tmp.name))
+                rechecked.append(stats["Rechecked"])
+                return found
+            found = run_chunked(path, rules, df.columns.tolist(), chunksize=3, check_chunk=check_chunk)
+            return sorted(found["Row"].tolist()), rechecked
+
+        df.to_csv(path, index=False)
+        self.assertEqual(run(), ([0, 3, 6], [3, 3, 2]))
+        df.loc[4, "Age"] = 5
+        df.to_csv(path, index=False)
+        self.assertEqual(run(), ([0, 3, 4, 6], [0, 1, 0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import pandas as pd
+from logic.safety_triangulation import triangulate_deaths, death_findings
+
+class TestSafetyTriangulation(unittest.TestCase):
+    def setUp(self):
+        self.ae = pd.DataFrame({"USUBJID": ["001", "001", "002", "003", "005"],
+                                "AEOUT": ["RECOVERED", "FATAL", "FATAL", "RECOVERED", "fatal"],
+                                "AEENDTC": ["2024-01-01", "2024-03-10", "2024-02-01", None, "2024-05-01"]})
+        self.ds = pd.DataFrame({"USUBJID": ["001", "002", "003", "005"],
+                                "DSDECOD": ["DEATH", "COMPLETED", "DEATH", "DEATH"],
+                                "DSSTDTC": ["2024-03-10", "2024-06-01", "2024-04-01", "2024-05-09"]})
+        self.dd = pd.DataFrame({"USUBJID": ["001", "004"], "DDDTC": ["2024-03-10", "2024-07-01"]})
+
+    def test_ae_ds_only(self):
+        found = death_findings(triangulate_deaths(self.ae, self.ds))
+        self.assertEqual(list(zip(found["Subject"], found["Check"])), [
+            ("002", "ZOMBIE"), ("003", "GHOST"), ("005", "DATE_DISCORDANT")])
+        self.assertEqual(found["Detail"].iloc[2], "AE 2024-05-01 / DS 2024-05-09 / DD -")
+
+    def test_dd_domain_and_date_tolerance(self):
+        tri = triangulate_deaths(self.ae, self.ds, self.dd)
+        found = death_findings(tri, date_tolerance_days=10)
+        self.assertEqual(list(zip(found["Subject"], found["Check"])), [
+            ("002", "ZOMBIE"), ("002", "DD_MISSING"), ("003", "GHOST"), ("003", "DD_MISSING"),
+            ("004", "DD_ORPHAN"), ("005", "DD_MISSING")])
+
+    def test_partial_dates_not_compared(self):
+        # 2024-05 could be the 9th: not precise enough to call the dates discordant
+        ae = self.ae.assign(AEENDTC=["2024-01-01", "2024-03-10", "2024-02-01", None, "2024-05"])
+        found = death_findings(triangulate_deaths(ae, self.ds))
+        self.assertNotIn("DATE_DISCORDANT", found["Check"].tolist())
+
+if __name__ == '__main__':
+    unittest.main()
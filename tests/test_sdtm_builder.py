@@ -0,0 +1,35 @@
+import unittest
+import pandas as pd
+from logic.sdtm_builder import build_domain, study_day
+
+class TestSdtmBuilder(unittest.TestCase):
+    def test_study_day_has_no_day_zero(self):
+        days = study_day(pd.Series(["2024-01-09", "2024-01-10", "2024-01-20"]), pd.Series(["2024-01-10"] * 3))
+        self.assertEqual(days.tolist(), [-1, 1, 11])
+
+    def test_partial_dates_have_no_study_day(self):
+        days = study_day(pd.Series(["2024", "2024-03", "2024-03-05", "2024-03-05"]), pd.Series(["2024-01-10"] * 3 + ["2024-01"]))
+        self.assertEqual(days.isna().tolist(), [True, True, False, True])
+
+    def test_lb_domain_and_supp(self):
+        dm = pd.DataFrame({"USUBJID": ["S1", "S2"], "RFSTDTC": ["2024-01-10", "2024-02-01"]})
+        lb = pd.DataFrame({"USUBJID": ["S2", "S1", "S1"], "LBTESTCD": ["ALT", "GLUC", "ALT"], "LBORRES": [10, 5.5, 20],
+                           "LBDTC": ["2024-02-01", "2024-01-09", "2024-01-20"],
+                           "Lab Comment": ["hemolyzed", None, ""], "Fasting?": ["Y", "N", "Y"], "LBSPEC": ["SERUM"] * 3})
+        out, supp = build_domain(lb, "LB", dm=dm, studyid="ST1")
+
+        self.assertEqual(list(out.columns), ["STUDYID", "DOMAIN", "USUBJID", "LBSEQ", "LBTESTCD", "LBORRES", "LBSPEC", "LBDTC", "LBDY"])
+        self.assertEqual(list(zip(out["USUBJID"], out["LBTESTCD"], out["LBSEQ"])), [("S1", "ALT", 1), ("S1", "GLUC", 2), ("S2", "ALT", 1)])
+        self.assertEqual(out["LBDY"].tolist(), [11, -1, 1])
+
+        self.assertEqual(list(zip(supp["USUBJID"], supp["IDVARVAL"], supp["QNAM"], supp["QVAL"])), [
+            ("S1", "1", "FASTING", "Y"), ("S1", "2", "FASTING", "N"), ("S2", "1", "FASTING", "Y"), ("S2", "1", "LABCOMME", "hemolyzed")])
+        self.assertTrue((supp["RDOMAIN"] == "LB").all() and (supp["IDVAR"] == "LBSEQ").all())
+
+    def test_qnam_starts_with_a_letter(self):
+        ae = pd.DataFrame({"USUBJID": ["S1"], "AETERM": ["RASH"], "2nd Dose Given": ["Y"], "24": ["N"]})
+        _, supp = build_domain(ae, "AE", studyid="ST1")
+        self.assertEqual(sorted(supp["QNAM"]), ["NDDOSEGI", "Q24"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import pandas as pd
+from logic.sdtm_conformance import check_conformance
+
+class TestSdtmConformance(unittest.TestCase):
+    def test_every_value_is_checked(self):
+        ae = pd.DataFrame({
+            "STUDYID": "ST1", "DOMAIN": "AE", "USUBJID": ["S1", "S1", "S2", "S3"], "AESEQ": [1, 1, 1, 1],
+            "AETERM": ["HEADACHE", "NAUSEA", "RASH", "x" * 201], "AEDECOD": ["Headache", "Nausea", "Rash", None],
+            "AESTDTC": ["2024-01-01", "2024-02", "01/02/2024", None], "AESER": ["Y", "N", "N", "maybe"],
+        })
+        found = check_conformance(ae, "AE").set_index(["Rule", "Variable"])
+        self.assertEqual(found.loc[("LV0002", "AEDECOD"), "Rows"].tolist(), [3])
+        self.assertEqual(found.loc[("LV0005", "STUDYID, USUBJID, AESEQ"), "Rows"].tolist(), [0, 1])
+        self.assertEqual(found.loc[("LV0007", "AESTDTC"), "Rows"].tolist(), [2])
+        self.assertEqual(found.loc[("LV0008", "AESER"), "Example"], "maybe")
+        self.assertEqual(found.loc[("LV0009", "AETERM"), "Count"], 1)
+        self.assertIn(("LV0003", "AEOUT"), found.index)
+        self.assertEqual(found.loc[("LV0007", "AESTDTC"), "Severity"], "Warning")
+
+    def test_codelist_is_case_sensitive_and_dm_core(self):
+        dm = pd.DataFrame({"STUDYID": "ST1", "DOMAIN": "DM", "USUBJID": ["S1", "S2"], "SUBJID": ["1", "2"],
+                           "SEX": ["M", "f"]})
+        found = check_conformance(dm, "DM").set_index(["Rule", "Variable"])
+        self.assertEqual(found.loc[("LV0008", "SEX"), "Rows"].tolist(), [1])
+        self.assertIn(("LV0001", "SITEID"), found.index)
+        self.assertIn(("LV0001", "COUNTRY"), found.index)
+
+    def test_clean_domain(self):
+        dm = pd.DataFrame({"STUDYID": "ST1", "DOMAIN": "DM", "USUBJID": ["S1", "S2"], "SUBJID": ["1", "2"],
+                           "SITEID": "01", "SEX": ["M", "F"], "COUNTRY": "USA", "RFSTDTC": ["2024-01-01", "2024-01"], "AGE": [40, 50],
+                           "AGEU": "YEARS", "ARM": "A"})
+        self.assertTrue(check_conformance(dm, "DM").empty)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from logic.sdtm_export import write_xpt, read_xpt, write_parquet, read_parquet, xpt_variables, pq
+
+class TestSdtmExport(unittest.TestCase):
+    def setUp(self):
+        self.lb = pd.DataFrame({"STUDYID": ["ST1"] * 3, "USUBJID": ["S1", "S2", None], "LBSEQ": [1, 2, 3],
+                                "LBTESTCD": ["ALT", "GLUC", "ALT"], "LBSTRESN": [12.5, -0.004, np.nan]})
+
+    def test_xpt_round_trip_in_chunks(self):
+        buf = io.BytesIO()
+        variables = write_xpt(self.lb, buf, "LB", chunk_rows=2)
+        self.assertEqual(len(buf.getvalue()) % 80, 0)
+        self.assertEqual([(v["name"], v["length"], v["label"]) for v in variables][2:4],
+                         [("LBSEQ", 8, "Sequence Number"), ("LBTESTCD", 4, "Test or Examination Short Name")])
+
+        buf.seek(0)
+        back = read_xpt(buf)
+        self.assertEqual(back["USUBJID"].tolist(), ["S1", "S2", ""])
+        self.assertEqual(back["LBSEQ"].tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(back["LBSTRESN"].iloc[:2].tolist(), [12.5, -0.004])
+        self.assertTrue(np.isnan(back["LBSTRESN"].iloc[2]))
+
+    def test_xpt_limits(self):
+        with self.assertRaises(ValueError):
+            xpt_variables(pd.DataFrame({"LBCOMMENTS": ["x"]}), "LB")
+        with self.assertRaises(ValueError):
+            xpt_variables(pd.DataFrame({"LBCOM": ["x" * 201]}), "LB")
+        # IBM doubles top out near 7.2e75: larger values must not be clipped into garbage
+        with self.assertRaises(ValueError):
+            write_xpt(pd.DataFrame({"LBSTRESN": [1.0, 1e80]}), io.BytesIO(), "LB")
+        buf = io.BytesIO()
+        write_xpt(pd.DataFrame({"LBSTRESN": [7e75, 1e-80, 0.0]}), buf, "LB")
+        buf.seek(0)
+        back = read_xpt(buf)["LBSTRESN"].tolist()
+        self.assertAlmostEqual(back[0] / 7e75, 1.0)
+        self.assertEqual(back[1], back[2])  # underflow is written as zero
+
+    @unittest.skipIf(pq is None, "pyarrow not installed")
+    def test_parquet_round_trip(self):
+        with tempfile.TemporaryDirectory() as root:
+            write_parquet({"lb": pd.concat([self.lb] * 5, ignore_index=True)}, root, chunk_rows=1, file_rows=1)
+            paths = write_parquet({"lb": self.lb}, root, chunk_rows=1, file_rows=2)
+            parts = sorted(os.listdir(paths["LB"]))
+            self.assertEqual(parts[0], "part-00000.parquet")
+            self.assertEqual(len(parts), -(-len(self.lb) // 2))  # earlier, larger export fully replaced
+            pd.testing.assert_frame_equal(read_parquet(root, "LB"), self.lb, check_dtype=False)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+from logic.sdtm_mapping import MappingStore, validate_mapping
+
+class TestSdtmMapping(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "store.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_local_resolution(self):
+        mapping, unknown = MappingStore(self.path).resolve(["Patient", "Visit Name", "Visit Date", "VSORRES", "Sys BP"], "VS")
+        self.assertEqual(mapping, {"Patient": "USUBJID", "Visit Name": "VISIT", "Visit Date": "VSDTC"})
+        self.assertEqual(unknown, ["Sys BP"])
+
+    def test_approved_mappings_are_reused(self):
+        headers = ["Patient", "Sys BP"]
+        MappingStore(self.path).approve(headers, "VS", {"Patient": "USUBJID", "Sys BP": "VSORRES"})
+
+        store = MappingStore(self.path)
+        self.assertEqual(store.resolve(headers, "VS"), ({"Patient": "USUBJID", "Sys BP": "VSORRES"}, []))
+        # New layout: the learned header still resolves locally
+        self.assertEqual(store.resolve(["SYS_BP", "Pulse"], "VS"), ({"SYS_BP": "VSORRES"}, ["Pulse"]))
+
+    def test_incomplete_layout_not_frozen(self):
+        store = MappingStore(self.path)
+        store.approve(["Patient", "Pulse"], "VS", {"Patient": "USUBJID"}, complete=False)
+        self.assertEqual(store.resolve(["Patient", "Pulse"], "VS")[1], ["Pulse"])
+
+    def test_taken_variable_stays_unknown(self):
+        mapping, unknown = MappingStore(self.path).resolve(["Patient", "Subject", "Visit Date"], "VS")
+        self.assertEqual(mapping, {"Patient": "USUBJID", "Visit Date": "VSDTC"})
+        self.assertEqual(unknown, ["Subject"])
+
+    def test_validate_ai_mapping(self):
+        suggested = {"Sys BP": "vsorres", "Dia BP": "VSORRES", "Pulse": "SUPP_VS", "Note": "MADEUP", "Site": "USUBJID"}
+        accepted, leftovers = validate_mapping(suggested, ["Sys BP", "Dia BP", "Pulse", "Note", "Site", "Extra"], "VS", taken={"USUBJID"})
+        self.assertEqual(accepted, {"Sys BP": "VSORRES"})
+        self.assertEqual(leftovers, ["Dia BP", "Pulse", "Note", "Site", "Extra"])
+
+if __name__ == '__main__':
+    unittest.main()
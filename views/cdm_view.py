@@ -5,8 +5,11 @@ import io
 # Logic Imports
 from logic.agent_logic import generate_dmp, generate_acrf_map, generate_uat_script
 from logic.data_cleaner import DataCleaner
-from logic.reconciler import Reconciler
-from logic.sdtm_engine import auto_map_to_sdtm, validate_sdtm_structure
+from logic.reconciler import HEADER_CACHE_FILE, HeaderMapCache, Reconciler
+from logic.sdtm_engine import auto_map_to_sdtm, approve_mapping, validate_sdtm_structure
+from logic.sdtm_builder import build_domain
+from logic.sdtm_export import write_xpt
+from logic.define_xml import build_define_xml
 from logic.security_agent import SecuritySentinel
 from logic.vendor_quality import VendorScorecard
 from logic.uat_engine import generate_synthetic_uat_data
@@ -23,7 +26,7 @@ def render_cdm_dashboard(sentinel):
     ])
     
     cleaner = DataCleaner()
-    reconciler = Reconciler()
+    reconciler = Reconciler(HeaderMapCache(HEADER_CACHE_FILE))
     
     # --- TAB: STUDY SETUP ---
     with tab_setup:
@@ -237,6 +240,8 @@ def render_cdm_dashboard(sentinel):
                  temp_path = f"temp_{raw_file.name}"
                  with open(temp_path, "wb") as f: f.write(raw_file.getbuffer())
                  df_sdtm, log = auto_map_to_sdtm(temp_path, target_domain)
+                 st.session_state["sdtm_draft"] = dict(df_sdtm.attrs.get("sdtm_mapping", {}), domain=target_domain)
+                 df_sdtm, df_supp = build_domain(df_sdtm, target_domain)
                  report = validate_sdtm_structure(df_sdtm, target_domain)
                  st.success(log)
                  st.info(report)
@@ -246,3 +251,25 @@ def render_cdm_dashboard(sentinel):
              st.dataframe(df_sdtm)
              csv_sdtm = df_sdtm.to_csv(index=False).encode('utf-8')
              st.download_button(f"Download {target_domain} (SDTM)", csv_sdtm, f"sdtm_{target_domain}.csv")
+             if not df_supp.empty:
+                 st.download_button(f"Download SUPP{target_domain}", df_supp.to_csv(index=False).encode('utf-8'), f"sdtm_supp{target_domain.lower()}.csv")
+             try:
+                 for name, frame in [(target_domain, df_sdtm), (f"SUPP{target_domain}", df_supp)]:
+                     if frame.empty: continue
+                     buf = io.BytesIO()
+                     write_xpt(frame, buf, name)
+                     st.download_button(f"Download {name} (XPT v5)", buf.getvalue(), f"{name.lower()}.xpt")
+             except ValueError as e:
+                 st.error(f"XPT export blocked: {e}")
+             datasets = {target_domain: df_sdtm, **({f"SUPP{target_domain}": df_supp} if not df_supp.empty else {})}
+             st.download_button("Download define.xml (Define-XML 2.1)", build_define_xml(datasets), "define.xml", "application/xml")
+
+        draft = st.session_state.get("sdtm_draft")
+        if draft and draft.get("headers"):
+            with st.expander(f"🔎 Review {draft['domain']} mapping", expanded=bool(draft["unknown"])):
+                st.dataframe(pd.DataFrame({"Raw Header": list(draft["mapping"]), "SDTM Variable": list(draft["mapping"].values())}))
+                if draft["unknown"]: st.warning(f"Unmapped (kept as-is / SUPP): {', '.join(map(str, draft['unknown']))}")
+                if st.button("✅ Approve Mapping", key="sdtm_approve"):
+                    approve_mapping(draft["headers"], draft["domain"], draft["mapping"])
+                    st.session_state.pop("sdtm_draft")
+                    st.success("Mapping stored; this layout will be mapped locally next time.")
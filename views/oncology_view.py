@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 from logic.oncology_engine import OncologyEngine
-from logic.recist_engine import RecistCalculator
+from logic.ctcae_grading import grade_labs, shift_table
+from logic.recist_engine import RecistCalculator, COLUMNS
 
 def render_oncology_dashboard():
     st.header("🧬 Oncology Command Center")
@@ -63,6 +64,16 @@ def render_oncology_dashboard():
                 st.markdown(f"## Overall Response: :{color}[{ovr_resp}]")
                 st.info(f"Target Response: {t_resp} | Non-Target: {nt_resp} | New Lesions: {new_lesion}")
 
+        st.divider()
+        st.markdown("### 📊 Batch Scoring (Study Lesion Table)")
+        st.caption(f"Long table, one row per lesion assessment: {', '.join(COLUMNS.values())}")
+        lesion_file = st.file_uploader("Upload Lesion Table (CSV)", type=["csv"], key="recist_batch_up")
+        if lesion_file and st.button("Score All Subjects"):
+            scored = recist.score_study(pd.read_csv(lesion_file))
+            st.dataframe(scored)
+            st.bar_chart(scored.loc[scored["OVERALL"] != "", "OVERALL"].value_counts())
+            st.download_button("Download Responses (.csv)", scored.to_csv(index=False).encode('utf-8'), "recist_responses.csv")
+
     with tab2:
         st.subheader("Survival & Follow-up Tracker")
         st.info("Analyzes patient follow-up data to flag patients at risk of being lost to follow-up.")
@@ -85,4 +96,21 @@ def render_oncology_dashboard():
         st.subheader("Safety & Toxicity Cross-Check")
         st.info("Correlates lab results (LB) with exposure data (EX) to validate dose reductions.")
         st.write("Upload Lab Data (LB) and Exposure Data (EX) to validate Dose Reductions.")
-        # Placeholder
+        c1, c2 = st.columns(2)
+        with c1: lb_file = st.file_uploader("Lab Data (LB)", type=["csv"], key="tox_lb")
+        with c2: ex_file = st.file_uploader("Exposure Data (EX)", type=["csv"], key="tox_ex")
+        window = st.number_input("Reduction window after toxicity (days, 0 = any time)", min_value=0, value=0)
+
+        if lb_file and ex_file and st.button("Run Toxicity Cross-Check"):
+            issues = engine.check_toxicity_vs_dose(pd.read_csv(lb_file), pd.read_csv(ex_file), window_days=window or None)
+            if not issues.empty:
+                st.error(f"🚩 {len(issues)} Grade 3+ toxicities without a dose reduction.")
+                st.dataframe(issues)
+            else:
+                st.success("✅ Every Grade 3+ toxicity has a matching dose reduction.")
+
+        if lb_file and st.button("CTCAE Shift Table"):
+            lb_file.seek(0)
+            graded = grade_labs(pd.read_csv(lb_file))
+            st.markdown("**Baseline vs worst post-baseline CTCAE grade (subjects)**")
+            st.dataframe(shift_table(graded))